@@ -3,5 +3,6 @@ from .models import UserProfile
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'role')
+    list_display = ('user', 'role', 'manager')
     list_filter = ('role',)
+    raw_id_fields = ('user', 'manager')
@@ -0,0 +1,32 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_user_role
+
+
+class UserRoleMiddleware:
+    """Set request.user_role, resolved lazily and at most once per request.
+    Must come after AuthenticationMiddleware. Async views should use
+    aget_user_role() instead, as resolving it queries synchronously."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        self.set_role(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.set_role(request)
+        return await self.get_response(request)
+
+    def set_role(self, request):
+        request.user_role = SimpleLazyObject(lambda: get_user_role(request.user))
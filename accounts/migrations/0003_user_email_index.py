@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-18 20:03
+
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0002_alter_userprofile_role'),
+    ]
+
+    # The HR dashboard matches candidates to auth users by email, which
+    # auth_user does not index on its own
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS accounts_user_email_idx ON auth_user (email);',
+            reverse_sql='DROP INDEX IF EXISTS accounts_user_email_idx;',
+        ),
+    ]
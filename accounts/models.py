@@ -11,6 +11,10 @@ class UserRole(models.TextChoices):
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=20, choices=UserRole.choices)
+    # The user's manager; a manager's team is them and their direct reports
+    manager = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='direct_reports',
+    )
 
     def __str__(self):
         return f"{self.user.username} - {self.role}"
@@ -0,0 +1,83 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .models import UserProfile, UserRole
+
+
+def role_cache_key(user_id):
+    return f'accounts:user-role:{user_id}'
+
+
+def get_user_role(user):
+    """The user's UserRole value ('' without a profile), from the cache when
+    possible so authorising a request doesn't cost a profile query.
+
+    Role changes clear the cached role (forget_user_role) only in the cache
+    they're made against. With the default per-process cache, other worker
+    processes can go on using the old role for up to USER_ROLE_CACHE_TIMEOUT
+    (60) seconds; a shared backend in CACHES makes changes apply at once."""
+    if not user.is_authenticated:
+        return ''
+    key = role_cache_key(user.pk)
+    role = cache.get(key)
+    if role is None:
+        role = UserProfile.objects.filter(user_id=user.pk).values_list('role', flat=True).first() or ''
+        cache.set(key, role, settings.USER_ROLE_CACHE_TIMEOUT)
+    return role
+
+
+async def aget_user_role(user):
+    """get_user_role() for async views"""
+    if not user.is_authenticated:
+        return ''
+    key = role_cache_key(user.pk)
+    role = await cache.aget(key)
+    if role is None:
+        role = await UserProfile.objects.filter(user_id=user.pk).values_list('role', flat=True).afirst() or ''
+        await cache.aset(key, role, settings.USER_ROLE_CACHE_TIMEOUT)
+    return role
+
+
+def forget_user_role(user_id):
+    cache.delete(role_cache_key(user_id))
+
+
+def request_role(request):
+    # UserRoleMiddleware normally resolves this once per request
+    if not hasattr(request, 'user_role'):
+        request.user_role = get_user_role(request.user)
+    return request.user_role
+
+
+def role_required(*roles, allow_superuser=True, denied=None):
+    """Only let users with one of ``roles`` (and superusers) into the view.
+    Others get ``denied(request)``, or a plain 403. Use under @login_required."""
+    labels = ", ".join(UserRole(role).label for role in roles)
+
+    def deny(request):
+        if denied is not None:
+            return denied(request)
+        return HttpResponse(f"Not allowed. {labels} access only.", status=403)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # request.user and request.user_role load synchronously
+                user = await request.auser()
+                if (allow_superuser and user.is_superuser) or await aget_user_role(user) in roles:
+                    return await view(request, *args, **kwargs)
+                return deny(request)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (allow_superuser and request.user.is_superuser) or request_role(request) in roles:
+                return view(request, *args, **kwargs)
+            return deny(request)
+        return wrapper
+    return decorator
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import UserProfile, UserRole
+from .roles import forget_user_role
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -10,3 +12,10 @@ def create_user_profile(sender, instance, created, **kwargs):
             user=instance,
             role=UserRole.HR  # default role
         )
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_user_role(sender, instance, **kwargs):
+    # Again on commit, in case another request re-cached the old role meanwhile.
+    # QuerySet.update() skips this signal; call forget_user_role() after one.
+    forget_user_role(instance.user_id)
+    transaction.on_commit(lambda: forget_user_role(instance.user_id))
@@ -1,3 +1,100 @@
-from django.test import TestCase
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .middleware import UserRoleMiddleware
+from .models import UserProfile, UserRole
+from .roles import get_user_role, role_required
+
+
+class UserRoleCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='pass1234')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_role_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_role(self.user), UserRole.HR)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_role(self.user), UserRole.HR)
+
+    def test_role_change_invalidates(self):
+        get_user_role(self.user)
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = UserRole.EMPLOYEE
+        profile.save()
+        self.assertEqual(get_user_role(self.user), UserRole.EMPLOYEE)
+
+        profile.delete()
+        self.assertEqual(get_user_role(self.user), '')
+
+    def test_login_redirect_uses_cached_role(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('login_redirect'))
+        self.assertRedirects(response, reverse('hr_dashboard'), fetch_redirect_response=False)
+
+        # Session and user only
+        with self.assertNumQueries(2):
+            self.client.get(reverse('login_redirect'))
+
+    async def test_middleware_in_async_stacks(self):
+        async def view(request):
+            return HttpResponse("ok")
+
+        middleware = UserRoleMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/')
+        request.user = self.user
+        response = await middleware(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await sync_to_async(str)(request.user_role), UserRole.HR)
+
+        request.user = AnonymousUser()
+        await middleware(request)
+        self.assertEqual(request.user_role, '')
+
+
+class RoleRequiredTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr = User.objects.create_user(username='hr')
+        cls.employee = User.objects.create_user(username='employee')
+        UserProfile.objects.filter(user=cls.employee).update(role=UserRole.EMPLOYEE)
+        cls.admin = User.objects.create_superuser(username='admin')
+        UserProfile.objects.filter(user=cls.admin).update(role=UserRole.EMPLOYEE)
+
+    def setUp(self):
+        cache.clear()
+
+    def call(self, view, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return view(request)
+
+    def test_role_required(self):
+        view = role_required(UserRole.HR, UserRole.MANAGER)(lambda request: HttpResponse("ok"))
+        self.assertEqual(self.call(view, self.hr).status_code, 200)
+        self.assertEqual(self.call(view, self.admin).status_code, 200)
+        response = self.call(view, self.employee)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.content, b"Not allowed. HR, Manager access only.")
+
+    def test_custom_denial(self):
+        view = role_required(
+            UserRole.HR, allow_superuser=False, denied=lambda request: HttpResponse("nope", status=401),
+        )(lambda request: HttpResponse("ok"))
+        self.assertEqual(self.call(view, self.admin).status_code, 401)
+
+    def test_employee_dashboard_role_label(self):
+        self.client.force_login(self.employee)
+        response = self.client.get(reverse('employee_dashboard'))
+        self.assertContains(response, 'Employee')
+        self.assertEqual(response.context['role_label'], 'Employee')
@@ -10,23 +10,25 @@ def home(request):
 @login_required
 def login_redirect(request):
     """Redirect users based on their role after login"""
-    if hasattr(request.user, 'userprofile'):
-        role = request.user.userprofile.role
-        if role == UserRole.HR:
-            return redirect('hr_dashboard')
-        elif role == UserRole.EMPLOYEE:
-            return redirect('employee_dashboard')
-        elif role == UserRole.ADMIN:
-            return redirect('employee_dashboard')
-        elif role in [UserRole.MANAGER, UserRole.SUPERADMIN]:
-            return redirect('employee_dashboard')
+    role = request.user_role
+    if role == UserRole.HR:
+        return redirect('hr_dashboard')
+    elif role == UserRole.EMPLOYEE:
+        return redirect('employee_dashboard')
+    elif role == UserRole.ADMIN:
+        return redirect('employee_dashboard')
+    elif role in [UserRole.MANAGER, UserRole.SUPERADMIN]:
+        return redirect('employee_dashboard')
     # Default redirect for employees
     return redirect('employee_dashboard')
 
 @login_required
 def employee_dashboard(request):
     """Employee dashboard - main HRMS application"""
-    return render(request, 'accounts/employee_dashboard.html')
+    role = request.user_role
+    return render(request, 'accounts/employee_dashboard.html', {
+        'role_label': UserRole(role).label if role else "Employee",
+    })
 
 def logout_view(request):
     """Custom logout view that handles both GET and POST"""
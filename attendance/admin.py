@@ -1,3 +1,24 @@
 from django.contrib import admin
+from .models import DailyAttendance, Device, Punch
 
-# Register your models here.
+@admin.register(Device)
+class DeviceAdmin(admin.ModelAdmin):
+    list_display = ('code', 'name', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('code', 'name')
+    readonly_fields = ('token',)
+
+@admin.register(Punch)
+class PunchAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'device', 'punched_at', 'direction', 'received_at')
+    list_filter = ('direction', 'device')
+    search_fields = ('employee__username',)
+    raw_id_fields = ('employee',)
+    date_hierarchy = 'punched_at'
+
+@admin.register(DailyAttendance)
+class DailyAttendanceAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'date', 'first_in', 'last_out', 'worked', 'late_by', 'overtime', 'unpaired')
+    search_fields = ('employee__username',)
+    raw_id_fields = ('employee',)
+    date_hierarchy = 'date'
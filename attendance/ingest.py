@@ -0,0 +1,205 @@
+"""Punch ingestion: device uploads as CSV or JSON lines, validated and
+inserted in batches. Inserting is idempotent: a punch already stored for the
+same device, employee and time is skipped by the database."""
+import csv
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Punch, PunchDirection
+
+BATCH_SIZE = 5000
+# Errors listed in a summary; the rest are only counted
+MAX_ERRORS = 100
+# How far ahead of the server a device clock may run
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# Anything earlier is a device clock that was never set
+EARLIEST_PUNCH = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+# Ids beyond a 64-bit integer can't be looked up
+MAX_EMPLOYEE_ID = 2**63 - 1
+
+DIRECTIONS = {
+    '': '', 'in': PunchDirection.IN, 'out': PunchDirection.OUT,
+    'i': PunchDirection.IN, 'o': PunchDirection.OUT, '0': PunchDirection.IN, '1': PunchDirection.OUT,
+}
+
+
+def read_punch_csv(stream):
+    """Yield (line_number, record) from CSV text with ``employee`` and
+    ``timestamp`` columns and an optional ``direction`` column"""
+    reader = csv.DictReader(stream)
+    fields = {(f or '').strip().lower(): f for f in reader.fieldnames or []}
+    if 'employee' not in fields or 'timestamp' not in fields:
+        raise ValueError("CSV file must have 'employee' and 'timestamp' columns")
+    direction = fields.get('direction')
+    for row in reader:
+        yield reader.line_num, {
+            'employee': row[fields['employee']],
+            'timestamp': row[fields['timestamp']],
+            'direction': row.get(direction) if direction else '',
+        }
+
+
+def read_punch_jsonl(stream):
+    """Yield (line_number, record) from JSON lines, one punch object per line"""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record
+
+
+def punch_reader(stream, content_type):
+    """The reader for a content type or file extension"""
+    if 'csv' in content_type:
+        return read_punch_csv(stream)
+    if 'json' in content_type:
+        return read_punch_jsonl(stream)
+    raise ValueError("Send punches as text/csv or application/x-ndjson")
+
+
+def parse_punch(record, now):
+    """(employee_id, punched_at, direction) from a record, or ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+    try:
+        employee_id = int(record.get('employee'))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("employee must be an employee id")
+    if not 1 <= employee_id <= MAX_EMPLOYEE_ID:
+        raise ValueError("employee must be an employee id")
+
+    timestamp = record.get('timestamp')
+    if isinstance(timestamp, (int, float)):
+        try:
+            punched_at = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            raise ValueError("timestamp must be ISO 8601 or a Unix time")
+    else:
+        try:
+            punched_at = datetime.fromisoformat(str(timestamp).strip())
+        except ValueError:
+            raise ValueError("timestamp must be ISO 8601 or a Unix time")
+        if timezone.is_naive(punched_at):
+            # Devices without a zone report local time
+            punched_at = timezone.make_aware(punched_at)
+    if punched_at > now + MAX_CLOCK_SKEW:
+        raise ValueError("timestamp is in the future")
+    if punched_at < EARLIEST_PUNCH:
+        raise ValueError("timestamp is too far in the past")
+
+    direction = DIRECTIONS.get(str(record.get('direction') or '').strip().lower())
+    if direction is None:
+        raise ValueError("direction must be 'in' or 'out'")
+    return employee_id, punched_at, direction
+
+
+def insert_punches(device, punches):
+    """Insert (employee_id, punched_at, direction) rows, skipping any already
+    stored for the device. Returns how many were new.
+
+    This is the hot path, so it skips the ORM: compiling a bulk_create costs
+    several times more than the INSERT itself."""
+    quote = connection.ops.quote_name
+    table = quote(Punch._meta.db_table)
+    columns = ', '.join(quote(Punch._meta.get_field(name).column) for name in (
+        'device', 'employee', 'punched_at', 'direction', 'received_at',
+    ))
+    if connection.vendor == 'sqlite':
+        sql = f'INSERT OR IGNORE INTO {table} ({columns}) VALUES (%s, %s, %s, %s, %s)'
+    else:
+        sql = f'INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s, %s) ON CONFLICT DO NOTHING'
+
+    adapt = connection.ops.adapt_datetimefield_value
+    received_at = adapt(timezone.now())
+    rows = [
+        (device.id, employee_id, adapt(punched_at), direction, received_at)
+        for employee_id, punched_at, direction in punches
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+        return cursor.rowcount
+
+
+class IngestSummary:
+
+    def __init__(self):
+        self.received = 0
+        self.accepted = 0
+        self.stored = 0
+        self.repeated = 0
+        self.invalid = 0
+        self.errors = []
+
+    def reject(self, line_number, reason):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line_number, 'error': reason})
+
+    def as_dict(self):
+        return {
+            'received': self.received,
+            'accepted': self.accepted,
+            # Accepted but already stored by an earlier upload
+            'already_stored': self.accepted - self.stored,
+            'stored': self.stored,
+            'repeated': self.repeated,
+            'invalid': self.invalid,
+            'errors': self.errors,
+        }
+
+
+def ingest_batch(device, rows, summary, known_employees, now):
+    punches = []
+    seen = set()
+    employee_ids = set()
+    parsed = []
+    for line_number, record in rows:
+        summary.received += 1
+        try:
+            employee_id, punched_at, direction = parse_punch(record, now)
+        except ValueError as e:
+            summary.reject(line_number, str(e))
+            continue
+        parsed.append((line_number, employee_id, punched_at, direction))
+        employee_ids.add(employee_id)
+
+    # One query per batch for employees not seen in earlier batches
+    unknown = employee_ids - known_employees
+    if unknown:
+        known_employees.update(User.objects.filter(id__in=unknown).values_list('id', flat=True))
+
+    for line_number, employee_id, punched_at, direction in parsed:
+        if employee_id not in known_employees:
+            summary.reject(line_number, f"unknown employee {employee_id}")
+            continue
+        key = (employee_id, punched_at)
+        if key in seen:
+            summary.repeated += 1
+            continue
+        seen.add(key)
+        punches.append((employee_id, punched_at, direction))
+
+    if punches:
+        summary.stored += insert_punches(device, punches)
+    summary.accepted += len(punches)
+
+
+def ingest_punches(device, rows, batch_size=BATCH_SIZE):
+    """Validate and store (line_number, record) rows from ``device`` in
+    batches. Returns an IngestSummary; storing the same rows again changes
+    nothing."""
+    summary = IngestSummary()
+    known_employees = set()
+    now = timezone.now()
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        ingest_batch(device, batch, summary, known_employees, now)
+    return summary
@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import random
+import time
+from datetime import datetime, time as clock, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from attendance.ingest import BATCH_SIZE, ingest_punches, read_punch_csv, read_punch_jsonl
+from attendance.models import DailyAttendance, Device, Punch
+from attendance.rollups import rollup_new_punches
+from documents.benchmarking import scratch_database
+
+
+def shift_punches(employee_ids, days, rng):
+    """(employee, timestamp, direction) for a 9-to-6 shift on each day. Most
+    people arrive within a few minutes of each other, as at a real shift change."""
+    start = timezone.localdate() - timedelta(days=days)
+    for day in range(days):
+        date = start + timedelta(days=day)
+        shift_start = timezone.make_aware(datetime.combine(date, clock(9)))
+        for employee_id in employee_ids:
+            arrive = shift_start + timedelta(seconds=rng.gauss(0, 300))
+            leave = arrive + timedelta(hours=9, seconds=rng.gauss(0, 900))
+            yield employee_id, arrive, 'in'
+            yield employee_id, leave, 'out'
+
+
+def encode(punches, file_format):
+    out = io.StringIO()
+    if file_format == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(['employee', 'timestamp', 'direction'])
+        for employee_id, punched_at, direction in punches:
+            writer.writerow([employee_id, punched_at.isoformat(), direction])
+    else:
+        for employee_id, punched_at, direction in punches:
+            out.write(json.dumps({
+                'employee': employee_id, 'timestamp': punched_at.isoformat(), 'direction': direction,
+            }) + '\n')
+    return out.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark punch ingestion on a scratch database: first uploads, "
+        "then the same uploads resent, in CSV and JSON lines; then the daily "
+        "rollup of everything stored"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=25)
+        parser.add_argument('--devices', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with scratch_database():
+            self.stdout.write(f"Database: {connection.vendor}")
+            users = User.objects.bulk_create(
+                User(username=f'employee{i}') for i in range(options['employees'])
+            )
+            devices = Device.objects.bulk_create(
+                Device(code=f'gate-{i}') for i in range(options['devices'])
+            )
+            # Each employee clocks in at their own gate; each gate uploads one
+            # file, half of them as CSV and half as JSON lines
+            uploads = []
+            for i, device in enumerate(devices):
+                employee_ids = [u.id for u in users[i::len(devices)]]
+                file_format = 'csv' if i % 2 else 'jsonl'
+                punches = list(shift_punches(employee_ids, options['days'], rng))
+                uploads.append((device, file_format, encode(punches, file_format)))
+
+            total = sum(text.count('\n') - (fmt == 'csv') for _, fmt, text in uploads)
+            self.stdout.write(f"{total} punches from {len(devices)} devices")
+            self.run('first upload', uploads, options['batch_size'])
+            stored = Punch.objects.count()
+            self.run('resent', uploads, options['batch_size'])
+            self.stdout.write(
+                f"  stored {stored} punches; after resending {Punch.objects.count()}"
+            )
+
+            started = time.perf_counter()
+            days, summaries = rollup_new_punches()
+            seconds = time.perf_counter() - started
+            self.stdout.write(self.style.MIGRATE_HEADING('daily rollup'))
+            self.stdout.write(
+                f"  {summaries} employee-days over {days} days in {seconds:.2f}s: "
+                f"{stored / seconds:.0f} punches/s, {DailyAttendance.objects.count()} stored"
+            )
+
+    def run(self, label, uploads, batch_size):
+        timings = {'csv': [0, 0.0], 'jsonl': [0, 0.0]}
+        for device, file_format, text in uploads:
+            reader = read_punch_csv if file_format == 'csv' else read_punch_jsonl
+            started = time.perf_counter()
+            summary = ingest_punches(device, reader(io.StringIO(text, newline='')), batch_size=batch_size)
+            timings[file_format][1] += time.perf_counter() - started
+            timings[file_format][0] += summary.received
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        for file_format, (count, seconds) in timings.items():
+            self.stdout.write(
+                f"  {file_format:<6} {count:8d} punches in {seconds:6.2f}s: {count / seconds:9.0f} punches/s"
+            )
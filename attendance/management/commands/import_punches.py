@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.ingest import BATCH_SIZE, ingest_punches, punch_reader
+from attendance.models import Device
+
+
+class Command(BaseCommand):
+    help = (
+        "Import punches exported from a device as CSV or JSON lines. "
+        "Importing the same file again stores nothing new."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--device', required=True, help="Device code; created if it doesn't exist")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        device, _ = Device.objects.get_or_create(code=options['device'])
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                summary = ingest_punches(
+                    device, punch_reader(stream, 'json' if file_format == 'jsonl' else file_format),
+                    batch_size=options['batch_size'],
+                )
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Could not import {options['path']}: {e}")
+
+        for error in summary.errors:
+            self.stderr.write(f"  line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary.received} punches read: {summary.stored} stored, "
+            f"{summary.accepted - summary.stored} already stored, "
+            f"{summary.repeated} repeated in the file, {summary.invalid} invalid"
+        ))
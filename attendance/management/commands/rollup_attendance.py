@@ -0,0 +1,48 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.rollups import rollup_month, rollup_new_punches
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll punches up into daily attendance summaries. By default only "
+        "the days that received punches since the last run are recomputed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="Recompute a whole month (YYYY-MM) for everyone")
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep rolling up new punches instead of exiting after one pass",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=60,
+            help="Seconds to sleep between passes (with --loop)",
+        )
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m')
+            except ValueError:
+                raise CommandError("--month must look like 2024-03")
+            started = time.perf_counter()
+            stored = rollup_month(month.year, month.month)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rolled up {stored} employee-days for {options['month']} in {time.perf_counter() - started:.1f}s"
+            ))
+            return
+
+        while True:
+            started = time.perf_counter()
+            days, stored = rollup_new_punches()
+            if stored or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Rolled up {stored} employee-days across {days} days in {time.perf_counter() - started:.1f}s"
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
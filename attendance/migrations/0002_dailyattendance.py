@@ -0,0 +1,45 @@
+# Generated by Django 5.1 on 2026-10-18 20:45
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('punches', models.PositiveIntegerField(default=0)),
+                ('first_in', models.DateTimeField(blank=True, null=True)),
+                ('last_out', models.DateTimeField(blank=True, null=True)),
+                ('worked', models.DurationField(default=datetime.timedelta)),
+                ('late_by', models.DurationField(default=datetime.timedelta)),
+                ('overtime', models.DurationField(default=datetime.timedelta)),
+                ('unpaired', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='punch',
+            index=models.Index(fields=['received_at'], name='punch_received_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyattendance',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_days', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyattendance',
+            constraint=models.UniqueConstraint(fields=('employee', 'date'), name='daily_attendance_unique_day'),
+        ),
+    ]
@@ -1,3 +1,84 @@
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+
+class PunchDirection(models.TextChoices):
+    IN = "IN", "In"
+    OUT = "OUT", "Out"
+
+
+class Device(models.Model):
+    """A clock-in terminal or biometric reader. It authenticates its uploads
+    with ``token``."""
+    code = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=100, blank=True)
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name or self.code
+
+
+class Punch(models.Model):
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='punches')
+    device = models.ForeignKey(Device, on_delete=models.PROTECT, related_name='punches')
+    punched_at = models.DateTimeField()
+    # Blank when the device doesn't say; rollups then pair punches in order
+    direction = models.CharField(max_length=3, choices=PunchDirection.choices, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Devices resend whole buffers after a network drop; the same
+            # event arriving twice is stored once
+            models.UniqueConstraint(fields=['device', 'employee', 'punched_at'], name='punch_unique_event'),
+        ]
+        indexes = [
+            # An employee's punches over a period
+            models.Index(fields=['employee', 'punched_at'], name='punch_employee_time_idx'),
+            # Punches received since the last rollup
+            models.Index(fields=['received_at'], name='punch_received_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} @ {self.punched_at:%Y-%m-%d %H:%M:%S} ({self.device_id})"
+
+
+class DailyAttendance(models.Model):
+    """One employee's day, rolled up from their punches by
+    attendance.rollups. Days without punches have no row."""
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_days')
+    date = models.DateField()
+    punches = models.PositiveIntegerField(default=0)
+    first_in = models.DateTimeField(null=True, blank=True)
+    last_out = models.DateTimeField(null=True, blank=True)
+    # Sum of the in -> out intervals
+    worked = models.DurationField(default=timedelta)
+    late_by = models.DurationField(default=timedelta)
+    overtime = models.DurationField(default=timedelta)
+    # Punches without a partner, e.g. a missed clock-out
+    unpaired = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'date'], name='daily_attendance_unique_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} on {self.date}"
+
+
+class RollupWatermark(models.Model):
+    """When the last incremental rollup started: the next one rescans the
+    punches received since. A single row, moved only by
+    attendance.rollups.rollup_new_punches, so rebuilding a month doesn't
+    hide punches that haven't been rolled up yet."""
+    last_run = models.DateTimeField()
+
+    def __str__(self):
+        return f"Rolled up to {self.last_run:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,293 @@
+"""Daily attendance rollups: punches paired into worked time, first in, last
+out, late arrival and overtime per employee per day, stored in
+DailyAttendance.
+
+The pairing runs in the database as one set-based query per day: a window
+over each employee's punches numbers them and looks at the next one, and an
+outer GROUP BY sums the in -> out intervals. The window reaches into the nights
+either side, so an overnight shift (IN 22:00, OUT 06:00) pairs up and counts
+towards the day it started. Python only sees one row per
+employee-day, and stores them with a single upsert. Runs are incremental:
+only days that received punches since the last run are recomputed. The last
+run is recorded in RollupWatermark rather than read off the summaries, since
+rollup_month stamps the summaries it rebuilds too."""
+import calendar
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, DurationField, ExpressionWrapper, F, IntegerField, Sum, Value, When, Window
+from django.db.models.functions import Lag, Lead, RowNumber, TruncDate
+from django.utils import timezone
+from django.utils.duration import duration_microseconds
+
+from .models import DailyAttendance, Punch, PunchDirection, RollupWatermark
+
+# Employees per rollup query
+CHUNK_SIZE = 1000
+# Each run rescans punches received this long before the last one started,
+# so an upload still committing then isn't missed
+ROLLUP_OVERLAP = timedelta(minutes=5)
+SUMMARY_FIELDS = [
+    'employee', 'date', 'punches', 'first_in', 'last_out', 'worked', 'late_by', 'overtime', 'unpaired',
+    'computed_at',
+]
+
+# A punch without a direction counts as in or out by its place in the day:
+# 1st in, 2nd out, 3rd in...
+IS_IN = f"(direction = '{PunchDirection.IN}' OR (direction = '' AND seq %% 2 = 1))"
+IS_OUT = f"(direction = '{PunchDirection.OUT}' OR (direction = '' AND seq %% 2 = 0))"
+NEXT_IS_OUT = f"(next_direction = '{PunchDirection.OUT}' OR (next_direction = '' AND seq %% 2 = 1))"
+
+# Where a punch lies relative to the day being rolled up, with "night" the
+# ATTENDANCE_OVERNIGHT_HOURS either side of midnight: -1 the night before the
+# day, 0 the morning, 1 the middle of the day, 2 the evening, 3 the night
+# after
+ON_DAY = "(position IN (0, 1, 2))"
+# Paired with the next punch the same day
+PAIRED = f"({ON_DAY} AND next_position IN (0, 1, 2) AND {IS_IN} AND {NEXT_IS_OUT})"
+# Overnight pairs need both directions: a punch without one is only ever
+# paired within its own day
+OVERNIGHT = (
+    f"(position = 2 AND next_position = 3 AND direction = '{PunchDirection.IN}' "
+    f"AND next_direction = '{PunchDirection.OUT}')"
+)
+# The OUT ending an overnight shift, the morning after...
+ENDS_OVERNIGHT = (
+    f"(position = 3 AND previous_position = 2 AND previous_direction = '{PunchDirection.IN}' "
+    f"AND direction = '{PunchDirection.OUT}')"
+)
+# ...and ending the one before, which belongs to the day before
+ENDS_PREVIOUS = (
+    f"(position = 0 AND COALESCE(previous_position, 0) = -1 "
+    f"AND COALESCE(previous_direction, '') = '{PunchDirection.IN}' AND direction = '{PunchDirection.OUT}')"
+)
+OWN = f"({ON_DAY} AND NOT {ENDS_PREVIOUS})"
+
+
+def day_bounds(first, last):
+    """Aware datetimes from the start of ``first`` to the end of ``last``, in
+    the current time zone"""
+    return (
+        timezone.make_aware(datetime.combine(first, time.min)),
+        timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min)),
+    )
+
+
+def db_datetime(value):
+    # SQLite hands back the stored UTC text
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+def db_duration(value):
+    # SQLite measures datetime differences in microseconds
+    if value is None:
+        return timedelta()
+    if isinstance(value, timedelta):
+        return value
+    return timedelta(microseconds=value)
+
+
+def daily_rows(day, employee_ids=None):
+    """(employee_id, punches, first_in, last_out, worked, paired) for each
+    employee with punches on ``day``, computed in the database. An employee
+    whose only punches end the previous day's overnight shift gets a row
+    with no punches."""
+    start, end = day_bounds(day, day)
+    night = timedelta(hours=settings.ATTENDANCE_OVERNIGHT_HOURS)
+    # With the nights either side, for the overnight shifts
+    punches = Punch.objects.filter(punched_at__gte=start - night, punched_at__lt=end + night)
+    if employee_ids is not None:
+        punches = punches.filter(employee_id__in=employee_ids)
+    # One day at a time, so the window needs no per-row date conversion
+    position = Case(
+        When(punched_at__lt=start, then=Value(-1)),
+        When(punched_at__lt=start + night, then=Value(0)),
+        When(punched_at__lt=end - night, then=Value(1)),
+        When(punched_at__lt=end, then=Value(2)),
+        default=Value(3),
+        output_field=IntegerField(),
+    )
+    over = {'partition_by': F('employee'), 'order_by': [F('punched_at').asc(), F('id').asc()]}
+    inner = punches.annotate(
+        position=position,
+        # Numbered from the day's first punch. Counting off the punches
+        # before it over the same window saves the database a second sort.
+        seq=Window(RowNumber(), **over) - Window(
+            Sum(Case(When(punched_at__lt=start, then=Value(1)), default=Value(0))), **over,
+        ),
+        next_position=Window(Lead(position), **over),
+        next_direction=Window(Lead('direction'), **over),
+        previous_position=Window(Lag(position), **over),
+        previous_direction=Window(Lag('direction'), **over),
+        span=ExpressionWrapper(Window(Lead('punched_at'), **over) - F('punched_at'), output_field=DurationField()),
+    ).values_list(
+        'employee_id', 'punched_at', 'direction', 'position', 'seq', 'next_position', 'next_direction',
+        'previous_position', 'previous_direction', 'span',
+    )
+    sql, params = inner.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT employee_id,
+                   SUM(CASE WHEN {OWN} OR {ENDS_OVERNIGHT} THEN 1 ELSE 0 END),
+                   MIN(CASE WHEN {OWN} AND {IS_IN} THEN punched_at END),
+                   MAX(CASE WHEN ({OWN} AND {IS_OUT}) OR {ENDS_OVERNIGHT} THEN punched_at END),
+                   SUM(CASE WHEN {PAIRED} OR {OVERNIGHT} THEN span END),
+                   SUM(CASE WHEN {PAIRED} OR {OVERNIGHT} THEN 2 ELSE 0 END)
+            FROM ({sql}) day_punches
+            GROUP BY employee_id
+            HAVING SUM(CASE WHEN {ON_DAY} THEN 1 ELSE 0 END) > 0
+        """, params)
+        for employee_id, count, first_in, last_out, worked, paired in cursor.fetchall():
+            yield employee_id, count, db_datetime(first_in), db_datetime(last_out), db_duration(worked), paired
+
+
+def attendance_policy():
+    hours, minutes = map(int, settings.ATTENDANCE_SHIFT_START.split(':'))
+    return (
+        time(hours, minutes),
+        timedelta(minutes=settings.ATTENDANCE_LATE_GRACE_MINUTES),
+        timedelta(hours=settings.ATTENDANCE_WORKDAY_HOURS),
+    )
+
+
+def summarise(day, rows, computed_at):
+    """DailyAttendance rows for ``day``, as values in SUMMARY_FIELDS order
+    (``computed_at`` already adapted for the database)"""
+    shift_start, grace, workday = attendance_policy()
+    shift_starts_at = timezone.make_aware(datetime.combine(day, shift_start))
+    for employee_id, count, first_in, last_out, worked, paired in rows:
+        late_by = timedelta()
+        if first_in is not None and first_in - shift_starts_at > grace:
+            late_by = first_in - shift_starts_at
+        overtime = max(worked - workday, timedelta())
+        yield employee_id, day, count, first_in, last_out, worked, late_by, overtime, count - paired, computed_at
+
+
+def store_summaries(summaries):
+    """Insert or replace DailyAttendance rows. Like insert_punches, this skips
+    the ORM: preparing a bulk_create costs far more than the upsert."""
+    quote = connection.ops.quote_name
+    fields = [DailyAttendance._meta.get_field(name) for name in SUMMARY_FIELDS]
+    columns = [quote(field.column) for field in fields]
+    sql = (
+        f"INSERT INTO {quote(DailyAttendance._meta.db_table)} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({columns[0]}, {columns[1]}) DO UPDATE SET "
+        + ', '.join(f"{column} = EXCLUDED.{column}" for column in columns[2:])
+    )
+
+    ops = connection.ops
+    adapt_duration = (
+        (lambda value: value) if connection.features.has_native_duration_field else duration_microseconds
+    )
+    rows = [
+        (
+            employee_id, ops.adapt_datefield_value(day), count,
+            ops.adapt_datetimefield_value(first_in), ops.adapt_datetimefield_value(last_out),
+            adapt_duration(worked), adapt_duration(late_by), adapt_duration(overtime), unpaired, computed_at,
+        )
+        for employee_id, day, count, first_in, last_out, worked, late_by, overtime, unpaired, computed_at
+        in summaries
+    ]
+    if rows:
+        with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    return len(rows)
+
+
+def rollup_days(first, last, employee_ids=None, computed_at=None):
+    """Recompute and store the summaries from ``first`` to ``last`` for
+    ``employee_ids`` (default: everyone). Returns how many were stored."""
+    computed_at = connection.ops.adapt_datetimefield_value(computed_at or timezone.now())
+    stored = 0
+    day = first
+    while day <= last:
+        rows = list(daily_rows(day, employee_ids))
+        # Days left with nothing once their punches went to the day before
+        emptied = [employee_id for employee_id, count, *_ in rows if not count]
+        if emptied:
+            DailyAttendance.objects.filter(employee_id__in=emptied, date=day).delete()
+        stored += store_summaries(summarise(day, (row for row in rows if row[1]), computed_at))
+        day += timedelta(days=1)
+    return stored
+
+
+def rollup_month(year, month):
+    """Recompute every employee's summaries for a month"""
+    return rollup_days(date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1]))
+
+
+def changed_days(since):
+    """{date: employee ids} for the days with punches received since ``since``
+    (None: ever). An IN may start an overnight shift, and an OUT end one, so
+    their neighbouring day is included too."""
+    punches = Punch.objects.all()
+    if since is not None:
+        punches = punches.filter(received_at__gte=since)
+    neighbour = {PunchDirection.IN: timedelta(days=1), PunchDirection.OUT: -timedelta(days=1)}
+    days = defaultdict(set)
+    for employee_id, day, direction in punches.annotate(
+        day=TruncDate('punched_at', tzinfo=timezone.get_current_timezone()),
+    ).values_list('employee_id', 'day', 'direction').distinct():
+        days[day].add(employee_id)
+        if direction:
+            days[day + neighbour[direction]].add(employee_id)
+    return days
+
+
+def rollup_new_punches():
+    """Recompute the days that received punches since the last run. Returns
+    (days, summaries) recomputed."""
+    started = timezone.now()
+    last_run = RollupWatermark.objects.filter(pk=1).values_list('last_run', flat=True).first()
+    days = changed_days(last_run - ROLLUP_OVERLAP if last_run else None)
+
+    stored = 0
+    for day, employee_ids in sorted(days.items()):
+        employee_ids = sorted(employee_ids)
+        for offset in range(0, len(employee_ids), CHUNK_SIZE):
+            stored += rollup_days(day, day, employee_ids[offset:offset + CHUNK_SIZE], computed_at=started)
+    # Only once everything is stored: a run that fails part way is redone
+    RollupWatermark.objects.update_or_create(pk=1, defaults={'last_run': started})
+    return len(days), stored
+
+
+def monthly_timesheet(employee, year, month, today=None):
+    """The employee's month from their stored summaries: one entry per day,
+    with 'status' present, absent, off or upcoming, plus totals"""
+    today = today or timezone.localdate()
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    summaries = {
+        summary.date: summary
+        for summary in DailyAttendance.objects.filter(employee=employee, date__range=(first, last))
+    }
+
+    days = []
+    totals = {
+        'worked': timedelta(), 'overtime': timedelta(), 'present': 0, 'absent': 0, 'late': 0, 'unpaired': 0,
+    }
+    for n in range(last.day):
+        day = first + timedelta(days=n)
+        summary = summaries.get(day)
+        if summary is not None:
+            status = 'present'
+            totals['worked'] += summary.worked
+            totals['overtime'] += summary.overtime
+            totals['late'] += bool(summary.late_by)
+            totals['unpaired'] += bool(summary.unpaired)
+        elif day >= today:
+            status = 'upcoming'
+        elif day.weekday() in settings.ATTENDANCE_WORKING_DAYS:
+            status = 'absent'
+        else:
+            status = 'off'
+        if status in totals:
+            totals[status] += 1
+        days.append({'date': day, 'status': status, 'summary': summary})
+    return days, totals
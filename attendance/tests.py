@@ -1,3 +1,470 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserProfile, UserRole
+from .ingest import ingest_punches, read_punch_csv, read_punch_jsonl
+from .models import DailyAttendance, Device, Punch, PunchDirection, RollupWatermark
+from .rollups import monthly_timesheet, rollup_days, rollup_month, rollup_new_punches
+
+
+def jsonl(*records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+class PunchIngestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice')
+        cls.bob = User.objects.create_user(username='bob')
+        cls.device = Device.objects.create(code='gate-1')
+        cls.other_device = Device.objects.create(code='gate-2')
+
+    def ingest(self, text, reader=read_punch_jsonl, device=None, **kwargs):
+        return ingest_punches(device or self.device, reader(StringIO(text, newline='')), **kwargs)
+
+    def test_csv(self):
+        summary = self.ingest(
+            'Employee,Timestamp,Direction\n'
+            f'{self.alice.id},2024-03-04T09:01:00+00:00,in\n'
+            f'{self.alice.id},2024-03-04T18:02:00+00:00,OUT\n'
+            f'{self.bob.id},2024-03-04T09:00:00,\n',
+            reader=read_punch_csv,
+        )
+
+        self.assertEqual((summary.received, summary.accepted, summary.stored, summary.invalid), (3, 3, 3, 0))
+        punch = Punch.objects.get(employee=self.alice, direction=PunchDirection.OUT)
+        self.assertEqual(punch.punched_at, datetime(2024, 3, 4, 18, 2, tzinfo=dt_timezone.utc))
+        self.assertEqual(punch.device, self.device)
+        # No zone means the server's local time
+        self.assertEqual(
+            Punch.objects.get(employee=self.bob).punched_at,
+            timezone.make_aware(datetime(2024, 3, 4, 9, 0)),
+        )
+
+    def test_csv_needs_employee_and_timestamp_columns(self):
+        with self.assertRaisesMessage(ValueError, "'employee' and 'timestamp'"):
+            self.ingest('id,time\n1,2024-03-04T09:00:00\n', reader=read_punch_csv)
+
+    def test_jsonl_with_unix_timestamps(self):
+        at = datetime(2024, 3, 4, 9, 30, tzinfo=dt_timezone.utc)
+        summary = self.ingest(jsonl(
+            {'employee': self.alice.id, 'timestamp': at.timestamp(), 'direction': 'in'},
+            {'employee': str(self.bob.id), 'timestamp': at.isoformat()},
+        ))
+
+        self.assertEqual(summary.stored, 2)
+        self.assertEqual(set(Punch.objects.values_list('punched_at', flat=True)), {at})
+
+    def test_resending_stores_nothing_new(self):
+        text = jsonl(*(
+            {'employee': self.alice.id, 'timestamp': f'2024-03-04T09:{minute:02d}:00+00:00'}
+            for minute in range(10)
+        ))
+        first = self.ingest(text, batch_size=3)
+        again = self.ingest(text, batch_size=3)
+
+        self.assertEqual((first.accepted, first.stored), (10, 10))
+        self.assertEqual((again.accepted, again.stored), (10, 0))
+        self.assertEqual(again.as_dict()['already_stored'], 10)
+        self.assertEqual(Punch.objects.count(), 10)
+
+    def test_same_punch_from_another_device_is_kept(self):
+        text = jsonl({'employee': self.alice.id, 'timestamp': '2024-03-04T09:00:00+00:00'})
+        self.ingest(text)
+        self.ingest(text, device=self.other_device)
+
+        self.assertEqual(Punch.objects.count(), 2)
+
+    def test_duplicates_within_an_upload_are_counted(self):
+        record = {'employee': self.alice.id, 'timestamp': '2024-03-04T09:00:00+00:00'}
+        summary = self.ingest(jsonl(record, record, record))
+
+        self.assertEqual((summary.accepted, summary.repeated), (1, 2))
+        self.assertEqual(Punch.objects.count(), 1)
+
+    def test_invalid_rows_are_reported_and_the_rest_stored(self):
+        future = (timezone.now() + timedelta(hours=1)).isoformat()
+        text = (
+            jsonl({'employee': self.alice.id, 'timestamp': '2024-03-04T09:00:00+00:00'})
+            + 'not json\n'
+            + jsonl(
+                {'employee': 'alice', 'timestamp': '2024-03-04T09:00:00+00:00'},
+                {'employee': self.alice.id, 'timestamp': 'yesterday'},
+                {'employee': self.alice.id, 'timestamp': future},
+                {'employee': 999999, 'timestamp': '2024-03-04T09:00:00+00:00'},
+                {'employee': self.bob.id, 'timestamp': '2024-03-04T09:00:00+00:00', 'direction': 'sideways'},
+            )
+        )
+        summary = self.ingest(text)
+
+        self.assertEqual((summary.accepted, summary.invalid), (1, 6))
+        self.assertEqual(
+            [(error['line'], error['error']) for error in sorted(summary.errors, key=lambda e: e['line'])],
+            [
+                (2, 'not a JSON object'),
+                (3, 'employee must be an employee id'),
+                (4, 'timestamp must be ISO 8601 or a Unix time'),
+                (5, 'timestamp is in the future'),
+                (6, 'unknown employee 999999'),
+                (7, "direction must be 'in' or 'out'"),
+            ],
+        )
+
+    def test_out_of_range_values_are_invalid(self):
+        text = jsonl(
+            {'employee': self.alice.id, 'timestamp': 1e20},
+            {'employee': self.alice.id, 'timestamp': -1e20},
+            {'employee': 2**70, 'timestamp': '2024-03-04T09:00:00+00:00'},
+            {'employee': 0, 'timestamp': '2024-03-04T09:00:00+00:00'},
+            {'employee': self.alice.id, 'timestamp': '0001-01-01T00:00:00+00:00'},
+            {'employee': self.alice.id, 'timestamp': 0},
+        ) + '{"employee": 1e400, "timestamp": 0}\n'
+        summary = self.ingest(text)
+
+        self.assertEqual((summary.accepted, summary.invalid), (0, 7))
+        self.assertEqual([error['error'] for error in sorted(summary.errors, key=lambda e: e['line'])], [
+            'timestamp must be ISO 8601 or a Unix time',
+            'timestamp must be ISO 8601 or a Unix time',
+            'employee must be an employee id',
+            'employee must be an employee id',
+            'timestamp is too far in the past',
+            'timestamp is too far in the past',
+            'employee must be an employee id',
+        ])
+
+    def test_queries_per_batch(self):
+        text = jsonl(*(
+            {'employee': user.id, 'timestamp': f'2024-03-04T09:{minute:02d}:00+00:00'}
+            for minute in range(50) for user in (self.alice, self.bob)
+        ))
+        with CaptureQueriesContext(connection) as queries:
+            self.ingest(text, batch_size=25)
+
+        # Employees are looked up once; each of the 4 batches is one INSERT
+        self.assertEqual(len([q for q in queries.captured_queries if 'INSERT' in q['sql']]), 4)
+        self.assertEqual(len([q for q in queries.captured_queries if 'auth_user' in q['sql']]), 1)
+        self.assertEqual(Punch.objects.count(), 100)
+
+
+class DevicePunchUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice')
+        cls.device = Device.objects.create(code='gate-1')
+
+    def post(self, body, content_type='application/x-ndjson', token=None):
+        token = self.device.token if token is None else token
+        return self.client.post(
+            reverse('ingest_device_punches'), body, content_type=content_type,
+            headers={'X-Device-Token': str(token)},
+        )
+
+    def test_upload(self):
+        body = jsonl({'employee': self.alice.id, 'timestamp': '2024-03-04T09:00:00+00:00', 'direction': 'in'})
+        response = self.post(body)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stored'], 1)
+        self.assertEqual(self.post(body).json()['already_stored'], 1)
+        self.assertEqual(Punch.objects.count(), 1)
+
+    def test_csv_upload(self):
+        response = self.post(
+            f'employee,timestamp\n{self.alice.id},2024-03-04T09:00:00+00:00\n', content_type='text/csv',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Punch.objects.count(), 1)
+
+    def test_unknown_or_disabled_device(self):
+        body = jsonl({'employee': self.alice.id, 'timestamp': '2024-03-04T09:00:00+00:00'})
+        self.assertEqual(self.post(body, token='not-a-token').status_code, 403)
+        Device.objects.filter(id=self.device.id).update(is_active=False)
+        self.assertEqual(self.post(body).status_code, 403)
+        self.assertFalse(Punch.objects.exists())
+
+    def test_nothing_valid(self):
+        response = self.post('not json\n')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['invalid'], 1)
+
+    def test_unsupported_content_type(self):
+        self.assertEqual(self.post('<punches/>', content_type='application/xml').status_code, 400)
+
+    def test_get_not_allowed(self):
+        self.assertEqual(self.client.get(reverse('ingest_device_punches')).status_code, 405)
+
+
+class ImportPunchesCommandTests(TestCase):
+
+    def test_import_twice(self):
+        alice = User.objects.create_user(username='alice')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'gate.csv')
+            with open(path, 'w') as f:
+                f.write(f'employee,timestamp\n{alice.id},2024-03-04T09:00:00+00:00\n999999,2024-03-04T09:00:00+00:00\n')
+
+            out, err = StringIO(), StringIO()
+            call_command('import_punches', path, device='gate-9', stdout=out, stderr=err)
+            call_command('import_punches', path, device='gate-9', stdout=out, stderr=err)
+
+        self.assertIn('1 stored, 0 already stored', out.getvalue())
+        self.assertIn('0 stored, 1 already stored', out.getvalue())
+        self.assertIn('line 3: unknown employee 999999', err.getvalue())
+        self.assertEqual(Punch.objects.filter(device__code='gate-9').count(), 1)
+
+    def test_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command('import_punches', '/nonexistent/gate.csv', device='gate-9')
+
+
+def at(day, clock):
+    hour, minute = map(int, clock.split(':'))
+    return timezone.make_aware(datetime(2024, 3, day, hour, minute))
+
+
+class RollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice')
+        cls.bob = User.objects.create_user(username='bob')
+        cls.device = Device.objects.create(code='gate-1')
+
+    def punch(self, employee, day, *punches):
+        """punches as 'HH:MM' (no direction) or ('HH:MM', direction)"""
+        Punch.objects.bulk_create(
+            Punch(
+                employee=employee, device=self.device,
+                punched_at=at(day, p if isinstance(p, str) else p[0]),
+                direction='' if isinstance(p, str) else p[1],
+            )
+            for p in punches
+        )
+
+    def day(self, employee, day):
+        return DailyAttendance.objects.get(employee=employee, date=date(2024, 3, day))
+
+    def test_pairs_in_and_out(self):
+        IN, OUT = PunchDirection.IN, PunchDirection.OUT
+        self.punch(self.alice, 4, ('09:20', IN), ('13:00', OUT), ('13:30', IN), ('19:00', OUT))
+        rollup_month(2024, 3)
+
+        summary = self.day(self.alice, 4)
+        self.assertEqual(summary.punches, 4)
+        self.assertEqual((summary.first_in, summary.last_out), (at(4, '09:20'), at(4, '19:00')))
+        self.assertEqual(summary.worked, timedelta(hours=9, minutes=10))
+        self.assertEqual(summary.late_by, timedelta(minutes=20))
+        self.assertEqual(summary.overtime, timedelta(hours=1, minutes=10))
+        self.assertEqual(summary.unpaired, 0)
+
+    def test_punches_without_direction_alternate(self):
+        self.punch(self.bob, 4, '09:05', '17:00')
+        rollup_month(2024, 3)
+
+        summary = self.day(self.bob, 4)
+        self.assertEqual(summary.worked, timedelta(hours=7, minutes=55))
+        # Within the grace period
+        self.assertEqual((summary.late_by, summary.overtime, summary.unpaired), (timedelta(), timedelta(), 0))
+
+    def test_unpaired_punches(self):
+        IN, OUT = PunchDirection.IN, PunchDirection.OUT
+        # Forgot to clock out after lunch
+        self.punch(self.alice, 4, ('09:00', IN), ('12:00', OUT), ('13:00', IN))
+        # Clocked in twice
+        self.punch(self.bob, 4, ('09:00', IN), ('09:05', IN), ('17:00', OUT))
+        rollup_month(2024, 3)
+
+        alice, bob = self.day(self.alice, 4), self.day(self.bob, 4)
+        self.assertEqual((alice.worked, alice.unpaired, alice.last_out), (timedelta(hours=3), 1, at(4, '12:00')))
+        self.assertEqual((bob.worked, bob.unpaired, bob.first_in), (timedelta(hours=7, minutes=55), 1, at(4, '09:00')))
+
+    def test_overnight_shift_counts_towards_the_day_it_started(self):
+        IN, OUT = PunchDirection.IN, PunchDirection.OUT
+        self.punch(self.alice, 4, ('22:00', IN))
+        self.punch(self.alice, 5, ('06:00', OUT), ('22:00', IN))
+        self.punch(self.alice, 6, ('06:30', OUT))
+        rollup_month(2024, 3)
+
+        monday, tuesday = self.day(self.alice, 4), self.day(self.alice, 5)
+        self.assertEqual((monday.punches, monday.unpaired, monday.worked), (2, 0, timedelta(hours=8)))
+        self.assertEqual((monday.first_in, monday.last_out), (at(4, '22:00'), at(5, '06:00')))
+        self.assertEqual(
+            (tuesday.punches, tuesday.worked, tuesday.last_out), (2, timedelta(hours=8, minutes=30), at(6, '06:30')),
+        )
+        # Wednesday only has the end of Tuesday's shift
+        self.assertFalse(DailyAttendance.objects.filter(date=date(2024, 3, 6)).exists())
+
+    def test_punches_without_direction_only_pair_within_the_day(self):
+        self.punch(self.bob, 4, '09:00', '17:00', '22:00')
+        self.punch(self.bob, 5, '06:00')
+        rollup_month(2024, 3)
+
+        monday, tuesday = self.day(self.bob, 4), self.day(self.bob, 5)
+        self.assertEqual((monday.worked, monday.unpaired), (timedelta(hours=8), 1))
+        self.assertEqual((tuesday.punches, tuesday.unpaired), (1, 1))
+
+    def test_late_clock_out_moves_the_night_to_the_day_before(self):
+        IN, OUT = PunchDirection.IN, PunchDirection.OUT
+        # The clock-out is rolled up alone before the clock-in arrives
+        self.punch(self.alice, 5, ('06:00', OUT))
+        rollup_new_punches()
+        self.assertEqual(self.day(self.alice, 5).unpaired, 1)
+
+        self.punch(self.alice, 4, ('22:00', IN))
+        rollup_new_punches()
+        self.assertEqual(self.day(self.alice, 4).worked, timedelta(hours=8))
+        self.assertFalse(DailyAttendance.objects.filter(date=date(2024, 3, 5)).exists())
+
+    @override_settings(TIME_ZONE='Asia/Kolkata')
+    def test_days_are_local(self):
+        # 19:30 UTC is 01:00 the next day in India
+        Punch.objects.create(
+            employee=self.alice, device=self.device,
+            punched_at=datetime(2024, 3, 4, 19, 30, tzinfo=dt_timezone.utc),
+        )
+        rollup_month(2024, 3)
+
+        self.assertEqual(list(DailyAttendance.objects.values_list('date', flat=True)), [date(2024, 3, 5)])
+
+    def test_queries_per_day_not_per_employee(self):
+        employees = User.objects.bulk_create(User(username=f'employee{i}') for i in range(30))
+        for employee in employees:
+            self.punch(employee, 4, '09:00', '17:00')
+            self.punch(employee, 5, '09:00', '17:00')
+
+        # The rollup query and the upsert for each day, however many employees
+        with self.assertNumQueries(4):
+            stored = rollup_days(date(2024, 3, 4), date(2024, 3, 5))
+        self.assertEqual(stored, 60)
+
+    def test_only_days_with_new_punches_are_recomputed(self):
+        self.punch(self.alice, 4, '09:00', '17:00')
+        self.assertEqual(rollup_new_punches(), (1, 1))
+        # Move the upload and the run into the past
+        Punch.objects.update(received_at=timezone.now() - timedelta(hours=2))
+        RollupWatermark.objects.update(last_run=timezone.now() - timedelta(hours=1))
+        self.assertEqual(rollup_new_punches(), (0, 0))
+
+        # A late upload adds an evening session to Monday; Bob's Tuesday is new
+        self.punch(self.alice, 4, '18:00', '20:00')
+        self.punch(self.bob, 5, '09:00', '17:00')
+        self.assertEqual(rollup_new_punches(), (2, 2))
+        self.assertEqual(self.day(self.alice, 4).worked, timedelta(hours=10))
+        self.assertEqual(self.day(self.bob, 5).worked, timedelta(hours=8))
+
+    def test_month_rebuild_leaves_new_punches_to_the_next_run(self):
+        self.punch(self.alice, 4, '09:00', '17:00')
+        rollup_new_punches()
+        Punch.objects.update(received_at=timezone.now() - timedelta(hours=2))
+        RollupWatermark.objects.update(last_run=timezone.now() - timedelta(hours=1))
+        # Bob punches in on April 1st, then someone rebuilds March
+        Punch.objects.create(
+            employee=self.bob, device=self.device, punched_at=timezone.make_aware(datetime(2024, 4, 1, 9)),
+        )
+        Punch.objects.filter(employee=self.bob).update(received_at=timezone.now() - timedelta(minutes=30))
+        rollup_month(2024, 3)
+
+        self.assertEqual(rollup_new_punches(), (1, 1))
+        self.assertTrue(DailyAttendance.objects.filter(employee=self.bob, date=date(2024, 4, 1)).exists())
+
+    def test_command(self):
+        self.punch(self.alice, 4, '09:00', '17:00')
+        out = StringIO()
+        call_command('rollup_attendance', stdout=out)
+        call_command('rollup_attendance', month='2024-03', stdout=out)
+
+        self.assertIn('Rolled up 1 employee-days across 1 days', out.getvalue())
+        self.assertIn('Rolled up 1 employee-days for 2024-03', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('rollup_attendance', month='March')
+
+
+class TimesheetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = User.objects.create_user(username='employee', password='pass1234')
+        UserProfile.objects.filter(user=cls.employee).update(role=UserRole.EMPLOYEE)
+        cls.hr_user = User.objects.create_user(username='hr', password='pass1234')
+        device = Device.objects.create(code='gate-1')
+        # Mon 4th on time, Tue 5th late; Wed 6th absent; the 9th and 10th are a weekend
+        Punch.objects.bulk_create([
+            Punch(employee=cls.employee, device=device, punched_at=at(4, '09:00')),
+            Punch(employee=cls.employee, device=device, punched_at=at(4, '18:30')),
+            Punch(employee=cls.employee, device=device, punched_at=at(5, '09:45')),
+            Punch(employee=cls.employee, device=device, punched_at=at(5, '17:45')),
+        ])
+        rollup_month(2024, 3)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_monthly_timesheet(self):
+        days, totals = monthly_timesheet(self.employee, 2024, 3, today=date(2024, 3, 11))
+
+        self.assertEqual(len(days), 31)
+        statuses = {day['date'].day: day['status'] for day in days}
+        self.assertEqual([statuses[n] for n in (4, 5, 6, 9, 10, 11)],
+                         ['present', 'present', 'absent', 'off', 'off', 'upcoming'])
+        self.assertEqual(totals['worked'], timedelta(hours=17, minutes=30))
+        self.assertEqual(totals['overtime'], timedelta(hours=1, minutes=30))
+        self.assertEqual((totals['present'], totals['late']), (2, 1))
+        # The 1st and the working days from the 6th to the 8th
+        self.assertEqual(totals['absent'], 4)
+
+    def test_reads_only_summaries(self):
+        self.client.force_login(self.employee)
+        # Session, user and the month's summaries
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('timesheet'), {'month': '2024-03'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '9:30')
+        self.assertContains(response, 'March 2024')
+
+    def test_only_hr_sees_other_employees(self):
+        self.client.force_login(self.employee)
+        response = self.client.get(reverse('timesheet'), {'employee': self.hr_user.id})
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.hr_user)
+        response = self.client.get(reverse('timesheet'), {'employee': self.employee.id, 'month': '2024-03'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '8:00')
+
+    def test_bad_employee_is_not_found(self):
+        self.client.force_login(self.hr_user)
+        for employee in ('alice', '1.5', str(2**70), '-1', '999999'):
+            with self.subTest(employee=employee):
+                response = self.client.get(reverse('timesheet'), {'employee': employee})
+                self.assertEqual(response.status_code, 404)
+
+    def test_months_without_a_neighbour_are_not_found(self):
+        self.client.force_login(self.employee)
+        for month in ('0001-01', '9999-12'):
+            with self.subTest(month=month):
+                response = self.client.get(reverse('timesheet'), {'month': month})
+                self.assertEqual(response.status_code, 404)
+
+    def test_bad_month_shows_this_month(self):
+        self.client.force_login(self.employee)
+        response = self.client.get(reverse('timesheet'), {'month': 'soon'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f"{timezone.localdate():%B %Y}")
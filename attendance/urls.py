@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import ingest_device_punches, timesheet
+
+urlpatterns = [
+    path('punches/', ingest_device_punches, name='ingest_device_punches'),
+    path('timesheet/', timesheet, name='timesheet'),
+]
@@ -1,3 +1,115 @@
-from django.shortcuts import render
+import codecs
+import uuid
+from datetime import date
 
-# Create your views here.
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from accounts.models import UserRole
+from accounts.roles import request_role
+from .ingest import ingest_punches, punch_reader
+from .models import Device
+from .rollups import monthly_timesheet
+
+
+def request_device(request):
+    """The active device named by the X-Device-Token header, or None"""
+    try:
+        token = uuid.UUID(request.headers.get('X-Device-Token', ''))
+    except ValueError:
+        return None
+    return Device.objects.filter(token=token, is_active=True).first()
+
+
+# Devices authenticate with their token, not a session, so there is no CSRF
+# cookie to check
+@csrf_exempt
+@require_POST
+def ingest_device_punches(request):
+    """Store a batch of punches from a device: CSV (text/csv) or JSON lines
+    (application/x-ndjson) in the request body. Safe to retry; punches
+    already stored are skipped."""
+    device = request_device(request)
+    if device is None:
+        return JsonResponse({"error": "Unknown or disabled device."}, status=403)
+
+    # Parsed line by line as it streams in, so large uploads aren't held in
+    # memory. Retrying after an error is safe: stored batches are skipped.
+    stream = codecs.iterdecode(request, 'utf-8-sig')
+    try:
+        rows = punch_reader(stream, request.content_type)
+        summary = ingest_punches(device, rows)
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(summary.as_dict(), status=200 if summary.accepted or not summary.invalid else 400)
+
+
+def hours_minutes(duration):
+    minutes = int(duration.total_seconds()) // 60
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+def timesheet_month(value):
+    """(year, month) from a 'YYYY-MM' parameter, defaulting to this month.
+    404 for the first and last months a date can hold, which have no
+    previous or next month to link to."""
+    try:
+        year, month = map(int, value.split('-'))
+        date(year, month, 1)
+    except ValueError:
+        today = timezone.localdate()
+        return today.year, today.month
+    if year - (month == 1) < date.min.year or year + (month == 12) > date.max.year:
+        raise Http404("No such month")
+    return year, month
+
+
+def user_or_404(value):
+    """The user a query parameter names by id; 404 when it isn't a usable id
+    or there's no such user"""
+    try:
+        user_id = int(value)
+    except ValueError:
+        raise Http404("No such user")
+    # Beyond a 64-bit integer the database can't even look it up
+    if not 0 < user_id < 2**63:
+        raise Http404("No such user")
+    return get_object_or_404(User, id=user_id)
+
+
+@login_required
+def timesheet(request):
+    """A month of the user's attendance, from the daily rollups. HR can pass
+    ?employee=<user id> to see anyone's."""
+    employee = request.user
+    if request.GET.get('employee'):
+        if not (request.user.is_superuser or request_role(request) == UserRole.HR):
+            return HttpResponse("Not allowed. HR access only.", status=403)
+        employee = user_or_404(request.GET['employee'])
+
+    year, month = timesheet_month(request.GET.get('month', ''))
+    days, totals = monthly_timesheet(employee, year, month)
+    for day in days:
+        summary = day['summary']
+        if summary is not None:
+            day['worked'] = hours_minutes(summary.worked)
+            day['late_by'] = hours_minutes(summary.late_by) if summary.late_by else ''
+            day['overtime'] = hours_minutes(summary.overtime) if summary.overtime else ''
+    first = date(year, month, 1)
+    previous = date(year - (month == 1), month - 1 or 12, 1)
+    following = date(year + (month == 12), month % 12 + 1, 1)
+    return render(request, 'attendance/timesheet.html', {
+        'employee': employee,
+        'month': first,
+        'previous_month': f"{previous:%Y-%m}",
+        'next_month': f"{following:%Y-%m}",
+        'days': days,
+        'totals': totals,
+        'total_worked': hours_minutes(totals['worked']),
+        'total_overtime': hours_minutes(totals['overtime']),
+    })
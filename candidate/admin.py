@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Candidate, CandidateToken
+from .models import ArchivedCandidate, Candidate, CandidateToken
 
 @admin.register(Candidate)
 class CandidateAdmin(admin.ModelAdmin):
@@ -10,3 +10,8 @@ class CandidateAdmin(admin.ModelAdmin):
 @admin.register(CandidateToken)
 class CandidateTokenAdmin(admin.ModelAdmin):
     list_display = ('candidate', 'token', 'is_used', 'expires_at')
+
+@admin.register(ArchivedCandidate)
+class ArchivedCandidateAdmin(admin.ModelAdmin):
+    list_display = ('email', 'invited_at', 'archived_at')
+    search_fields = ('email',)
@@ -0,0 +1,149 @@
+import csv
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from notifications.mail import enqueue_emails
+from .models import CANDIDATE_TOKEN_LIFETIME, Candidate, CandidateStatus, CandidateToken
+
+CHUNK_SIZE = 500
+
+INVITATION_SUBJECT = "Complete Your Onboarding"
+
+# Plain text message (fallback for email clients that don't support HTML)
+INVITATION_MESSAGE = """
+Hello,
+
+You have been invited to complete your onboarding process.
+
+Click the link below:
+{link}
+
+Note: This link will expire in 3 days.
+
+Regards,
+HR Team
+"""
+
+# Placeholder rendered into the HTML template once and swapped per invite
+LINK_PLACEHOLDER = "__ONBOARDING_LINK__"
+
+
+class InviteResult:
+    INVITED = "invited"
+    REINVITED = "reinvited"
+    COMPLETED = "already completed"
+    DUPLICATE = "duplicate in file"
+    INVALID = "invalid email"
+
+
+def onboarding_link(token):
+    # BASE_URL = "https://abcd-1234.ngrok-free.app"
+    # return f"{BASE_URL}/candidate/onboard/{token}/"
+    return f"http://127.0.0.1:8000/candidate/onboard/{token}/"
+
+
+def render_invitation_html():
+    """Invitation HTML with LINK_PLACEHOLDER where the onboarding link goes"""
+    return render_to_string(
+        'candidate/email_onboarding.html',
+        {
+            'onboarding_link': LINK_PLACEHOLDER,
+        }
+    )
+
+
+def invitation_email(email, token, html_template=None):
+    """(subject, message, recipient, html_message) for one invitation"""
+    link = onboarding_link(token)
+    html_template = html_template or render_invitation_html()
+    return (
+        INVITATION_SUBJECT,
+        INVITATION_MESSAGE.format(link=link),
+        email,
+        html_template.replace(LINK_PLACEHOLDER, link),
+    )
+
+
+def read_invite_csv(stream):
+    """Yield (row_number, email, name, phone) from a CSV text stream.
+    The file needs an ``email`` column; ``name`` and ``phone`` are optional."""
+    reader = csv.DictReader(stream)
+    fields = {(f or '').strip().lower(): f for f in reader.fieldnames or []}
+    if 'email' not in fields:
+        raise ValueError("CSV file must have an 'email' column")
+    for row in reader:
+        yield (
+            reader.line_num,
+            (row.get(fields['email']) or '').strip(),
+            (row.get(fields.get('name')) or '').strip()[:100],
+            (row.get(fields.get('phone')) or '').strip()[:15],
+        )
+
+
+def invite_chunk(rows, html_template, seen):
+    """Invite one chunk of rows in a handful of queries; returns per-row results"""
+    results = []
+    valid = {}
+    for row_number, email, name, phone in rows:
+        try:
+            validate_email(email)
+        except ValidationError:
+            results.append((row_number, email, InviteResult.INVALID))
+            continue
+        if email in seen:
+            results.append((row_number, email, InviteResult.DUPLICATE))
+            continue
+        seen.add(email)
+        valid[email] = (row_number, name, phone)
+
+    if not valid:
+        return results
+
+    with transaction.atomic():
+        existing = {
+            c.email: c for c in Candidate.objects.filter(email__in=valid).only('id', 'email', 'status')
+        }
+        reinvite = []
+        for email, candidate in existing.items():
+            if candidate.status == CandidateStatus.PROFILE_COMPLETED:
+                results.append((valid[email][0], email, InviteResult.COMPLETED))
+            else:
+                reinvite.append(candidate)
+                results.append((valid[email][0], email, InviteResult.REINVITED))
+
+        created = Candidate.objects.bulk_create([
+            Candidate(email=email, name=name, phone=phone)
+            for email, (row_number, name, phone) in valid.items() if email not in existing
+        ])
+        for candidate in created:
+            results.append((valid[candidate.email][0], candidate.email, InviteResult.INVITED))
+
+        invited = reinvite + created
+        CandidateToken.objects.filter(candidate__in=reinvite).delete()
+        expires_at = timezone.now() + CANDIDATE_TOKEN_LIFETIME
+        tokens = CandidateToken.objects.bulk_create([
+            CandidateToken(candidate=candidate, expires_at=expires_at) for candidate in invited
+        ])
+        enqueue_emails(
+            invitation_email(candidate.email, token.token, html_template)
+            for candidate, token in zip(invited, tokens)
+        )
+
+    results.sort()
+    return results
+
+
+def bulk_invite(rows, chunk_size=CHUNK_SIZE):
+    """Invite candidates from (row_number, email, name, phone) rows, e.g. from
+    read_invite_csv. Works through the rows in chunks so large files are never
+    held in memory at once; yields (row_number, email, result) per row."""
+    html_template = render_invitation_html()
+    seen = set()
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield from invite_chunk(chunk, html_template, seen)
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from candidate.invitations import CHUNK_SIZE, bulk_invite
+from candidate.models import CandidateToken
+from notifications.models import OutboundEmail
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark's candidates once it has finished"""
+
+
+class Command(BaseCommand):
+    help = "Measure bulk invitation throughput on synthetic rows, then roll them back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invites', type=int, default=10_000)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help="Commit the invited candidates instead of rolling them back",
+        )
+
+    def handle(self, *args, **options):
+        total = options['invites']
+        prefix = f'bulk{int(time.time())}'
+        rows = (
+            (i + 2, f'{prefix}-{i}@example.com', f'Candidate {i}', '')
+            for i in range(total)
+        )
+
+        try:
+            with transaction.atomic():
+                tokens_before = CandidateToken.objects.count()
+                emails_before = OutboundEmail.objects.count()
+
+                started = time.perf_counter()
+                for _ in bulk_invite(rows, options['chunk_size']):
+                    pass
+                elapsed = time.perf_counter() - started
+
+                self.stdout.write(
+                    f"Created {CandidateToken.objects.count() - tokens_before} tokens and queued "
+                    f"{OutboundEmail.objects.count() - emails_before} emails"
+                )
+                self.stdout.write(self.style.SUCCESS(
+                    f"{total} invites in {elapsed:.2f}s ({total / elapsed:.0f} invites/s, "
+                    f"chunk size {options['chunk_size']})"
+                ))
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write("Invited candidates rolled back")
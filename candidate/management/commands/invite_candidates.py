@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from candidate.invitations import CHUNK_SIZE, InviteResult, bulk_invite, read_invite_csv
+
+
+class Command(BaseCommand):
+    help = "Invite candidates listed in a CSV file (email, optional name and phone columns)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--quiet-rows', action='store_true',
+            help="Only print rows that were not invited",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = {}
+        try:
+            with open(options['csv_file'], encoding='utf-8-sig', newline='') as stream:
+                for row_number, email, result in bulk_invite(read_invite_csv(stream), options['chunk_size']):
+                    counts[result] = counts.get(result, 0) + 1
+                    invited = result in (InviteResult.INVITED, InviteResult.REINVITED)
+                    if not (options['quiet_rows'] and invited):
+                        self.stdout.write(f"{row_number}\t{email}\t{result}")
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        for result, count in sorted(counts.items()):
+            self.stdout.write(f"{result}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
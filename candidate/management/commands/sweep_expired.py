@@ -0,0 +1,62 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from candidate.sweeper import (
+    BATCH_SIZE, abandoned_candidates, archive_abandoned_candidates, delete_expired_tokens,
+    expired_token_querysets,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired onboarding and upload tokens and archive candidates "
+        "who never took up their invitation, in bounded batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--keep-expired-days', type=int, default=7,
+            help="Keep expired tokens this long, so their links still say "
+                 "'expired' rather than 'invalid'",
+        )
+        parser.add_argument(
+            '--abandoned-days', type=int, default=30,
+            help="Archive invited candidates whose invitation is older than this",
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help="Seconds to sleep between batches to spread the load",
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        token_cutoff = now - timedelta(days=options['keep_expired_days'])
+        candidate_cutoff = now - timedelta(days=options['abandoned_days'])
+        batch_size = options['batch_size']
+
+        if options['dry_run']:
+            for label, tokens in expired_token_querysets().items():
+                count = tokens.filter(expires_at__lt=token_cutoff).count()
+                self.stdout.write(f"Would delete {count} expired {label}")
+            count = abandoned_candidates(candidate_cutoff).count()
+            self.stdout.write(f"Would archive {count} abandoned candidates")
+            return
+
+        for label, tokens in expired_token_querysets().items():
+            total = self.run_batches(delete_expired_tokens(tokens, token_cutoff, batch_size), options['pause'])
+            self.stdout.write(f"Deleted {total} expired {label}")
+        total = self.run_batches(archive_abandoned_candidates(candidate_cutoff, batch_size), options['pause'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} abandoned candidates"))
+
+    def run_batches(self, batches, pause):
+        total = 0
+        for count in batches:
+            total += count
+            if pause:
+                time.sleep(pause)
+        return total
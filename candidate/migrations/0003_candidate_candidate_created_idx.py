@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0002_candidate_document_1_candidate_document_2_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['-created_at', '-id'], name='candidate_created_idx'),
+        ),
+    ]
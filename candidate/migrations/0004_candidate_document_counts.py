@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0003_candidate_candidate_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='pending_docs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='total_docs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='verified_docs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
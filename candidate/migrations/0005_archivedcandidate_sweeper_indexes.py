@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0004_candidate_document_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('phone', models.CharField(blank=True, max_length=15)),
+                ('invited_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='candidatetoken',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(condition=models.Q(('status', 'INVITED')), fields=['created_at'], name='candidate_invited_idx'),
+        ),
+    ]
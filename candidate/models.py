@@ -25,20 +25,54 @@ class Candidate(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Document counters, kept in step by the documents app on upload and
+    # verification so the HR dashboard doesn't aggregate the document table
+    total_docs = models.PositiveIntegerField(default=0)
+    pending_docs = models.PositiveIntegerField(default=0)
+    verified_docs = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # HR dashboard candidate listing, newest first
+            models.Index(fields=['-created_at', '-id'], name='candidate_created_idx'),
+            # Sweeper: invitations nobody acted on
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='INVITED'),
+                name='candidate_invited_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
 
+CANDIDATE_TOKEN_LIFETIME = timedelta(days=3)
+
+
 class CandidateToken(models.Model):
     candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE)
     token = models.UUIDField(default=uuid.uuid4, unique=True)
     is_used = models.BooleanField(default=False)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.expires_at:
-            self.expires_at = timezone.now() + timedelta(days=3)
+            self.expires_at = timezone.now() + CANDIDATE_TOKEN_LIFETIME
         super().save(*args, **kwargs)
 
     def is_valid(self):
         return not self.is_used and timezone.now() < self.expires_at
+
+
+class ArchivedCandidate(models.Model):
+    """What is kept of an invitation that was never taken up, once
+    sweep_expired has removed the candidate and their tokens"""
+    email = models.EmailField()
+    name = models.CharField(max_length=100, blank=True)
+    phone = models.CharField(max_length=15, blank=True)
+    invited_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.email
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from documents.models import DocumentToken
+from .models import Candidate, CandidateToken
+from .tokens import forget_token
+
+
+@receiver([post_save, post_delete], sender=CandidateToken)
+@receiver([post_save, post_delete], sender=DocumentToken)
+def invalidate_token(sender, instance, **kwargs):
+    # QuerySet.update() skips this signal; call forget_token() after one
+    forget_token(sender, instance.token)
+
+
+@receiver(post_save, sender=Candidate)
+def invalidate_candidate_tokens(sender, instance, created, **kwargs):
+    # Cached tokens carry a copy of the candidate
+    if created:
+        return
+    for model in (CandidateToken, DocumentToken):
+        for token in model.objects.filter(candidate=instance).values_list('token', flat=True):
+            forget_token(model, token)
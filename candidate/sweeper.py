@@ -0,0 +1,72 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from documents.models import DocumentToken, UploadSession
+from .models import ArchivedCandidate, Candidate, CandidateStatus, CandidateToken
+
+BATCH_SIZE = 1000
+
+
+def delete_expired_tokens(tokens, before, batch_size=BATCH_SIZE):
+    """Delete the tokens in ``tokens`` that expired before ``before``, one
+    short transaction per batch. Yields the number deleted in each batch."""
+    expired = tokens.filter(expires_at__lt=before).order_by('expires_at')
+    while True:
+        # The expires_at index serves both the filter and the ordering
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        with transaction.atomic():
+            tokens.model.objects.filter(id__in=ids).delete()
+        yield len(ids)
+
+
+def expired_token_querysets():
+    """Tokens the sweeper may delete once expired. An invited candidate's
+    link is kept: it dates the invitation until the candidate is archived."""
+    return {
+        'candidate tokens': CandidateToken.objects.exclude(candidate__status=CandidateStatus.INVITED),
+        'document tokens': DocumentToken.objects.all(),
+    }
+
+
+def abandoned_candidates(before):
+    """Candidates invited before ``before`` who never onboarded, have no
+    documents and whose last invitation link also expired before then"""
+    live_token = CandidateToken.objects.filter(candidate=OuterRef('pk'), expires_at__gte=before)
+    return (
+        Candidate.objects.filter(status=CandidateStatus.INVITED, created_at__lt=before, total_docs=0)
+        .exclude(Exists(live_token))
+    )
+
+
+def archive_abandoned_candidates(before, batch_size=BATCH_SIZE):
+    """Move abandoned candidates into ArchivedCandidate and delete them, with
+    their tokens, upload sessions and files. Yields the number archived in
+    each batch."""
+    while True:
+        candidates = list(abandoned_candidates(before).order_by('created_at')[:batch_size])
+        if not candidates:
+            return
+        ids = [c.id for c in candidates]
+        names = [
+            field.name for c in candidates
+            for field in (c.document_1, c.document_2, c.document_3) if field
+        ]
+        partials = [s.partial_path for s in UploadSession.objects.filter(candidate_id__in=ids)]
+
+        with transaction.atomic():
+            ArchivedCandidate.objects.bulk_create([
+                ArchivedCandidate(email=c.email, name=c.name, phone=c.phone, invited_at=c.created_at)
+                for c in candidates
+            ])
+            Candidate.objects.filter(id__in=ids).delete()
+
+        # Only once the rows are gone; content-addressed blobs are left for
+        # collect_orphan_blobs, which knows whether anything else shares them
+        for name in names:
+            default_storage.delete(name)
+        for path in partials:
+            path.unlink(missing_ok=True)
+        yield len(ids)
@@ -1,3 +1,198 @@
+import io
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from documents.models import DocumentToken
+from notifications.models import OutboundEmail
+from .invitations import InviteResult, bulk_invite, read_invite_csv
+from .models import ArchivedCandidate, Candidate, CandidateStatus, CandidateToken
+from .tokens import lookup_token
+
+
+class BulkInviteTests(TestCase):
+
+    def invite(self, csv_text, chunk_size=2):
+        return list(bulk_invite(read_invite_csv(io.StringIO(csv_text)), chunk_size))
+
+    def test_invites_new_candidates(self):
+        results = self.invite("email,name\na@example.com,Ann\nb@example.com,Bob\nc@example.com,\n")
+
+        self.assertEqual([r[2] for r in results], [InviteResult.INVITED] * 3)
+        self.assertEqual(Candidate.objects.get(email='a@example.com').name, 'Ann')
+        self.assertEqual(CandidateToken.objects.count(), 3)
+        self.assertEqual(
+            sorted(OutboundEmail.objects.values_list('recipient', flat=True)),
+            ['a@example.com', 'b@example.com', 'c@example.com'],
+        )
+        # Every invitation carries its own link in both text and HTML bodies
+        for token in CandidateToken.objects.select_related('candidate'):
+            email = OutboundEmail.objects.get(recipient=token.candidate.email)
+            self.assertIn(str(token.token), email.body)
+            self.assertIn(str(token.token), email.html_body)
+
+    def test_per_row_results(self):
+        Candidate.objects.create(email='done@example.com', status=CandidateStatus.PROFILE_COMPLETED)
+        pending = Candidate.objects.create(email='pending@example.com')
+        old_token = CandidateToken.objects.create(candidate=pending)
+
+        results = self.invite(
+            "Email\n"
+            "new@example.com\n"
+            "not-an-email\n"
+            "done@example.com\n"
+            "pending@example.com\n"
+            "new@example.com\n"
+        )
+
+        self.assertEqual(results, [
+            (2, 'new@example.com', InviteResult.INVITED),
+            (3, 'not-an-email', InviteResult.INVALID),
+            (4, 'done@example.com', InviteResult.COMPLETED),
+            (5, 'pending@example.com', InviteResult.REINVITED),
+            (6, 'new@example.com', InviteResult.DUPLICATE),
+        ])
+        self.assertFalse(CandidateToken.objects.filter(pk=old_token.pk).exists())
+        self.assertTrue(CandidateToken.objects.filter(candidate=pending).exists())
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_queries_do_not_grow_per_row(self):
+        rows = "email\n" + "".join(f"user{i}@example.com\n" for i in range(200))
+        # One lookup and a few batched inserts per chunk (SQLite caps the
+        # parameters per INSERT, so the exact split depends on the backend)
+        with CaptureQueriesContext(connection) as ctx:
+            self.invite(rows, chunk_size=500)
+        self.assertLess(len(ctx.captured_queries), 15)
+
+    def test_missing_email_column(self):
+        with self.assertRaises(ValueError):
+            self.invite("name\nAnn\n")
+
+    def test_upload_view(self):
+        hr_user = User.objects.create_user(username='hr', password='pass1234')
+        self.client.force_login(hr_user)
+        upload = SimpleUploadedFile('cohort.csv', b"email\na@example.com\nbad\n", content_type='text/csv')
+
+        response = self.client.post(reverse('bulk_invite_candidates'), {'file': upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['summary'], [
+            (InviteResult.INVALID, 1), (InviteResult.INVITED, 1),
+        ])
+        self.assertTrue(Candidate.objects.filter(email='a@example.com').exists())
+
+
+class TokenLookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.candidate = Candidate.objects.create(email='candidate@example.com', name='Ann')
+        cls.token = CandidateToken.objects.create(candidate=cls.candidate)
+        cls.doc_token = DocumentToken.objects.create(candidate=cls.candidate)
+
+    def setUp(self):
+        cache.clear()
+        self.onboard_url = f'/candidate/onboard/{self.token.token}/'
+
+    def test_token_and_candidate_in_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            token_obj = lookup_token(DocumentToken, self.doc_token.token)
+        with self.assertNumQueries(0):
+            self.assertEqual(token_obj.candidate.name, 'Ann')
+            self.assertEqual(lookup_token(DocumentToken, self.doc_token.token), token_obj)
+
+    def test_unknown_tokens_are_cached_as_invalid(self):
+        url = f'/candidate/onboard/{uuid.uuid4()}/'
+        self.assertContains(self.client.get(url), 'Invalid Link')
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), 'Invalid Link')
+
+    def test_upload_page_refresh_skips_token_query(self):
+        url = reverse('upload_document', args=[self.doc_token.token])
+        self.client.get(url)
+        # Only the candidate's document list
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_using_a_token_invalidates_it(self):
+        self.client.get(self.onboard_url)
+        response = self.client.post(self.onboard_url, {'name': 'Ann Lee', 'phone': '555'})
+        self.assertEqual(response.status_code, 302)
+        self.assertContains(self.client.get(self.onboard_url), 'Already Used')
+
+        # The new upload link shows the updated candidate
+        upload_url = response.headers['Location']
+        self.assertContains(self.client.get(upload_url), 'Welcome, Ann Lee!')
+
+    def test_candidate_changes_invalidate_cached_tokens(self):
+        lookup_token(DocumentToken, self.doc_token.token)
+        self.candidate.name = 'Ann Smith'
+        self.candidate.save()
+        self.assertEqual(lookup_token(DocumentToken, self.doc_token.token).candidate.name, 'Ann Smith')
+
+
+class SweepExpiredTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+
+    def invite(self, email, days_ago, token_expired_days_ago=None, status=CandidateStatus.INVITED):
+        candidate = Candidate.objects.create(email=email, status=status)
+        Candidate.objects.filter(id=candidate.id).update(created_at=self.now - timedelta(days=days_ago))
+        if token_expired_days_ago is not None:
+            CandidateToken.objects.create(
+                candidate=candidate, expires_at=self.now - timedelta(days=token_expired_days_ago),
+            )
+        return candidate
+
+    def sweep(self, *args):
+        out = io.StringIO()
+        call_command('sweep_expired', '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_expired_tokens_in_batches(self):
+        onboarded = [self.invite(f'done{i}@example.com', 40, 10, CandidateStatus.PROFILE_COMPLETED) for i in range(3)]
+        for candidate in onboarded:
+            DocumentToken.objects.create(candidate=candidate, expires_at=self.now - timedelta(days=8))
+        recent = self.invite('recent@example.com', 5, 1, CandidateStatus.PROFILE_COMPLETED)
+        DocumentToken.objects.create(candidate=recent)
+
+        output = self.sweep()
+
+        self.assertIn("Deleted 3 expired candidate tokens", output)
+        self.assertIn("Deleted 3 expired document tokens", output)
+        self.assertEqual(list(CandidateToken.objects.values_list('candidate', flat=True)), [recent.id])
+        self.assertEqual(list(DocumentToken.objects.values_list('candidate', flat=True)), [recent.id])
+        self.assertEqual(Candidate.objects.count(), 4)
+
+    def test_archives_abandoned_candidates(self):
+        abandoned = self.invite('gone@example.com', 60, 57)
+        never_sent = self.invite('nolink@example.com', 45)
+        reinvited = self.invite('again@example.com', 60, 2)
+        fresh = self.invite('fresh@example.com', 2, -1)
+        with_docs = self.invite('docs@example.com', 60, 57)
+        Candidate.objects.filter(id=with_docs.id).update(total_docs=1)
+
+        self.assertIn("Would archive 2 abandoned candidates", self.sweep('--dry-run'))
+        self.assertEqual(Candidate.objects.count(), 5)
 
-# Create your tests here.
+        output = self.sweep()
+        self.assertIn("Archived 2 abandoned candidates", output)
+        self.assertEqual(
+            sorted(Candidate.objects.values_list('email', flat=True)),
+            sorted([reinvited.email, fresh.email, with_docs.email]),
+        )
+        self.assertFalse(CandidateToken.objects.filter(candidate_id=abandoned.id).exists())
+        archived = ArchivedCandidate.objects.get(email=abandoned.email)
+        self.assertEqual(archived.invited_at, self.now - timedelta(days=60))
+        self.assertTrue(ArchivedCandidate.objects.filter(email=never_sent.email).exists())
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Cached in place of a token row that doesn't exist
+INVALID = 'invalid'
+
+
+def token_cache_key(model, token):
+    return f'{model._meta.label_lower}:{token}'
+
+
+def lookup_token(model, token):
+    """The ``model`` token row for ``token`` with its candidate joined, or
+    None. Rows are cached for TOKEN_CACHE_TIMEOUT seconds and unknown tokens
+    for INVALID_TOKEN_CACHE_TIMEOUT, so refreshes and link guessing don't
+    reach the database. Callers still check is_valid(), which covers expiry.
+
+    forget_token() clears an entry only in the cache it runs against. With the
+    default per-process cache, other worker processes can go on using an old
+    row for up to TOKEN_CACHE_TIMEOUT (30) seconds, and rejecting a token they
+    looked up before it existed for up to INVALID_TOKEN_CACHE_TIMEOUT (also 30).
+
+    The cached candidate is for identity and display; reload it before
+    relying on its document counters."""
+    key = token_cache_key(model, token)
+    cached = cache.get(key)
+    if cached == INVALID:
+        return None
+    if cached is not None:
+        return cached
+
+    token_obj = model.objects.select_related('candidate').filter(token=token).first()
+    if token_obj is None:
+        cache.set(key, INVALID, settings.INVALID_TOKEN_CACHE_TIMEOUT)
+    else:
+        cache.set(key, token_obj, settings.TOKEN_CACHE_TIMEOUT)
+    return token_obj
+
+
+async def alookup_token(model, token):
+    """lookup_token() for async views"""
+    key = token_cache_key(model, token)
+    cached = await cache.aget(key)
+    if cached == INVALID:
+        return None
+    if cached is not None:
+        return cached
+
+    token_obj = await model.objects.select_related('candidate').filter(token=token).afirst()
+    if token_obj is None:
+        await cache.aset(key, INVALID, settings.INVALID_TOKEN_CACHE_TIMEOUT)
+    else:
+        await cache.aset(key, token_obj, settings.TOKEN_CACHE_TIMEOUT)
+    return token_obj
+
+
+def forget_token(model, token):
+    """Drop a cached token now and again on commit, in case another request
+    cached the old row in between"""
+    key = token_cache_key(model, token)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import create_candidate, candidate_onboard
+from .views import create_candidate, bulk_invite_candidates, candidate_onboard
 
 urlpatterns = [
     path('create/', create_candidate),
+    path('bulk-invite/', bulk_invite_candidates, name='bulk_invite_candidates'),
     path('onboard/<uuid:token>/', candidate_onboard),
 ]
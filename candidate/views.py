@@ -2,31 +2,28 @@ from django.shortcuts import render, redirect
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.template.loader import render_to_string
 from accounts.models import UserRole
+from accounts.roles import role_required
 from .models import Candidate, CandidateToken, CandidateStatus
 from documents.models import DocumentToken
-from django.core.mail import send_mail
-from django.conf import settings
+from notifications.mail import enqueue_emails
+from .invitations import bulk_invite, invitation_email, read_invite_csv
+from .tokens import lookup_token
+import io
+from collections import Counter
 from django.utils import timezone
 from datetime import timedelta
+def hr_access_denied(request):
+    return render(request, "candidate/error.html", {
+        "error_title": "Access Denied",
+        "error_message": "You need HR role to create candidates. Please contact administrator."
+    }, status=403)
+
+
 # HR creates candidate & gets link
 @login_required
+@role_required(UserRole.HR, denied=hr_access_denied)
 def create_candidate(request):
-    # Check if user has HR role or is superuser
-    if request.user.is_superuser:
-        # Superuser can access
-        pass
-    elif not hasattr(request.user, 'userprofile'):
-        # Create userprofile if it doesn't exist
-        from accounts.models import UserProfile
-        UserProfile.objects.create(user=request.user, role=UserRole.HR)
-    elif request.user.userprofile.role != UserRole.HR:
-        return render(request, "candidate/error.html", {
-            "error_title": "Access Denied",
-            "error_message": "You need HR role to create candidates. Please contact administrator."
-        })
-
     if request.method == "POST":
         email = request.POST.get("email")
 
@@ -46,69 +43,46 @@ def create_candidate(request):
         #  4. Create fresh token
         token = CandidateToken.objects.create(candidate=candidate)
 
-        link = f"http://127.0.0.1:8000/candidate/onboard/{token.token}/"
-        # BASE_URL = "https://abcd-1234.ngrok-free.app"
-        # link = f"{BASE_URL}/candidate/onboard/{token.token}/"
+        # Delivered by the send_queued_emails worker, off the request path
+        enqueue_emails([invitation_email(email, token.token)])
+        messages.success(request, f"Onboarding link queued for {email}.")
 
-        subject = "Complete Your Onboarding"
-        
-        # Plain text message (fallback for email clients that don't support HTML)
-        message = f"""
-Hello,
-
-You have been invited to complete your onboarding process.
-
-Click the link below:
-{link}
+        return render(request, "candidate/create_candidate.html")
 
-Note: This link will expire in 3 days.
+    return render(request, "candidate/create_candidate.html")
 
-Regards,
-HR Team
-"""
 
-        # HTML email template
-        html_message = render_to_string(
-            'candidate/email_onboarding.html',
-            {
-                'onboarding_link': link,
-            }
-        )
+# HR invites a cohort of candidates from a CSV file
+@login_required
+@role_required(UserRole.HR, denied=hr_access_denied)
+def bulk_invite_candidates(request):
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if not upload:
+            messages.error(request, "Please choose a CSV file.")
+            return render(request, "candidate/bulk_invite.html")
 
+        # Decode the upload as a stream rather than reading it into memory
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
         try:
-            result = send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [email],
-                fail_silently=False,
-                html_message=html_message,
-            )
-            if result:
-                messages.success(request, f"Onboarding link sent successfully to {email}!")
-                print(f"Email sent successfully to {email}")
-            else:
-                messages.error(request, f"Email sending returned False. Check email configuration.")
-                print(f"Email sending failed - returned False for {email}")
-        except Exception as e:
-            error_msg = str(e)
-            messages.error(request, f"Failed to send email: {error_msg}")
-            print(f"Email error: {error_msg}")
-            print(f"Attempted to send to: {email}")
-            print(f"From: {settings.DEFAULT_FROM_EMAIL}")
-            import traceback
-            traceback.print_exc()
-
-        return render(request, "candidate/create_candidate.html")
+            results = list(bulk_invite(read_invite_csv(stream)))
+        except (ValueError, UnicodeDecodeError) as e:
+            messages.error(request, f"Could not read the CSV file: {e}")
+            return render(request, "candidate/bulk_invite.html")
+
+        summary = Counter(result for row_number, email, result in results)
+        return render(request, "candidate/bulk_invite.html", {
+            "results": results,
+            "summary": sorted(summary.items()),
+        })
 
-    return render(request, "candidate/create_candidate.html")
+    return render(request, "candidate/bulk_invite.html")
 
 
 # Candidate opens link (NO LOGIN)
 def candidate_onboard(request, token):
-    try:
-        token_obj = CandidateToken.objects.get(token=token)
-    except CandidateToken.DoesNotExist:
+    token_obj = lookup_token(CandidateToken, token)
+    if token_obj is None:
         return render(request, "candidate/error.html", {
             "error_title": "Invalid Link",
             "error_message": "The onboarding link you're trying to access is invalid. Please contact HR for a new link."
@@ -126,10 +100,11 @@ def candidate_onboard(request, token):
         candidate.name = request.POST.get("name")
         candidate.phone = request.POST.get("phone")
         candidate.status = CandidateStatus.PROFILE_COMPLETED
-        candidate.save()
+        # The candidate came from the token cache; don't write back its counters
+        candidate.save(update_fields=['name', 'phone', 'status'])
 
         token_obj.is_used = True
-        token_obj.save()
+        token_obj.save(update_fields=['is_used'])
 
         # Create document upload token and redirect directly to upload page
         DocumentToken.objects.filter(candidate=candidate).delete()
@@ -1,8 +1,15 @@
 from django.contrib import admin
-from .models import Document
+from .models import Document, delete_documents
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
     list_display = ('candidate', 'document_type', 'status', 'uploaded_at')
     list_filter = ('status',)
     search_fields = ('candidate__email', 'document_type')
+
+    # Deleting keeps the candidates' document counters in step
+    def delete_model(self, request, obj):
+        delete_documents(Document.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_documents(queryset)
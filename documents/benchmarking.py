@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+
+
+@contextmanager
+def scratch_database(options=None):
+    """Point the default database at a fresh, migrated scratch database for
+    the length of a benchmark. Yields a temporary directory that is removed
+    afterwards.
+
+    On SQLite the database is a file in that directory, opened with the given
+    connection OPTIONS (default: the configured ones). On PostgreSQL it is a
+    throwaway test database created next to the configured one."""
+    settings_dict = connections.settings['default']
+    engine = settings_dict['ENGINE']
+    workdir = tempfile.mkdtemp()
+    try:
+        if engine == 'django.db.backends.postgresql' and options is None:
+            with scratch_postgresql():
+                yield workdir
+        elif engine == 'django.db.backends.sqlite3':
+            with scratch_sqlite(settings_dict, workdir, options):
+                yield workdir
+        else:
+            raise CommandError("This benchmark needs DATABASE_ENGINE sqlite (or postgresql without custom options)")
+    finally:
+        shutil.rmtree(workdir)
+
+
+@contextmanager
+def scratch_sqlite(settings_dict, workdir, options):
+    saved = dict(settings_dict)
+    # Threads open their own connections from this settings dict, so
+    # updating it in place redirects all of them
+    connections['default'].close()
+    settings_dict.update(
+        NAME=os.path.join(workdir, 'bench.sqlite3'),
+        OPTIONS=saved['OPTIONS'] if options is None else options,
+        CONN_MAX_AGE=0,
+    )
+    try:
+        call_command('migrate', verbosity=0)
+        yield
+    finally:
+        connections['default'].close()
+        settings_dict.clear()
+        settings_dict.update(saved)
+
+
+@contextmanager
+def scratch_postgresql():
+    connection = connections['default']
+    old_name = connection.settings_dict['NAME']
+    # Renames the database in the shared settings dict, like the test runner
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,44 @@
+import hashlib
+import re
+
+from django.core.files import File
+
+# Size of the blocks copied from the request body into the partial file
+READ_SIZE = 64 * 1024
+
+CHECKSUM_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class PartialUpload(File):
+    """A completed chunked upload. Exposing temporary_file_path() lets the
+    storage backend move the file into place instead of copying it."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def write_chunk(path, stream, offset, length):
+    """Copy up to ``length`` bytes from ``stream`` into the file at ``offset``
+    without holding more than one block in memory; returns bytes written.
+    Anything past ``offset`` is discarded first, so a retried chunk simply
+    overwrites a half-written one."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'r+b' if path.exists() else 'wb') as f:
+        f.seek(offset)
+        f.truncate()
+        remaining = length
+        while remaining:
+            block = stream.read(min(READ_SIZE, remaining))
+            if not block:
+                break
+            f.write(block)
+            remaining -= len(block)
+    return length - remaining
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
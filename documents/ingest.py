@@ -0,0 +1,102 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Document, IngestStatus
+
+BATCH_SIZE = 20
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff'}
+
+
+def encode_image(image, quality):
+    """(bytes, extension): PNG when the image has transparency, JPEG otherwise"""
+    out = io.BytesIO()
+    icc_profile = image.info.get('icc_profile')
+    if 'A' in image.getbands() or 'transparency' in image.info:
+        if image.mode not in ('RGBA', 'LA'):
+            image = image.convert('RGBA')
+        image.save(out, 'PNG', optimize=True, icc_profile=icc_profile)
+        return out.getvalue(), '.png'
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.save(out, 'JPEG', quality=quality, optimize=True, progressive=True, icc_profile=icc_profile)
+    return out.getvalue(), '.jpg'
+
+
+def normalise_image(path, max_dimension, quality):
+    """Re-encode the image at path upright, without EXIF and at most
+    max_dimension pixels on its long side. Returns (bytes, extension), or None
+    when the file isn't an image or the result would be no improvement.
+    Runs in a worker process, so it only touches the file system."""
+    if os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+        return None
+    with Image.open(path) as image:
+        if getattr(image, 'n_frames', 1) > 1:
+            return None
+        has_exif = bool(image.getexif())
+        oversized = max(image.size) > max_dimension
+        # Let the JPEG decoder skip detail that is about to be thrown away
+        image.draft(image.mode, (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        data, ext = encode_image(image, quality)
+
+    # An upright, EXIF-free image that fits is only worth replacing if smaller
+    if not has_exif and not oversized and len(data) >= os.path.getsize(path):
+        return None
+    return data, ext
+
+
+def normalise_documents(batch_size=BATCH_SIZE, executor=None):
+    """Normalise one batch of newly uploaded documents in the executor's
+    worker processes. Returns (normalised, unchanged, failed) counts."""
+    documents = list(
+        Document.objects.filter(ingest_status=IngestStatus.PENDING).order_by('id').only('id', 'file')[:batch_size]
+    )
+    if not documents:
+        return 0, 0, 0
+
+    futures = {
+        document: executor.submit(
+            normalise_image, document.file.path,
+            settings.DOCUMENT_IMAGE_MAX_DIMENSION, settings.DOCUMENT_IMAGE_QUALITY,
+        )
+        for document in documents
+    }
+    counts = {IngestStatus.NORMALISED: 0, IngestStatus.UNCHANGED: 0, IngestStatus.FAILED: 0}
+    for document, future in futures.items():
+        changes = {}
+        try:
+            result = future.result()
+        except Exception:
+            # Whatever the file or the worker did, including a pool broken by
+            # a crashed process, only this document fails
+            logger.exception("Normalising document %s failed", document.id)
+            changes['ingest_status'] = IngestStatus.FAILED
+        else:
+            if result is None:
+                changes['ingest_status'] = IngestStatus.UNCHANGED
+            else:
+                data, ext = result
+                if settings.DOCUMENT_KEEP_ORIGINALS:
+                    originals = Document._meta.get_field('original').storage
+                    with document.file.open('rb') as f:
+                        changes['original'] = originals.save(
+                            f'originals/{os.path.basename(document.file.name)}', File(f),
+                        )
+                changes['file'] = default_storage.save(f'documents/{document.id}{ext}', ContentFile(data))
+                changes['ingest_status'] = IngestStatus.NORMALISED
+        # The replaced blob is left for collect_orphan_blobs, whose grace period
+        # protects a concurrent upload of the same content that isn't committed yet
+        Document.objects.filter(id=document.id, file=document.file.name).update(**changes)
+        counts[changes['ingest_status']] += 1
+    return counts[IngestStatus.NORMALISED], counts[IngestStatus.UNCHANGED], counts[IngestStatus.FAILED]
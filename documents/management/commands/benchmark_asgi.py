@@ -0,0 +1,284 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from candidate.models import Candidate
+from documents.benchmarking import scratch_database
+from documents.models import Document, DocumentToken
+from notifications.mail import deliver_batch, enqueue_emails
+from notifications.smtp_sink import SMTPSink
+
+CSRF_SECRET = get_random_string(32)
+COMMON_HEADERS = {
+    'Host': 'localhost',
+    'Cookie': f'csrftoken={CSRF_SECRET}',
+    'X-CSRFToken': CSRF_SECRET,
+}
+
+
+def split_body(body, pieces):
+    size = -(-len(body) // pieces) or 1
+    return [body[i:i + size] for i in range(0, len(body), size)] or [b'']
+
+
+def upload_flow(token, index, body):
+    """The requests of one chunked upload, as a generator: yields (method,
+    path, body, headers, slow) and is sent back (status, body) for each.
+    Only the chunk body is sent slowly, like a client on a poor connection."""
+    form = {'Content-Type': 'application/x-www-form-urlencoded'}
+    status, content = yield 'POST', reverse('chunked_upload_init', args=[token]), urlencode({
+        'document_type': 'ID Proof',
+        'filename': f'scan{index}.pdf',
+        'size': len(body),
+        'checksum': hashlib.sha256(body).hexdigest(),
+    }).encode(), form, False
+    if status not in (200, 201):
+        return False
+    upload_id = json.loads(content)['upload_id']
+    status, _ = yield 'PATCH', reverse('chunked_upload_chunk', args=[token, upload_id]), body, {
+        'Content-Type': 'application/octet-stream',
+        'Upload-Offset': '0',
+    }, True
+    if status != 200:
+        return False
+    status, _ = yield 'POST', reverse('chunked_upload_finalize', args=[token, upload_id]), b'', form, False
+    return status == 201
+
+
+class TrickleStream(io.RawIOBase):
+    """wsgi.input that hands the body over in pieces, sleeping before each"""
+
+    def __init__(self, pieces, delay):
+        self.pieces = list(pieces)
+        self.delay = delay
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while self.pieces and (size is None or size < 0 or len(self.buffer) < size):
+            time.sleep(self.delay)
+            self.buffer += self.pieces.pop(0)
+        if size is None or size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def wsgi_request(handler, method, path, body, headers, pieces, delay):
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': TrickleStream(split_body(body, pieces), delay),
+        'wsgi.errors': sys.stderr,
+    }
+    for name, value in {**COMMON_HEADERS, **headers}.items():
+        key = name.upper().replace('-', '_')
+        environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value
+
+    status = []
+    response = handler(environ, lambda s, h, exc_info=None: status.append(int(s.split()[0])))
+    try:
+        content = b''.join(response)
+    finally:
+        response.close()
+    return status[0], content
+
+
+async def asgi_request(app, method, path, body, headers, pieces, delay):
+    chunks = split_body(body, pieces)
+    finished = asyncio.Event()
+    response = {'body': bytearray()}
+
+    async def receive():
+        if chunks:
+            if delay:
+                await asyncio.sleep(delay)
+            chunk = chunks.pop(0)
+            return {'type': 'http.request', 'body': chunk, 'more_body': bool(chunks)}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'] += message.get('body', b'')
+            if not message.get('more_body'):
+                finished.set()
+
+    headers = {**COMMON_HEADERS, 'Content-Length': str(len(body)), **headers}
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+    await app(scope, receive, send)
+    finished.set()
+    return response['status'], bytes(response['body'])
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive concurrent chunked uploads from slow clients through the WSGI "
+        "and ASGI handlers in-process, while the mail queue drains through a "
+        "deliberately slow local SMTP server, and report upload capacity"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=64)
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help="WSGI worker threads, as in a threaded WSGI server (default: 8)",
+        )
+        parser.add_argument('--chunk-size', type=int, default=64 * 1024)
+        parser.add_argument(
+            '--trickle', type=float, default=1.0,
+            help="Seconds each client takes to send its chunk (default: 1)",
+        )
+        parser.add_argument('--pieces', type=int, default=8)
+        parser.add_argument('--emails', type=int, default=50)
+        parser.add_argument(
+            '--smtp-delay', type=float, default=0.2,
+            help="Seconds the SMTP stand-in takes to accept each message (default: 0.2)",
+        )
+        parser.add_argument('--handler', action='append', choices=['wsgi', 'asgi'])
+
+    def handle(self, *args, **options):
+        for name in options['handler'] or ['wsgi', 'asgi']:
+            with scratch_database() as workdir, SMTPSink(delay=options['smtp_delay']) as sink:
+                overrides = override_settings(
+                    MEDIA_ROOT=os.path.join(workdir, 'media'),
+                    CHUNKED_UPLOAD_DIR=os.path.join(workdir, 'chunks'),
+                    ALLOWED_HOSTS=['localhost'],
+                    **sink.email_settings(),
+                )
+                with overrides:
+                    token = self.seed(options)
+                    self.stdout.write(self.style.MIGRATE_HEADING(f"{name.upper()}"))
+                    self.report(options, sink, *self.run(name, token, options))
+
+    def seed(self, options):
+        candidate = Candidate.objects.create(email='loadtest@example.com')
+        enqueue_emails(
+            ('Your onboarding link', 'Welcome aboard.', f'invitee{i}@example.com', None)
+            for i in range(options['emails'])
+        )
+        return DocumentToken.objects.create(candidate=candidate).token
+
+    def run(self, name, token, options):
+        body = os.urandom(options['chunk_size'])
+        pieces = options['pieces']
+        delay = options['trickle'] / pieces
+        stop = threading.Event()
+
+        def drain_mail():
+            try:
+                while not stop.is_set() and sum(deliver_batch(batch_size=10)):
+                    pass
+            finally:
+                connections.close_all()
+
+        mailer = threading.Thread(target=drain_mail)
+        mailer.start()
+        started = time.perf_counter()
+        try:
+            if name == 'wsgi':
+                latencies = self.run_wsgi(token, body, pieces, delay, options['clients'], options['threads'])
+            else:
+                latencies = asyncio.run(self.run_asgi(token, body, pieces, delay, options['clients']))
+            wall = time.perf_counter() - started
+        finally:
+            stop.set()
+            mailer.join()
+        return latencies, wall
+
+    def run_wsgi(self, token, body, pieces, delay, clients, threads):
+        handler = WSGIHandler()
+        # Every client arrives at once; latency includes waiting for a thread
+        arrived = time.perf_counter()
+
+        def client(index):
+            flow = upload_flow(token, index, body)
+            try:
+                method, path, data, headers, slow = next(flow)
+                while True:
+                    response = wsgi_request(
+                        handler, method, path, data, headers, pieces if slow else 1, delay if slow else 0,
+                    )
+                    method, path, data, headers, slow = flow.send(response)
+            except StopIteration as done:
+                return time.perf_counter() - arrived if done.value else None
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(client, range(clients)))
+
+    async def run_asgi(self, token, body, pieces, delay, clients):
+        app = ASGIHandler()
+        arrived = time.perf_counter()
+
+        async def client(index):
+            flow = upload_flow(token, index, body)
+            try:
+                method, path, data, headers, slow = next(flow)
+                while True:
+                    response = await asgi_request(
+                        app, method, path, data, headers, pieces if slow else 1, delay if slow else 0,
+                    )
+                    method, path, data, headers, slow = flow.send(response)
+            except StopIteration as done:
+                return time.perf_counter() - arrived if done.value else None
+
+        return await asyncio.gather(*(client(i) for i in range(clients)))
+
+    def report(self, options, sink, latencies, wall):
+        done = sorted(t * 1000 for t in latencies if t is not None)
+        failed = len(latencies) - len(done)
+        if done:
+            p95 = done[min(len(done) - 1, int(len(done) * 0.95))]
+            timing = f"median {statistics.median(done):.0f} ms, p95 {p95:.0f} ms"
+        else:
+            timing = "no successful uploads"
+        self.stdout.write(
+            f"  {len(done)} uploads ({failed} failed) in {wall:.2f}s: "
+            f"{len(done) / wall:.1f} uploads/s, {timing}"
+        )
+        self.stdout.write(
+            f"  {Document.objects.count()} documents stored; "
+            f"{len(sink.messages)}/{options['emails']} queued emails delivered meanwhile"
+        )
@@ -0,0 +1,112 @@
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from candidate.models import Candidate
+from documents.benchmarking import scratch_database
+from documents.models import Document, DocumentStatus
+from documents.views import bulk_set_document_status, create_document
+from hrms_onboarding.database import sqlite_options
+
+PROFILES = {
+    # Django's SQLite defaults: rollback journal, deferred transactions
+    'default': {},
+    'tuned': sqlite_options(wal=True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run parallel uploaders and reviewers against a scratch SQLite "
+        "database and report throughput and lock errors for each "
+        "connection profile"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploaders', type=int, default=8)
+        parser.add_argument('--reviewers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--candidates', type=int, default=200)
+        parser.add_argument(
+            '--profile', action='append', choices=sorted(PROFILES),
+            help="Connection profile to run (default: all); may be repeated",
+        )
+
+    def handle(self, *args, **options):
+        for name in options['profile'] or ['default', 'tuned']:
+            with scratch_database(PROFILES[name]):
+                self.seed(options['candidates'])
+                self.stdout.write(self.style.MIGRATE_HEADING(f"Profile: {name}"))
+                self.report(self.run(options))
+
+    def seed(self, count):
+        candidates = Candidate.objects.bulk_create([
+            Candidate(email=f'bench{i}@example.com') for i in range(count)
+        ])
+        for candidate in candidates:
+            create_document(candidate, 'ID Proof', 'documents/bench.pdf')
+
+    def run(self, options):
+        candidate_ids = list(Candidate.objects.values_list('id', flat=True))
+        deadline = time.perf_counter() + options['seconds']
+        results = {'upload': [], 'review': []}
+        errors = {'upload': 0, 'review': 0}
+        lock = threading.Lock()
+
+        def upload():
+            candidate = Candidate(id=random.choice(candidate_ids))
+            create_document(candidate, 'Address Proof', 'documents/bench.pdf')
+
+        def review():
+            # What the dashboard and a bulk decision do: read the queue, then write
+            ids = list(
+                Document.objects.filter(status=DocumentStatus.PENDING)
+                .order_by('-uploaded_at', '-id').values_list('id', flat=True)[:5]
+            )
+            Document.objects.filter(status=DocumentStatus.PENDING).count()
+            if ids:
+                bulk_set_document_status(ids, random.choice([DocumentStatus.VERIFIED, DocumentStatus.REUPLOAD]))
+
+        def worker(kind, operation):
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation()
+                    except OperationalError:
+                        with lock:
+                            errors[kind] += 1
+                        continue
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        results[kind].append(elapsed)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=('upload', upload)) for _ in range(options['uploaders'])]
+        threads += [threading.Thread(target=worker, args=('review', review)) for _ in range(options['reviewers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        return results, errors, wall
+
+    def report(self, outcome):
+        results, errors, wall = outcome
+        for kind in ('upload', 'review'):
+            latencies = sorted(t * 1000 for t in results[kind])
+            done = len(latencies)
+            if done:
+                p95 = latencies[min(done - 1, int(done * 0.95))]
+                timing = f"median {statistics.median(latencies):.1f} ms, p95 {p95:.1f} ms"
+            else:
+                timing = "no successful operations"
+            self.stdout.write(
+                f"  {kind:<7} {done / wall:8.1f} ops/s, {errors[kind]:5d} 'database is locked' errors, {timing}"
+            )
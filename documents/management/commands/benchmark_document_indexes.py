@@ -0,0 +1,142 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from candidate.models import Candidate
+from documents.models import Document, DocumentStatus
+
+USER_EMAIL_INDEX_SQL = 'CREATE INDEX IF NOT EXISTS accounts_user_email_idx ON auth_user (email)'
+DROP_USER_EMAIL_INDEX_SQL = 'DROP INDEX IF EXISTS accounts_user_email_idx'
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded rows once the benchmark has finished"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed documents and report query plans and timings for the document "
+        "verification access paths with and without their indexes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=1_000_000)
+        parser.add_argument('--docs-per-candidate', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help="Commit the seeded rows instead of rolling them back",
+        )
+
+    def handle(self, *args, **options):
+        # SQLite only allows schema changes inside a transaction with
+        # foreign key checks switched off beforehand
+        try:
+            with connection.constraint_checks_disabled(), transaction.atomic():
+                self.seed(options)
+                self.stdout.write(self.style.MIGRATE_HEADING("Without indexes"))
+                self.drop_indexes()
+                before = self.run_queries(options['repeat'])
+                self.stdout.write(self.style.MIGRATE_HEADING("With indexes"))
+                self.create_indexes()
+                after = self.run_queries(options['repeat'])
+                self.report(before, after)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write("Seeded rows rolled back")
+
+    def seed(self, options):
+        total = options['documents']
+        per_candidate = options['docs_per_candidate']
+        batch_size = options['batch_size']
+        prefix = f'bench{int(time.time())}'
+
+        started = time.perf_counter()
+        candidates = Candidate.objects.bulk_create(
+            (Candidate(email=f'{prefix}-{i}@example.com', name=f'Candidate {i}')
+             for i in range(total // per_candidate + 1)),
+            batch_size=batch_size,
+        )
+        # Roughly one candidate in ten already has an account
+        User.objects.bulk_create(
+            (User(username=f'{prefix}-{c.id}', email=c.email) for c in candidates[::10]),
+            batch_size=batch_size,
+        )
+
+        # Most documents have been reviewed; only a small tail is pending
+        statuses = [DocumentStatus.VERIFIED] * 8 + [DocumentStatus.PENDING, DocumentStatus.REUPLOAD]
+        batch = []
+        for i in range(total):
+            batch.append(Document(
+                candidate=candidates[i // per_candidate],
+                document_type=random.choice(['ID Proof', 'Address Proof', 'Degree', 'Photo']),
+                file=f'documents/bench-{i}.pdf',
+                status=random.choice(statuses),
+            ))
+            if len(batch) == batch_size:
+                Document.objects.bulk_create(batch)
+                batch = []
+        Document.objects.bulk_create(batch)
+
+        self.sample_candidate = candidates[len(candidates) // 2]
+        self.stdout.write(
+            f"Seeded {total} documents for {len(candidates)} candidates "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model in (Document, Candidate):
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute(DROP_USER_EMAIL_INDEX_SQL)
+            cursor.execute('ANALYZE')
+
+    def create_indexes(self):
+        with connection.schema_editor() as editor:
+            for model in (Document, Candidate):
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute(USER_EMAIL_INDEX_SQL)
+            cursor.execute('ANALYZE')
+
+    def queries(self):
+        candidate = self.sample_candidate
+        return {
+            'pending queue': Document.objects.filter(
+                status=DocumentStatus.PENDING
+            ).order_by('-uploaded_at', '-id')[:25],
+            'candidate uploads': Document.objects.filter(
+                candidate=candidate
+            ).order_by('-uploaded_at'),
+            'candidate listing': Candidate.objects.order_by('-created_at', '-id')[:25],
+            'account by email': User.objects.filter(email=candidate.email),
+        }
+
+    def run_queries(self, repeat):
+        timings = {}
+        for name, queryset in self.queries().items():
+            self.stdout.write(self.style.SQL_KEYWORD(name))
+            self.stdout.write(queryset.explain())
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(samples)
+        return timings
+
+    def report(self, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING("Median query time (ms)"))
+        self.stdout.write(f"{'query':<20}{'before':>12}{'after':>12}{'speedup':>10}")
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float('inf')
+            self.stdout.write(f"{name:<20}{before[name]:>12.3f}{after[name]:>12.3f}{speedup:>9.1f}x")
@@ -0,0 +1,108 @@
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from documents.ingest import IMAGE_EXTENSIONS, normalise_image
+
+
+def timed_normalise(path, max_dimension, quality):
+    """normalise_image plus what the benchmark needs: (seconds, bytes in, bytes out)"""
+    started = time.perf_counter()
+    result = normalise_image(path, max_dimension, quality)
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(path)
+    return elapsed, size, len(result[0]) if result else size
+
+
+def synthetic_photo(path, width, height, seed):
+    """A noisy gradient saved like a phone camera would: high-quality JPEG,
+    stored sideways with an EXIF orientation tag and camera metadata"""
+    noise = Image.effect_noise((width // 4, height // 4), 40 + seed % 20).resize((width, height))
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', (noise, gradient, Image.blend(noise, gradient, 0.5)))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW to display
+    exif[0x010F] = 'Phone Maker'
+    exif[0x0110] = 'Phone Model'
+    image.save(path, 'JPEG', quality=95, exif=exif)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the image ingest stage: bytes saved and per-image latency, "
+        "serially and across a process pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=24)
+        parser.add_argument('--width', type=int, default=4032)
+        parser.add_argument('--height', type=int, default=3024)
+        parser.add_argument(
+            '--source',
+            help="Directory of real images to use instead of generated photos",
+        )
+        parser.add_argument(
+            '--workers', type=int, action='append',
+            help="Pool sizes to compare (default: 1 and one per CPU); may be repeated",
+        )
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp()
+        try:
+            paths = self.sample_images(workdir, options)
+            if not paths:
+                raise CommandError("No images to benchmark")
+            total_in = sum(os.path.getsize(p) for p in paths)
+            self.stdout.write(
+                f"{len(paths)} images, {total_in / 1024 / 1024:.1f} MB in, "
+                f"max dimension {settings.DOCUMENT_IMAGE_MAX_DIMENSION}px, "
+                f"quality {settings.DOCUMENT_IMAGE_QUALITY}"
+            )
+            for workers in options['workers'] or sorted({1, os.cpu_count() or 1}):
+                self.run(paths, workers)
+        finally:
+            shutil.rmtree(workdir)
+
+    def sample_images(self, workdir, options):
+        if options['source']:
+            return sorted(
+                os.path.join(options['source'], name) for name in os.listdir(options['source'])
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+            )
+        paths = []
+        for i in range(options['images']):
+            path = os.path.join(workdir, f'photo{i}.jpg')
+            synthetic_photo(path, options['width'], options['height'], i)
+            paths.append(path)
+        return paths
+
+    def run(self, paths, workers):
+        args = (settings.DOCUMENT_IMAGE_MAX_DIMENSION, settings.DOCUMENT_IMAGE_QUALITY)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Start the workers before timing so process start-up isn't counted
+            list(pool.map(abs, range(workers)))
+            started = time.perf_counter()
+            results = list(pool.map(timed_normalise, paths, *[[a] * len(paths) for a in args]))
+            wall = time.perf_counter() - started
+
+        latencies = sorted(r[0] * 1000 for r in results)
+        bytes_in = sum(r[1] for r in results)
+        bytes_out = sum(r[2] for r in results)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{workers} worker(s)"))
+        self.stdout.write(
+            f"  saved {(bytes_in - bytes_out) / 1024 / 1024:.1f} MB "
+            f"({100 * (bytes_in - bytes_out) / bytes_in:.0f}%), "
+            f"{bytes_in / len(results) / 1024:.0f} KB -> {bytes_out / len(results) / 1024:.0f} KB per image"
+        )
+        self.stdout.write(
+            f"  latency per image: median {statistics.median(latencies):.0f} ms, "
+            f"p95 {p95:.0f} ms; wall {wall:.2f}s, {len(results) / wall:.1f} images/s"
+        )
@@ -0,0 +1,62 @@
+import os
+import time
+
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.storage import ContentAddressedStorage, referenced_names
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed blobs that no document or candidate references"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--storage', default='default',
+            help="STORAGES alias to scan, e.g. originals (default: default)",
+        )
+        parser.add_argument(
+            '--prefix', action='append', dest='prefixes',
+            help="upload_to directory to scan (default: documents and previews, "
+                 "or originals for the originals storage); may be repeated",
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help="Only delete blobs untouched for this many seconds, so uploads "
+                 "whose document row isn't committed yet are left alone",
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        storage = storages[options['storage']]
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError(f"The {options['storage']} storage is not ContentAddressedStorage")
+        default_prefixes = ['originals'] if options['storage'] == 'originals' else ['documents', 'previews']
+
+        cutoff = time.time() - options['min_age']
+        scanned = deleted = freed = 0
+        for prefix in options['prefixes'] or default_prefixes:
+            # One query per shard keeps memory flat however many blobs there are
+            for names in storage.iter_shards(prefix):
+                scanned += len(names)
+                if not names:
+                    continue
+                referenced = referenced_names(names)
+                for name in names:
+                    if name in referenced:
+                        continue
+                    path = storage.path(name)
+                    stat = os.stat(path)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    if options['dry_run']:
+                        self.stdout.write(f"Would delete {name}")
+                    else:
+                        os.remove(path)
+                    deleted += 1
+                    freed += stat.st_size
+
+        verb = "Would free" if options['dry_run'] else "Freed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} blobs, {deleted} orphaned. {verb} {freed / 1024 / 1024:.1f} MB"
+        ))
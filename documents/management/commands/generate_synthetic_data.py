@@ -0,0 +1,133 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile, UserRole
+from candidate.models import CANDIDATE_TOKEN_LIFETIME, Candidate, CandidateStatus, CandidateToken
+from documents.models import (
+    Document, DocumentStatus, DocumentToken, IngestStatus, PreviewStatus, rebuild_document_counts,
+)
+
+DOCUMENT_TYPES = ['ID Proof', 'Address Proof', 'Resume', 'Degree Certificate', 'Offer Letter', 'Payslip']
+BLOB_HEADER = b'%PDF-1.4\n%synthetic\n'
+
+
+def synthetic_blob(rng, size):
+    """``size`` bytes of file content that doesn't compress or dedupe"""
+    return BLOB_HEADER + rng.randbytes(max(size - len(BLOB_HEADER), 0))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic candidates, tokens, documents (with real file "
+        "blobs) and user accounts in bulk, to reproduce production volumes "
+        "locally"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=500)
+        parser.add_argument('--documents', type=int, default=3, help="Documents per onboarded candidate")
+        parser.add_argument('--file-size', type=int, default=64 * 1024, help="Bytes per document file")
+        parser.add_argument(
+            '--onboarded', type=float, default=0.7,
+            help="Share of candidates who completed their profile and uploaded documents (default: 0.7)",
+        )
+        parser.add_argument(
+            '--verified', type=float, default=0.3,
+            help="Share of onboarded candidates whose documents are all verified and "
+                 "who have an employee account (default: 0.3)",
+        )
+        parser.add_argument('--password', default='synthetic', help="Password for the generated accounts")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--seed', type=int, help="Random seed, for repeatable data")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Tags this run's rows so the command can be run again on the same database
+        run = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+        password = make_password(options['password'])
+        totals = {'candidates': 0, 'documents': 0, 'users': 0, 'bytes': 0}
+        started = time.perf_counter()
+
+        batch_size = options['batch_size']
+        for offset in range(0, options['candidates'], batch_size):
+            count = min(batch_size, options['candidates'] - offset)
+            with transaction.atomic():
+                self.generate_batch(rng, run, offset, count, password, options, totals)
+            self.stdout.write(f"  {offset + count}/{options['candidates']} candidates")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {totals['candidates']} candidates, {totals['documents']} documents "
+            f"({totals['bytes'] / 1024 / 1024:.1f} MB) and {totals['users']} accounts "
+            f"in {elapsed:.1f}s (run {run})"
+        ))
+
+    def generate_batch(self, rng, run, offset, count, password, options, totals):
+        now = timezone.now()
+        candidates = []
+        for i in range(offset, offset + count):
+            onboarded = rng.random() < options['onboarded']
+            candidates.append(Candidate(
+                email=f'synthetic-{run}-{i}@example.com',
+                name=f'Synthetic {run} {i}' if onboarded else '',
+                phone=f'555{rng.randrange(10 ** 7):07d}' if onboarded else '',
+                status=CandidateStatus.PROFILE_COMPLETED if onboarded else CandidateStatus.INVITED,
+            ))
+        candidates = Candidate.objects.bulk_create(candidates)
+        # Spread sign-up times over the last 60 days; auto_now_add ignores bulk values
+        for candidate in candidates:
+            candidate.created_at = now - timedelta(minutes=rng.randrange(60 * 24 * 60))
+        Candidate.objects.bulk_update(candidates, ['created_at'])
+
+        invited = [c for c in candidates if c.status == CandidateStatus.INVITED]
+        onboarded = [c for c in candidates if c.status == CandidateStatus.PROFILE_COMPLETED]
+        CandidateToken.objects.bulk_create(
+            CandidateToken(candidate=c, expires_at=now + CANDIDATE_TOKEN_LIFETIME) for c in invited
+        )
+        DocumentToken.objects.bulk_create(
+            DocumentToken(candidate=c, expires_at=now + timedelta(days=7)) for c in onboarded
+        )
+
+        verified = {c.id for c in onboarded if rng.random() < options['verified']}
+        documents = []
+        for candidate in onboarded:
+            for document_type in rng.sample(DOCUMENT_TYPES, min(options['documents'], len(DOCUMENT_TYPES))):
+                data = synthetic_blob(rng, options['file_size'])
+                totals['bytes'] += len(data)
+                if candidate.id in verified:
+                    status = DocumentStatus.VERIFIED
+                else:
+                    status = rng.choice([DocumentStatus.PENDING] * 3 + [DocumentStatus.VERIFIED, DocumentStatus.REUPLOAD])
+                documents.append(Document(
+                    candidate=candidate,
+                    document_type=document_type,
+                    file=default_storage.save('documents/synthetic.pdf', ContentFile(data)),
+                    status=status,
+                    ingest_status=IngestStatus.UNCHANGED,
+                    preview_status=PreviewStatus.UNAVAILABLE,
+                ))
+        Document.objects.bulk_create(documents)
+        rebuild_document_counts(Candidate.objects.filter(id__in=[c.id for c in onboarded]))
+
+        # Verified candidates have had their credentials sent. bulk_create
+        # skips the signal that gives new users a profile, so add them here
+        users = User.objects.bulk_create(
+            User(username=f'synthetic-{run}-{c.id}', email=c.email, password=password,
+                 first_name='Synthetic', last_name=f'{run} {c.id}')
+            for c in onboarded if c.id in verified
+        )
+        UserProfile.objects.bulk_create(UserProfile(user=user, role=UserRole.EMPLOYEE) for user in users)
+
+        totals['candidates'] += len(candidates)
+        totals['documents'] += len(documents)
+        totals['users'] += len(users)
@@ -0,0 +1,268 @@
+import http.cookiejar
+import logging
+import os
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connections
+from django.test.utils import override_settings
+
+from candidate.models import Candidate
+from documents.benchmarking import scratch_database
+from notifications.mail import deliver_batch
+from notifications.smtp_sink import SMTPSink
+
+STEPS = [
+    'invite', 'invite_email', 'onboard_form', 'onboard_submit', 'upload_page',
+    'upload', 'verify', 'credentials', 'credentials_email',
+]
+ONBOARDING_LINK_RE = re.compile(rb'/candidate/onboard/([0-9a-f-]{36})/')
+DOCUMENT_LINK_RE = re.compile(r'/documents/upload/[0-9a-f-]{36}/file/(\d+)/')
+HR_PASSWORD = 'loadtest-pass-1234'
+
+
+class FlowFailed(Exception):
+    pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Each request is timed on its own; redirects are followed by the flow
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Browser:
+    """A cookie-keeping HTTP client that sends the CSRF token like a form would"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect)
+
+    def csrf_token(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def request(self, path, data=None, files=None):
+        """(status, body, location) for a GET, or a POST when data is given"""
+        headers = {}
+        body = None
+        if data is not None or files:
+            fields = {**(data or {}), 'csrfmiddlewaretoken': self.csrf_token()}
+            if files:
+                boundary = uuid.uuid4().hex
+                body = multipart_body(boundary, fields, files)
+                headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+            else:
+                body = urlencode(fields).encode()
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.read(), response.headers.get('Location')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), e.headers.get('Location')
+
+
+def multipart_body(boundary, fields, files):
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the invite -> onboard -> upload -> verify -> credentials flow "
+        "concurrently against a local server on a scratch database, with a "
+        "local SMTP sink, and report throughput and latency per step"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flows', type=int, default=50, help="Candidates to take through onboarding")
+        parser.add_argument('--concurrency', type=int, default=8, help="Flows running at once")
+        parser.add_argument('--documents', type=int, default=3, help="Documents uploaded per candidate")
+        parser.add_argument('--file-size', type=int, default=256 * 1024)
+        parser.add_argument('--smtp-delay', type=float, default=0, help="Seconds the SMTP sink takes per message")
+        parser.add_argument(
+            '--seed-candidates', type=int, default=0,
+            help="Synthetic candidates to generate first, so the flow runs against a full database",
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database() as workdir, SMTPSink(delay=options['smtp_delay']) as sink:
+            overrides = override_settings(
+                MEDIA_ROOT=os.path.join(workdir, 'media'),
+                CHUNKED_UPLOAD_DIR=os.path.join(workdir, 'chunks'),
+                ALLOWED_HOSTS=['127.0.0.1'],
+                **sink.email_settings(),
+            )
+            with overrides:
+                if options['seed_candidates']:
+                    call_command('generate_synthetic_data', candidates=options['seed_candidates'], verbosity=0)
+                User.objects.create_user('loadtest-hr', password=HR_PASSWORD)
+                self.report(*self.run(sink, options))
+
+    def run(self, sink, options):
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+        server.set_app(WSGIHandler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+        stop = threading.Event()
+        mailer = threading.Thread(target=self.deliver_mail, args=(stop,))
+        mailer.start()
+        # The report covers what the per-request log lines would say
+        request_log = logging.getLogger('hrms.requests')
+        level = request_log.level
+        request_log.setLevel(logging.ERROR)
+
+        timings = defaultdict(list)
+        lock = threading.Lock()
+        reviewers = threading.local()
+
+        def record(step, started):
+            with lock:
+                timings[step].append(time.perf_counter() - started)
+
+        def flow(index):
+            try:
+                if not hasattr(reviewers, 'browser'):
+                    # One logged-in HR reviewer per worker thread
+                    reviewers.browser = self.login(base_url)
+                self.onboard(index, base_url, reviewers.browser, sink, record, options)
+                return True
+            except FlowFailed as e:
+                self.stderr.write(f"  flow {index}: {e}")
+                return False
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                completed = sum(pool.map(flow, range(options['flows'])))
+            wall = time.perf_counter() - started
+        finally:
+            request_log.setLevel(level)
+            stop.set()
+            mailer.join()
+            server.shutdown()
+            server.server_close()
+        return timings, completed, wall, options['flows']
+
+    def deliver_mail(self, stop):
+        """What the send_queued_emails worker does, polling more often"""
+        try:
+            while not stop.is_set():
+                sent, failed = deliver_batch()
+                if not sent and not failed:
+                    stop.wait(0.05)
+        finally:
+            connections.close_all()
+
+    def login(self, base_url):
+        browser = Browser(base_url)
+        browser.request('/accounts/login/')
+        status, _, _ = browser.request('/accounts/login/', {'username': 'loadtest-hr', 'password': HR_PASSWORD})
+        if status != 302:
+            raise FlowFailed(f"HR login failed with {status}")
+        return browser
+
+    def wait_for_email(self, sink, recipient, subject, timeout=60):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with sink.lock:
+                for message in sink.messages:
+                    if recipient in message['recipients'] and subject in message['data']:
+                        return message
+            time.sleep(0.02)
+        raise FlowFailed(f"no {subject.decode()!r} email for {recipient}")
+
+    def step(self, record, name, browser, path, data=None, files=None, expect=200):
+        started = time.perf_counter()
+        status, body, location = browser.request(path, data, files)
+        record(name, started)
+        if status != expect:
+            raise FlowFailed(f"{name}: {path} answered {status}, expected {expect}")
+        return body, location
+
+    def onboard(self, index, base_url, hr, sink, record, options):
+        email = f'loadtest-{index}@example.com'
+
+        self.step(record, 'invite', hr, '/candidate/create/', {'email': email})
+        started = time.perf_counter()
+        invitation = self.wait_for_email(sink, email, b'Complete Your Onboarding')
+        record('invite_email', started)
+        token = ONBOARDING_LINK_RE.search(invitation['data']).group(1).decode()
+
+        candidate = Browser(base_url)
+        self.step(record, 'onboard_form', candidate, f'/candidate/onboard/{token}/')
+        _, upload_url = self.step(
+            record, 'onboard_submit', candidate, f'/candidate/onboard/{token}/',
+            {'name': f'Load Test {index}', 'phone': '5550100'}, expect=302,
+        )
+        self.step(record, 'upload_page', candidate, upload_url)
+        for n in range(options['documents']):
+            self.step(
+                record, 'upload', candidate, upload_url, {'document_type': f'Document {n}'},
+                files={'file': (f'document{n}.pdf', os.urandom(options['file_size']))}, expect=302,
+            )
+
+        page, _ = self.step(record, 'upload_page', candidate, upload_url)
+        document_ids = DOCUMENT_LINK_RE.findall(page.decode())
+        if len(document_ids) != options['documents']:
+            raise FlowFailed(f"upload page lists {len(document_ids)} documents")
+        for document_id in document_ids:
+            self.step(record, 'verify', hr, f'/documents/verify/{document_id}/', {'action': 'verify'}, expect=302)
+
+        # The dashboard's credentials button carries the candidate id
+        candidate_id = Candidate.objects.filter(email=email).values_list('id', flat=True).get()
+        self.step(record, 'credentials', hr, f'/documents/hr/send-credentials/{candidate_id}/', {}, expect=302)
+        started = time.perf_counter()
+        self.wait_for_email(sink, email, b'Your HRMS Login Credentials')
+        record('credentials_email', started)
+
+    def report(self, timings, completed, wall, flows):
+        requests = sum(len(timings[step]) for step in STEPS if not step.endswith('_email'))
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{completed}/{flows} flows completed in {wall:.1f}s: "
+            f"{completed / wall:.2f} flows/s, {requests / wall:.1f} requests/s"
+        ))
+        self.stdout.write(f"  {'step':<18}{'count':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for step in STEPS:
+            latencies = sorted(t * 1000 for t in timings[step])
+            if not latencies:
+                continue
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f"  {step:<18}{len(latencies):>6}{statistics.median(latencies):>9.0f}{p95:>9.0f}{p99:>9.0f}"
+            )
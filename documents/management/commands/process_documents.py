@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from documents.ingest import normalise_documents
+from documents.previews import generate_previews
+
+
+class Command(BaseCommand):
+    help = (
+        "Process uploaded documents in a pool of worker processes: normalise "
+        "images (orientation, EXIF, size), then generate thumbnails"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Worker processes (default: one per CPU)",
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for new uploads instead of exiting once done",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help="Seconds to sleep between polls when there is nothing to do (with --loop)",
+        )
+
+    def handle(self, *args, **options):
+        ingest_totals = [0, 0, 0]
+        preview_totals = [0, 0, 0]
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                ingest = normalise_documents(options['batch_size'], pool)
+                previews = generate_previews(options['batch_size'], pool)
+                ingest_totals = [t + c for t, c in zip(ingest_totals, ingest)]
+                preview_totals = [t + c for t, c in zip(preview_totals, previews)]
+                if any(ingest) or any(previews):
+                    self.stdout.write(
+                        "Normalised {}, unchanged {}, failed {}; ".format(*ingest)
+                        + "previews ready {}, unavailable {}, failed {}".format(*previews)
+                    )
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            "Images: {} normalised, {} unchanged, {} failed. ".format(*ingest_totals)
+            + "Previews: {} ready, {} unavailable, {} failed".format(*preview_totals)
+        ))
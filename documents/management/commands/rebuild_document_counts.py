@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from documents.models import rebuild_document_counts, stale_document_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or with --check, verify) the per-candidate document counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only report candidates whose counters are out of date",
+        )
+
+    def handle(self, *args, **options):
+        stale = list(stale_document_counts().values_list('email', flat=True))
+
+        if options['check']:
+            for email in stale:
+                self.stdout.write(f"Stale counters: {email}")
+            if stale:
+                raise CommandError(f"{len(stale)} candidate(s) have stale document counters")
+            self.stdout.write(self.style.SUCCESS("All document counters are up to date"))
+            return
+
+        with transaction.atomic():
+            updated = rebuild_document_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt document counters for {updated} candidates ({len(stale)} were stale)"
+        ))
@@ -0,0 +1,26 @@
+# Generated by Django 5.1 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0003_candidate_candidate_created_idx'),
+        ('documents', '0002_documenttoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['status', '-uploaded_at', '-id'], name='document_status_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['candidate', '-uploaded_at'], name='document_candidate_upload_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['-uploaded_at', '-id'], name='document_pending_idx'),
+        ),
+    ]
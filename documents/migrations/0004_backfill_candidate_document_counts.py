@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-18 20:05
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Candidate = apps.get_model('candidate', 'Candidate')
+    Document = apps.get_model('documents', 'Document')
+
+    def count(**filters):
+        documents = Document.objects.filter(candidate=OuterRef('pk'), **filters)
+        return Coalesce(
+            Subquery(documents.order_by().values('candidate').annotate(n=Count('id')).values('n')),
+            Value(0),
+        )
+
+    Candidate.objects.update(
+        total_docs=count(),
+        pending_docs=count(status='PENDING'),
+        verified_docs=count(status='VERIFIED'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0004_candidate_document_counts'),
+        ('documents', '0003_document_document_status_uploaded_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
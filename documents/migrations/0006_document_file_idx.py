@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0004_candidate_document_counts'),
+        ('documents', '0005_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['file'], name='document_file_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0004_candidate_document_counts'),
+        ('documents', '0006_document_file_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='preview',
+            field=models.FileField(blank=True, upload_to='previews/'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='preview_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('UNAVAILABLE', 'Unavailable'), ('FAILED', 'Failed')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['preview'], name='document_preview_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(condition=models.Q(('preview_status', 'PENDING')), fields=['id'], name='document_preview_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1 on 2026-10-18 20:17
+
+import documents.models
+from django.db import migrations, models
+
+
+def backfill_ingest_status(apps, schema_editor):
+    # Documents uploaded before the ingest stage are left as they are
+    Document = apps.get_model('documents', 'Document')
+    Document.objects.update(ingest_status='UNCHANGED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0004_candidate_document_counts'),
+        ('documents', '0007_document_preview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='ingest_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('NORMALISED', 'Normalised'), ('UNCHANGED', 'Unchanged'), ('FAILED', 'Failed')], default='PENDING', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='original',
+            field=models.FileField(blank=True, storage=documents.models.originals_storage, upload_to='originals/'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['original'], name='document_original_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(condition=models.Q(('ingest_status', 'PENDING')), fields=['id'], name='document_ingest_pending_idx'),
+        ),
+        migrations.RunPython(backfill_ingest_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_document_ingest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documenttoken',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1 on 2026-10-18 21:14
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def supersede_replaced_documents(apps, schema_editor):
+    """Retire re-upload requests the candidate has already answered with a
+    newer document of the same type, and recount total_docs without them"""
+    Candidate = apps.get_model('candidate', 'Candidate')
+    Document = apps.get_model('documents', 'Document')
+
+    newer = Document.objects.filter(
+        candidate=OuterRef('candidate'), document_type=OuterRef('document_type'), id__gt=OuterRef('id'),
+    )
+    if not Document.objects.filter(Exists(newer), status='REUPLOAD').update(status='SUPERSEDED'):
+        return
+    current = Document.objects.filter(candidate=OuterRef('pk')).exclude(status='SUPERSEDED')
+    Candidate.objects.update(total_docs=Coalesce(
+        Subquery(current.order_by().values('candidate').annotate(n=Count('id')).values('n')),
+        Value(0),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0004_candidate_document_counts'),
+        ('documents', '0009_documenttoken_expires_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('VERIFIED', 'Verified'), ('REUPLOAD', 'Re-upload Required'), ('SUPERSEDED', 'Superseded')], default='PENDING', max_length=20),
+        ),
+        migrations.RunPython(supersede_replaced_documents, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,10 @@
-from django.db import models
+from collections import Counter
+from pathlib import Path
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from candidate.models import Candidate
 import uuid
 from django.utils import timezone
@@ -8,6 +14,36 @@ class DocumentStatus(models.TextChoices):
     PENDING = "PENDING", "Pending"
     VERIFIED = "VERIFIED", "Verified"
     REUPLOAD = "REUPLOAD", "Re-upload Required"
+    SUPERSEDED = "SUPERSEDED", "Superseded"
+
+# Allowed status changes. A reviewed document never goes back to pending,
+# and a re-upload request is final: the candidate answers it with a new
+# document of the same type, which supersedes it (see supersede_documents).
+STATUS_TRANSITIONS = {
+    DocumentStatus.PENDING: {DocumentStatus.VERIFIED, DocumentStatus.REUPLOAD},
+    DocumentStatus.VERIFIED: {DocumentStatus.REUPLOAD},
+    DocumentStatus.REUPLOAD: {DocumentStatus.SUPERSEDED},
+    DocumentStatus.SUPERSEDED: set(),
+}
+
+def transition_sources(status):
+    """Statuses a document may move to ``status`` from"""
+    return [source for source, targets in STATUS_TRANSITIONS.items() if status in targets]
+
+class PreviewStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    READY = "READY", "Ready"
+    UNAVAILABLE = "UNAVAILABLE", "Unavailable"
+    FAILED = "FAILED", "Failed"
+
+class IngestStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    NORMALISED = "NORMALISED", "Normalised"
+    UNCHANGED = "UNCHANGED", "Unchanged"
+    FAILED = "FAILED", "Failed"
+
+def originals_storage():
+    return storages["originals"]
 
 class Document(models.Model):
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
@@ -20,15 +56,146 @@ class Document(models.Model):
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Images are re-encoded by the ingest worker; the upload as received is
+    # only kept (in the "originals" storage) with DOCUMENT_KEEP_ORIGINALS
+    ingest_status = models.CharField(
+        max_length=20,
+        choices=IngestStatus.choices,
+        default=IngestStatus.PENDING
+    )
+    original = models.FileField(upload_to="originals/", storage=originals_storage, blank=True)
+
+    # Small JPEG thumbnail, filled in by the process_documents worker
+    preview = models.FileField(upload_to="previews/", blank=True)
+    preview_status = models.CharField(
+        max_length=20,
+        choices=PreviewStatus.choices,
+        default=PreviewStatus.PENDING
+    )
+
+    class Meta:
+        indexes = [
+            # HR dashboard: documents filtered by status, newest first
+            models.Index(fields=['status', '-uploaded_at', '-id'], name='document_status_uploaded_idx'),
+            # Candidate upload page: a candidate's documents, newest first
+            models.Index(fields=['candidate', '-uploaded_at'], name='document_candidate_upload_idx'),
+            # Pending verification queue, kept small by only covering pending rows
+            models.Index(
+                fields=['-uploaded_at', '-id'],
+                condition=models.Q(status='PENDING'),
+                name='document_pending_idx',
+            ),
+            # Reference lookups for shared content-addressed blobs
+            models.Index(fields=['file'], name='document_file_idx'),
+            models.Index(fields=['preview'], name='document_preview_idx'),
+            models.Index(fields=['original'], name='document_original_idx'),
+            # Ingest and preview worker queues
+            models.Index(
+                fields=['id'],
+                condition=models.Q(ingest_status='PENDING'),
+                name='document_ingest_pending_idx',
+            ),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(preview_status='PENDING'),
+                name='document_preview_pending_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.candidate.email} - {self.document_type}"
 
 
+# Candidate counter field for each document status that has one
+STATUS_COUNTERS = {
+    DocumentStatus.PENDING: 'pending_docs',
+    DocumentStatus.VERIFIED: 'verified_docs',
+}
+
+
+def counts_in_total(status):
+    # Superseded documents are history, not part of the candidate's file
+    return status is not None and status != DocumentStatus.SUPERSEDED
+
+
+def adjust_document_counts(candidate_id, old_status=None, new_status=None, count=1):
+    """Apply ``count`` documents being added, changing status or removed to
+    the candidate's counters. Call inside the transaction that changes them."""
+    deltas = {'total_docs': (counts_in_total(new_status) - counts_in_total(old_status)) * count}
+    if old_status in STATUS_COUNTERS:
+        field = STATUS_COUNTERS[old_status]
+        deltas[field] = deltas.get(field, 0) - count
+    if new_status in STATUS_COUNTERS:
+        field = STATUS_COUNTERS[new_status]
+        deltas[field] = deltas.get(field, 0) + count
+
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if changes:
+        Candidate.objects.filter(pk=candidate_id).update(**changes)
+
+
+def document_count_expressions():
+    """Correlated subqueries computing each counter from the document table"""
+    def count(**filters):
+        documents = Document.objects.filter(candidate=OuterRef('pk'), **filters)
+        return Coalesce(
+            Subquery(documents.order_by().values('candidate').annotate(n=Count('id')).values('n')),
+            Value(0),
+        )
+
+    counts = {'total_docs': count(status__in=[s for s in DocumentStatus.values if counts_in_total(s)])}
+    for status, field in STATUS_COUNTERS.items():
+        counts[field] = count(status=status)
+    return counts
+
+
+def supersede_documents(candidate_id, document_type):
+    """Retire the candidate's documents of ``document_type`` that HR asked to
+    have re-uploaded, now that a replacement has arrived. Call inside the
+    transaction that saves the replacement."""
+    superseded = Document.objects.filter(
+        candidate_id=candidate_id, document_type=document_type, status=DocumentStatus.REUPLOAD,
+    ).update(status=DocumentStatus.SUPERSEDED)
+    if superseded:
+        adjust_document_counts(candidate_id, DocumentStatus.REUPLOAD, DocumentStatus.SUPERSEDED, superseded)
+    return superseded
+
+
+def delete_documents(documents):
+    """Delete a queryset of documents and take them off their candidates'
+    counters. Returns how many were deleted."""
+    with transaction.atomic():
+        rows = list(documents.select_for_update().values_list('id', 'candidate_id', 'status'))
+        Document.objects.filter(id__in=[doc_id for doc_id, _, _ in rows]).delete()
+        for (candidate_id, status), count in Counter((c, s) for _, c, s in rows).items():
+            adjust_document_counts(candidate_id, status, None, count)
+    return len(rows)
+
+
+def rebuild_document_counts(candidates=None):
+    """Recompute the counters from scratch in one UPDATE; returns rows updated"""
+    if candidates is None:
+        candidates = Candidate.objects.all()
+    return candidates.update(**document_count_expressions())
+
+
+def stale_document_counts(candidates=None):
+    """Candidates whose stored counters disagree with their documents"""
+    if candidates is None:
+        candidates = Candidate.objects.all()
+    expressions = document_count_expressions()
+    candidates = candidates.annotate(**{f'actual_{field}': e for field, e in expressions.items()})
+    mismatch = Q()
+    for field in expressions:
+        mismatch |= ~Q(**{field: F(f'actual_{field}')})
+    return candidates.filter(mismatch)
+
+
 class DocumentToken(models.Model):
     candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE)
     token = models.UUIDField(default=uuid.uuid4, unique=True)
     is_used = models.BooleanField(default=False)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.expires_at:
@@ -37,3 +204,24 @@ class DocumentToken(models.Model):
 
     def is_valid(self):
         return not self.is_used and timezone.now() < self.expires_at
+
+
+class UploadSession(models.Model):
+    """A chunked upload in progress. The bytes received so far are kept in a
+    partial file under CHUNKED_UPLOAD_DIR until the upload is finalized."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
+    document_type = models.CharField(max_length=100)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    checksum = models.CharField(max_length=64)  # SHA-256 hex digest of the whole file
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.candidate.email} - {self.filename} ({self.received}/{self.size})"
+
+    @property
+    def partial_path(self):
+        return Path(settings.CHUNKED_UPLOAD_DIR) / f"{self.id}.part"
@@ -0,0 +1,71 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a page_size query param, clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, pk) for a cursor, or None if it is missing/invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """One page of a queryset ordered newest first by (field, id)"""
+
+    def __init__(self, queryset, field, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+        self.field = field
+        self.cursor = cursor
+        self.page_size = page_size
+
+        position = decode_cursor(cursor)
+        if position:
+            timestamp, pk = position
+            # Seek past the last row of the previous page instead of using OFFSET
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk})
+            )
+
+        rows = list(queryset.order_by(f'-{field}', '-id')[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.object_list = rows[:page_size]
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(getattr(last, self.field), last.id)
+
+    @property
+    def is_first(self):
+        return decode_cursor(self.cursor) is None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
@@ -0,0 +1,95 @@
+import io
+import logging
+import os
+import shutil
+import subprocess
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Document, IngestStatus, PreviewStatus
+
+PREVIEW_SIZE = (320, 320)
+PREVIEW_QUALITY = 80
+BATCH_SIZE = 50
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+
+
+def thumbnail_jpeg(image):
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(PREVIEW_SIZE)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=PREVIEW_QUALITY, optimize=True)
+    return out.getvalue()
+
+
+def pdf_first_page(path):
+    """First page of a PDF as a PIL image, or None without poppler's pdftoppm"""
+    pdftoppm = shutil.which('pdftoppm')
+    if not pdftoppm:
+        return None
+    result = subprocess.run(
+        [pdftoppm, '-f', '1', '-l', '1', '-scale-to', str(max(PREVIEW_SIZE)), '-png', path],
+        capture_output=True, timeout=60, check=True,
+    )
+    return Image.open(io.BytesIO(result.stdout))
+
+
+def render_preview(path):
+    """Thumbnail JPEG bytes for the file at path, or None if it has no preview.
+    Runs in a worker process, so it only touches the file system."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.pdf':
+        image = pdf_first_page(path)
+        return thumbnail_jpeg(image) if image else None
+    if ext in IMAGE_EXTENSIONS:
+        with Image.open(path) as image:
+            # draft() lets the JPEG decoder downscale while decoding, which is
+            # much cheaper than decoding a full-size phone photo
+            image.draft('RGB', PREVIEW_SIZE)
+            return thumbnail_jpeg(image)
+    return None
+
+
+def generate_previews(batch_size=BATCH_SIZE, executor=None):
+    """Render previews for one batch of pending documents in the executor's
+    worker processes. Returns (ready, unavailable, failed) counts."""
+    # Wait for the ingest stage so the thumbnail is made from the final file
+    documents = list(
+        Document.objects.filter(preview_status=PreviewStatus.PENDING)
+        .exclude(ingest_status=IngestStatus.PENDING)
+        .order_by('id').only('id', 'file')[:batch_size]
+    )
+    if not documents:
+        return 0, 0, 0
+
+    futures = {
+        document.id: executor.submit(render_preview, document.file.path)
+        for document in documents
+    }
+    counts = {PreviewStatus.READY: 0, PreviewStatus.UNAVAILABLE: 0, PreviewStatus.FAILED: 0}
+    for document_id, future in futures.items():
+        changes = {}
+        try:
+            data = future.result()
+        except Exception:
+            # Whatever the file or the worker did, including a pool broken by
+            # a crashed process, only this document's preview fails
+            logger.exception("Preview of document %s failed", document_id)
+            changes['preview_status'] = PreviewStatus.FAILED
+        else:
+            if data is None:
+                changes['preview_status'] = PreviewStatus.UNAVAILABLE
+            else:
+                changes['preview'] = default_storage.save(f'previews/{document_id}.jpg', ContentFile(data))
+                changes['preview_status'] = PreviewStatus.READY
+        # Only touch the preview columns so a concurrent review isn't overwritten
+        Document.objects.filter(id=document_id).update(**changes)
+        counts[changes['preview_status']] += 1
+    return counts[PreviewStatus.READY], counts[PreviewStatus.UNAVAILABLE], counts[PreviewStatus.FAILED]
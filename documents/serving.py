@@ -0,0 +1,132 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import BLOB_RE
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class RangeFile:
+    """Read-only view of ``length`` bytes of a file starting at ``start``"""
+
+    def __init__(self, f, start, length):
+        self.file = f
+        self.remaining = length
+        f.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(name, stat):
+    # Content-addressed names are already a strong validator
+    match = BLOB_RE.match(name)
+    if match:
+        return f'"{match.group("digest")}"'
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable byte range, None for no
+    usable Range header, or False when the range can't be satisfied"""
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def serve_file(request, name, download_name):
+    """Serve a stored file with caching validators and byte-range support.
+
+    With DOCUMENT_SENDFILE set, the web server does the byte transfer:
+    'x-sendfile' passes the absolute path (Apache, lighttpd) and
+    'x-accel-redirect' passes DOCUMENT_ACCEL_PREFIX + name to an nginx
+    ``internal`` location aliased to MEDIA_ROOT. Either way Django only sends
+    headers, and the front end handles Range and conditional requests."""
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return HttpResponse("File not found", status=404)
+
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    content_type, encoding = mimetypes.guess_type(download_name)
+    content_type = content_type or 'application/octet-stream'
+    disposition = f"inline; filename*=UTF-8''{quote(download_name)}"
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return conditional
+
+    backend = getattr(settings, 'DOCUMENT_SENDFILE', None)
+    if backend:
+        response = HttpResponse(content_type=content_type)
+        if backend == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(settings.DOCUMENT_ACCEL_PREFIX + name)
+        else:
+            response['X-Sendfile'] = path
+        response['Content-Disposition'] = disposition
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+    # If-Range: only honour the range if the client's copy is still current
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    f = open(path, 'rb')
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(RangeFile(f, start, end - start + 1), status=206,
+                                content_type=content_type)
+        response.block_size = STREAM_BLOCK_SIZE
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        # A real file object lets the WSGI server use sendfile() (zero copy)
+        response = FileResponse(f, content_type=content_type)
+        response['Content-Length'] = str(stat.st_size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = disposition
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
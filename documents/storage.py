@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+# <upload_to>/ab/cd/abcdef...<ext>; two levels of 256 shards keep every
+# directory small no matter how many documents are stored
+BLOB_RE = re.compile(r'^(?P<prefix>.*/)?(?P<a>[0-9a-f]{2})/(?P<b>[0-9a-f]{2})/(?P<digest>[0-9a-f]{64})(?P<ext>\.[a-z0-9]{1,10})?$')
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def blob_name(prefix, digest, ext):
+    return os.path.join(prefix, digest[:2], digest[2:4], digest + ext)
+
+
+def clean_extension(name):
+    ext = os.path.splitext(name)[1].lower()
+    return ext if re.fullmatch(r'\.[a-z0-9]{1,10}', ext) else ''
+
+
+def referenced_names(names):
+    """The subset of ``names`` still referenced by a document or candidate"""
+    from candidate.models import Candidate
+    from documents.models import Document
+
+    names = list(names)
+    found = set(Document.objects.filter(file__in=names).values_list('file', flat=True))
+    found.update(Document.objects.filter(preview__in=names).values_list('preview', flat=True))
+    found.update(Document.objects.filter(original__in=names).values_list('original', flat=True))
+    for field in ('document_1', 'document_2', 'document_3'):
+        found.update(Candidate.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    return found
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that names every file after the SHA-256 of its
+    content. Identical uploads share one blob, so re-uploading the same scan
+    costs no disk space. Blobs are reference-counted through the file columns
+    that point at them. delete() leaves blobs alone: collect_orphan_blobs
+    removes the ones nothing points at any more, once they are old enough
+    that no upload of the same content can still be committing."""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save, so there's nothing to
+        # de-duplicate (and no need to stat the original name) here
+        return name
+
+    def _save(self, name, content):
+        prefix = os.path.dirname(name)
+        ext = clean_extension(name)
+        digest = hashlib.sha256()
+
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (large or chunked uploads): hash it, then move it
+            source = content.temporary_file_path()
+            with open(source, 'rb') as f:
+                while block := f.read(HASH_BLOCK_SIZE):
+                    digest.update(block)
+            final_name = blob_name(prefix, digest.hexdigest(), ext)
+            if self.exists(final_name):
+                os.remove(source)
+                self.touch(final_name)
+            else:
+                self.makedirs(final_name)
+                file_move_safe(source, self.path(final_name))
+                self.set_permissions(final_name)
+            return final_name
+
+        # Hash while streaming into a temp file next to the blobs, so the
+        # final rename is atomic and the content is only read once
+        tmp_dir = self.path('.tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            final_name = blob_name(prefix, digest.hexdigest(), ext)
+            if self.exists(final_name):
+                os.remove(tmp_path)
+                self.touch(final_name)
+            else:
+                self.makedirs(final_name)
+                os.replace(tmp_path, self.path(final_name))
+                self.set_permissions(final_name)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return final_name
+
+    def touch(self, name):
+        # A reused blob counts as freshly written, so collect_orphan_blobs'
+        # age check protects it until the new reference has been committed
+        os.utime(self.path(name))
+
+    def makedirs(self, name):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+
+    def set_permissions(self, name):
+        if self.file_permissions_mode is not None:
+            os.chmod(self.path(name), self.file_permissions_mode)
+
+    def delete(self, name):
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        # A blob may be shared with a document whose row isn't committed yet,
+        # which no reference check here can see
+        if BLOB_RE.match(name):
+            return
+        super().delete(name)
+
+    def iter_shards(self, prefix):
+        """Yield the blob names in each leaf shard directory under prefix"""
+        root = self.path(prefix)
+        if not os.path.isdir(root):
+            return
+        for a in sorted(os.listdir(root)):
+            if not re.fullmatch(r'[0-9a-f]{2}', a):
+                continue
+            for b in sorted(os.listdir(os.path.join(root, a))):
+                shard = os.path.join(prefix, a, b)
+                names = [os.path.join(shard, entry) for entry in os.listdir(self.path(shard))]
+                yield [n for n in names if BLOB_RE.match(n)]
+
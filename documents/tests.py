@@ -1,3 +1,809 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import storages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from candidate.models import Candidate
+from .models import (
+    Document, DocumentStatus, DocumentToken, IngestStatus, PreviewStatus, UploadSession, delete_documents,
+    rebuild_document_counts, stale_document_counts,
+)
+from .ingest import normalise_documents
+from .pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from .previews import generate_previews
+from .storage import ContentAddressedStorage
+from .views import set_document_status
+
+
+class HRDashboardQueryTests(TestCase):
+    """The HR dashboard must not issue queries per candidate or document"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr_user = User.objects.create_user(username='hr', password='pass1234')
+
+    def setUp(self):
+        self.client.force_login(self.hr_user)
+
+    def seed(self, count):
+        start = Candidate.objects.count()
+        candidates = Candidate.objects.bulk_create([
+            Candidate(email=f'candidate{start + i}@example.com', name=f'Candidate {start + i}')
+            for i in range(count)
+        ])
+        documents = []
+        for i, candidate in enumerate(candidates):
+            # Alternate between fully verified and pending candidates
+            status = DocumentStatus.VERIFIED if i % 2 else DocumentStatus.PENDING
+            documents.append(Document(candidate=candidate, document_type='ID Proof',
+                                      file='documents/id.pdf', status=status))
+            documents.append(Document(candidate=candidate, document_type='Address Proof',
+                                      file='documents/address.pdf', status=status))
+        Document.objects.bulk_create(documents)
+        rebuild_document_counts()
+        # Half of the verified candidates already have an account
+        User.objects.bulk_create([
+            User(username=f'user{c.id}', email=c.email)
+            for i, c in enumerate(candidates) if i % 4 == 1
+        ])
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('hr_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        self.seed(5)
+        small, _ = self.count_queries()
+        self.seed(200)
+        large, _ = self.count_queries()
+        self.assertEqual(small, large)
+
+    def test_query_budget(self):
+        self.seed(50)
+        self.client.get(reverse('hr_dashboard'))
+        # session, user, candidate page, document page and three counts; the
+        # role comes from the cache
+        with self.assertNumQueries(7):
+            self.client.get(reverse('hr_dashboard'))
+
+    def test_account_resolution(self):
+        self.seed(4)
+        _, response = self.count_queries()
+        ready = response.context['candidates_ready_for_credentials']
+        with_accounts = response.context['candidates_with_accounts']
+        candidates = list(Candidate.objects.order_by('id'))
+        # candidate 1 is verified with an account, candidate 3 verified without
+        self.assertEqual(with_accounts, {candidates[1].id: f'user{candidates[1].id}'})
+        self.assertEqual(ready, [candidates[3].id])
+
+
+class HRDashboardPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr_user = User.objects.create_user(username='hr', password='pass1234')
+        cls.candidates = Candidate.objects.bulk_create([
+            Candidate(email=f'candidate{i}@example.com') for i in range(3)
+        ])
+        Document.objects.bulk_create([
+            Document(candidate=cls.candidates[i % 3], document_type='ID Proof' if i % 2 else 'Degree',
+                     file='documents/doc.pdf',
+                     status=DocumentStatus.VERIFIED if i % 5 == 0 else DocumentStatus.PENDING)
+            for i in range(30)
+        ])
+        rebuild_document_counts()
+
+    def setUp(self):
+        self.client.force_login(self.hr_user)
+
+    def walk(self, **params):
+        """Follow next cursors until the last page, returning all document ids"""
+        seen = []
+        cursor = None
+        while True:
+            query = dict(params)
+            if cursor:
+                query['doc_cursor'] = cursor
+            page = self.client.get(reverse('hr_dashboard'), query).context['documents']
+            seen.extend(doc.id for doc in page)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_pages_cover_filtered_documents_once(self):
+        ids = self.walk(page_size=4)
+        expected = Document.objects.filter(status=DocumentStatus.PENDING).order_by('-uploaded_at', '-id')
+        self.assertEqual(ids, [doc.id for doc in expected])
+
+    def test_pages_are_stable_under_new_uploads(self):
+        response = self.client.get(reverse('hr_dashboard'), {'page_size': 5, 'status': ''})
+        first = response.context['documents']
+        # A document uploaded between page loads must not shift the next page
+        Document.objects.create(candidate=self.candidates[0], document_type='Late', file='documents/late.pdf')
+        response = self.client.get(reverse('hr_dashboard'), {
+            'page_size': 5, 'status': '', 'doc_cursor': first.next_cursor,
+        })
+        expected = Document.objects.exclude(document_type='Late').order_by('-uploaded_at', '-id')[5:10]
+        self.assertEqual([d.id for d in response.context['documents']], [d.id for d in expected])
+
+    def test_filters(self):
+        ids = self.walk(status='', document_type='Degree', candidate=self.candidates[1].id)
+        expected = Document.objects.filter(document_type='Degree', candidate=self.candidates[1])
+        self.assertEqual(sorted(ids), sorted(doc.id for doc in expected))
+
+    def test_page_size_is_clamped(self):
+        response = self.client.get(reverse('hr_dashboard'), {'page_size': 10000})
+        self.assertEqual(response.context['filters']['page_size'], MAX_PAGE_SIZE)
+
+    def test_all_documents_not_rendered(self):
+        response = self.client.get(reverse('hr_dashboard'))
+        self.assertNotIn('all_documents', response.context)
+        self.assertEqual(response.context['document_count'], 30)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        response = self.client.get(reverse('hr_dashboard'), {'doc_cursor': 'not-a-cursor'})
+        self.assertTrue(response.context['documents'].is_first)
+
+    def test_cursor_round_trip(self):
+        doc = Document.objects.first()
+        self.assertEqual(decode_cursor(encode_cursor(doc.uploaded_at, doc.id)), (doc.uploaded_at, doc.id))
+
+
+class DocumentCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr_user = User.objects.create_user(username='hr', password='pass1234')
+        cls.candidate = Candidate.objects.create(email='candidate@example.com')
+        cls.token = DocumentToken.objects.create(candidate=cls.candidate)
+
+    def setUp(self):
+        # Token rows are cached, and the cache outlives each test's rollback
+        cache.clear()
+        self.client.force_login(self.hr_user)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def assertCounts(self, total, pending, verified):
+        self.candidate.refresh_from_db()
+        self.assertEqual(
+            (self.candidate.total_docs, self.candidate.pending_docs, self.candidate.verified_docs),
+            (total, pending, verified),
+        )
+        self.assertFalse(stale_document_counts().exists())
+
+    def upload(self, document_type):
+        self.client.post(reverse('upload_document', args=[self.token.token]), {
+            'document_type': document_type,
+            'file': SimpleUploadedFile('doc.pdf', b'%PDF-1.4'),
+        })
+        return Document.objects.latest('id')
+
+    def test_upload_and_verify_keep_counters_in_step(self):
+        first = self.upload('ID Proof')
+        second = self.upload('Degree')
+        self.assertCounts(2, 2, 0)
+
+        self.client.post(reverse('verify_document', args=[first.id]), {'action': 'verify'})
+        self.assertCounts(2, 1, 1)
+        self.client.post(reverse('verify_document', args=[first.id]), {'action': 'verify'})
+        self.assertCounts(2, 1, 1)
+        self.client.post(reverse('verify_document', args=[first.id]), {'action': 'reupload'})
+        self.assertCounts(2, 1, 0)
+        self.client.post(reverse('verify_document', args=[second.id]), {'action': 'reupload'})
+        self.assertCounts(2, 0, 0)
+        # A re-upload request is final for that document
+        self.client.post(reverse('verify_document', args=[second.id]), {'action': 'verify'})
+        self.assertCounts(2, 0, 0)
+
+    def test_replacement_supersedes_reupload_request(self):
+        first = self.upload('ID Proof')
+        second = self.upload('Degree')
+        self.client.post(reverse('verify_document', args=[first.id]), {'action': 'verify'})
+        self.client.post(reverse('verify_document', args=[second.id]), {'action': 'reupload'})
+        # Still waiting for the replacement: not ready for credentials
+        response = self.client.get(reverse('hr_dashboard'))
+        self.assertEqual(response.context['candidates_ready_for_credentials'], [])
+        self.assertContains(response, 'Awaiting Re-upload')
+
+        replacement = self.upload('Degree')
+        second.refresh_from_db()
+        self.assertEqual(second.status, DocumentStatus.SUPERSEDED)
+        self.assertCounts(2, 1, 1)
+        self.client.post(reverse('verify_document', args=[replacement.id]), {'action': 'verify'})
+        self.assertCounts(2, 0, 2)
+
+        response = self.client.get(reverse('hr_dashboard'))
+        self.assertEqual(response.context['candidates_ready_for_credentials'], [self.candidate.id])
+        self.client.post(reverse('send_login_credentials', args=[self.candidate.id]))
+        self.assertTrue(User.objects.filter(email=self.candidate.email).exists())
+
+    def test_concurrent_reviews_adjust_counters_once(self):
+        document = self.upload('ID Proof')
+        # Two reviewers loaded the document before either decided
+        first, second = Document.objects.get(id=document.id), Document.objects.get(id=document.id)
+        self.assertTrue(set_document_status(first, DocumentStatus.VERIFIED))
+        self.assertFalse(set_document_status(second, DocumentStatus.REUPLOAD))
+        self.assertEqual(second.status, DocumentStatus.VERIFIED)
+        self.assertCounts(1, 0, 1)
+        # The same decision twice is not an error, and counts once
+        self.assertTrue(set_document_status(Document.objects.get(id=document.id), DocumentStatus.VERIFIED))
+        self.assertCounts(1, 0, 1)
+
+    def test_deleting_documents_adjusts_counters(self):
+        first, second, third = self.upload('ID Proof'), self.upload('Degree'), self.upload('Payslip')
+        self.client.post(reverse('verify_document', args=[first.id]), {'action': 'verify'})
+        self.client.post(reverse('verify_document', args=[second.id]), {'action': 'reupload'})
+        self.assertCounts(3, 1, 1)
+
+        self.assertEqual(delete_documents(Document.objects.filter(id__in=[first.id, third.id])), 2)
+        self.assertCounts(1, 0, 0)
+        self.hr_user.is_staff = self.hr_user.is_superuser = True
+        self.hr_user.save()
+        self.client.post(reverse('admin:documents_document_delete', args=[second.id]), {'post': 'yes'})
+        self.assertFalse(Document.objects.exists())
+        self.assertCounts(0, 0, 0)
+
+    def test_rebuild_command(self):
+        Document.objects.create(candidate=self.candidate, document_type='ID Proof', file='documents/id.pdf')
+        with self.assertRaises(CommandError):
+            call_command('rebuild_document_counts', '--check', stdout=StringIO())
+        call_command('rebuild_document_counts', stdout=StringIO())
+        call_command('rebuild_document_counts', '--check', stdout=StringIO())
+        self.assertCounts(1, 1, 0)
+
+
+class BulkDocumentStatusTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr_user = User.objects.create_user(username='hr', password='pass1234')
+        cls.candidates = [Candidate.objects.create(email=f'candidate{i}@example.com') for i in range(3)]
+        cls.documents = []
+        for candidate in cls.candidates:
+            for status in (DocumentStatus.PENDING, DocumentStatus.PENDING, DocumentStatus.VERIFIED, DocumentStatus.REUPLOAD):
+                cls.documents.append(Document.objects.create(
+                    candidate=candidate, document_type='ID Proof', file='documents/id.pdf', status=status,
+                ))
+        rebuild_document_counts()
+
+    def setUp(self):
+        self.client.force_login(self.hr_user)
+        self.url = reverse('bulk_document_status')
+
+    def ids(self, status):
+        return [d.id for d in self.documents if d.status == status]
+
+    def test_verifies_in_one_update(self):
+        pending, verified, reupload = (
+            self.ids(DocumentStatus.PENDING), self.ids(DocumentStatus.VERIFIED), self.ids(DocumentStatus.REUPLOAD),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                'status': 'VERIFIED', 'ids': pending + verified + reupload + [999999],
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'status': 'VERIFIED', 'updated': sorted(pending), 'unchanged': sorted(verified),
+            'invalid': sorted(reupload), 'missing': [999999],
+        })
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "documents_document"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Document.objects.filter(status=DocumentStatus.VERIFIED).count(), 9)
+        self.assertFalse(stale_document_counts().exists())
+        self.assertEqual(Candidate.objects.get(id=self.candidates[0].id).verified_docs, 3)
+
+    def test_reupload_after_verify(self):
+        verified = self.ids(DocumentStatus.VERIFIED)
+        response = self.client.post(self.url, {'status': 'REUPLOAD', 'ids': verified})
+        self.assertEqual(response.json()['updated'], sorted(verified))
+        self.assertEqual(Candidate.objects.get(id=self.candidates[0].id).verified_docs, 0)
+        self.assertFalse(stale_document_counts().exists())
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(self.client.post(self.url, {'status': 'PENDING', 'ids': [1]}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'status': 'VERIFIED', 'ids': ['x']}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'status': 'VERIFIED'}).status_code, 400)
+
+        employee = User.objects.create_user(username='employee', password='pass1234')
+        employee.userprofile.role = 'EMPLOYEE'
+        employee.userprofile.save()
+        self.client.force_login(employee)
+        response = self.client.post(self.url, {'status': 'VERIFIED', 'ids': self.ids(DocumentStatus.PENDING)})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Document.objects.filter(status=DocumentStatus.VERIFIED).count(), 3)
+
+
+class ChunkedUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.candidate = Candidate.objects.create(email='candidate@example.com')
+        cls.token = DocumentToken.objects.create(candidate=cls.candidate)
+
+    def setUp(self):
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(
+            MEDIA_ROOT=f'{root}/media',
+            CHUNKED_UPLOAD_DIR=f'{root}/chunks',
+            CHUNKED_UPLOAD_MAX_CHUNK_SIZE=1024,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.content = bytes(range(256)) * 10
+        self.checksum = hashlib.sha256(self.content).hexdigest()
+
+    def init(self, checksum=None):
+        return self.client.post(reverse('chunked_upload_init', args=[self.token.token]), {
+            'document_type': 'Resume',
+            'filename': 'resume.pdf',
+            'size': len(self.content),
+            'checksum': checksum or self.checksum,
+        })
+
+    def send_chunk(self, upload_id, offset, data):
+        return self.client.patch(
+            reverse('chunked_upload_chunk', args=[self.token.token, upload_id]),
+            data, content_type='application/octet-stream',
+            headers={'Upload-Offset': str(offset)},
+        )
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('chunked_upload_finalize', args=[self.token.token, upload_id]))
+
+    def test_upload_in_chunks(self):
+        state = self.init().json()
+        upload_id = state['upload_id']
+        for offset in range(0, len(self.content), 1024):
+            response = self.send_chunk(upload_id, offset, self.content[offset:offset + 1024])
+            self.assertEqual(response.status_code, 200)
+
+        response = self.finalize(upload_id)
+
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.get(id=response.json()['document_id'])
+        with document.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+        self.candidate.refresh_from_db()
+        self.assertEqual(self.candidate.pending_docs, 1)
+
+    async def test_upload_under_asgi(self):
+        state = await self.async_client.post(reverse('chunked_upload_init', args=[self.token.token]), {
+            'document_type': 'Resume',
+            'filename': 'resume.pdf',
+            'size': len(self.content),
+            'checksum': self.checksum,
+        })
+        upload_id = state.json()['upload_id']
+        for offset in range(0, len(self.content), 1024):
+            response = await self.async_client.patch(
+                reverse('chunked_upload_chunk', args=[self.token.token, upload_id]),
+                self.content[offset:offset + 1024], content_type='application/octet-stream',
+                headers={'Upload-Offset': str(offset)},
+            )
+            self.assertEqual(response.status_code, 200)
+
+        response = await self.async_client.post(
+            reverse('chunked_upload_finalize', args=[self.token.token, upload_id])
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(await Document.objects.acount(), 1)
+
+    def test_resume_after_disconnect(self):
+        upload_id = self.init().json()['upload_id']
+        self.send_chunk(upload_id, 0, self.content[:1024])
+
+        # Starting the same file again picks up where the server left off
+        response = self.init()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'upload_id': upload_id, 'offset': 1024, 'size': len(self.content), 'max_chunk_size': 1024,
+        })
+        # A chunk for the wrong offset is refused with the offset to resume from
+        response = self.send_chunk(upload_id, 2048, self.content[2048:3072])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 1024)
+
+        self.send_chunk(upload_id, 1024, self.content[1024:2048])
+        self.send_chunk(upload_id, 2048, self.content[2048:])
+        self.assertEqual(self.finalize(upload_id).status_code, 201)
+
+    def test_checksum_mismatch(self):
+        upload_id = self.init(checksum='0' * 64).json()['upload_id']
+        self.send_chunk(upload_id, 0, self.content[:1024])
+        self.send_chunk(upload_id, 1024, self.content[1024:2048])
+        self.send_chunk(upload_id, 2048, self.content[2048:])
+
+        response = self.finalize(upload_id)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['offset'], 0)
+        self.assertFalse(Document.objects.exists())
+
+    def test_rejects_oversized_chunk_and_invalid_token(self):
+        upload_id = self.init().json()['upload_id']
+        self.assertEqual(self.send_chunk(upload_id, 0, self.content[:2000]).status_code, 400)
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+
+        self.token.is_used = True
+        self.token.save()
+        self.assertEqual(self.init().status_code, 403)
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(MEDIA_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = storages['default']
+        self.candidate = Candidate.objects.create(email='candidate@example.com')
+
+    def upload(self, content, name='scan.PDF'):
+        return Document.objects.create(
+            candidate=self.candidate, document_type='ID Proof',
+            file=SimpleUploadedFile(name, content),
+        )
+
+    def test_identical_uploads_share_a_blob(self):
+        first = self.upload(b'same scan')
+        second = self.upload(b'same scan', name='scan-again.pdf')
+        other = self.upload(b'different scan')
+
+        digest = hashlib.sha256(b'same scan').hexdigest()
+        self.assertEqual(first.file.name, f'documents/{digest[:2]}/{digest[2:4]}/{digest}.pdf')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertNotEqual(first.file.name, other.file.name)
+        self.assertEqual(self.storage.open(first.file.name).read(), b'same scan')
+        self.assertEqual(os.listdir(self.storage.path('.tmp')), [])
+
+    def test_delete_leaves_blobs_to_the_collector(self):
+        document = self.upload(b'same scan')
+        name = document.file.name
+        document.delete()
+        # Unreferenced, but a concurrent upload of the same scan may be about
+        # to commit a new reference
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_collect_orphan_blobs(self):
+        kept = self.upload(b'kept')
+        orphan = self.upload(b'orphan')
+        fresh = self.upload(b'fresh orphan')
+        Document.objects.filter(id__in=[orphan.id, fresh.id]).delete()
+        old = time.time() - 7200
+        for doc in (kept, orphan):
+            os.utime(self.storage.path(doc.file.name), (old, old))
+
+        call_command('collect_orphan_blobs', '--dry-run', stdout=StringIO())
+        self.assertTrue(self.storage.exists(orphan.file.name))
+
+        call_command('collect_orphan_blobs', stdout=StringIO())
+        self.assertTrue(self.storage.exists(kept.file.name))
+        self.assertFalse(self.storage.exists(orphan.file.name))
+        # Too recent to be sure its reference isn't still being committed
+        self.assertTrue(self.storage.exists(fresh.file.name))
+
+
+class DocumentDownloadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr_user = User.objects.create_user(username='hr', password='pass1234')
+        cls.candidate = Candidate.objects.create(email='candidate@example.com', name='Ann Lee')
+        cls.token = DocumentToken.objects.create(candidate=cls.candidate)
+        cls.other = Candidate.objects.create(email='other@example.com')
+
+    def setUp(self):
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(MEDIA_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.content = b'0123456789' * 100
+        self.document = Document.objects.create(
+            candidate=self.candidate, document_type='Resume',
+            file=SimpleUploadedFile('resume.pdf', self.content),
+        )
+        self.url = reverse('download_document', args=[self.document.id])
+
+    def get(self, url=None, **headers):
+        response = self.client.get(url or self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_requires_hr_or_owning_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+        employee = User.objects.create_user(username='employee', password='pass1234')
+        employee.userprofile.role = 'EMPLOYEE'
+        employee.userprofile.save()
+        self.client.force_login(employee)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.logout()
+
+        own = reverse('download_own_document', args=[self.token.token, self.document.id])
+        response, body = self.get(own)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+
+        other_token = DocumentToken.objects.create(candidate=self.other)
+        theirs = reverse('download_own_document', args=[other_token.token, self.document.id])
+        self.assertEqual(self.client.get(theirs).status_code, 404)
+
+    def test_full_download_with_validators(self):
+        self.client.force_login(self.hr_user)
+        response, body = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('Ann%20Lee%20-%20Resume.pdf', response['Content-Disposition'])
+        digest = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(response['ETag'], f'"{digest}"')
+
+        response, body = self.get(If_None_Match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(body, b'')
+
+    def test_byte_ranges(self):
+        self.client.force_login(self.hr_user)
+
+        response, body = self.get(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.content[10:20])
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1000')
+
+        response, body = self.get(Range='bytes=-5')
+        self.assertEqual(body, self.content[-5:])
+
+        response, body = self.get(Range='bytes=990-')
+        self.assertEqual(body, self.content[990:])
+
+        response, _ = self.get(Range='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+
+        # A stale If-Range gets the whole file instead of a mismatched piece
+        response, body = self.get(Range='bytes=10-19', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+
+    def test_sendfile_offload(self):
+        self.client.force_login(self.hr_user)
+
+        with self.settings(DOCUMENT_SENDFILE='x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.document.file.name}')
+        self.assertEqual(response.content, b'')
+
+        with self.settings(DOCUMENT_SENDFILE='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.document.file.path)
+
+
+class DocumentPreviewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr_user = User.objects.create_user(username='hr', password='pass1234')
+        cls.candidate = Candidate.objects.create(email='candidate@example.com')
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(MEDIA_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Threads run the same render_preview as the process pool, without the
+        # start-up cost in every test
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def create_document(self, name, content, ingest_status=IngestStatus.UNCHANGED):
+        return Document.objects.create(
+            candidate=self.candidate, document_type='ID Proof', file=SimpleUploadedFile(name, content),
+            ingest_status=ingest_status,
+        )
+
+    def png(self, size):
+        out = BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(out, 'PNG')
+        return out.getvalue()
+
+    def test_waits_for_ingest(self):
+        self.create_document('photo.png', self.png((64, 64)), ingest_status=IngestStatus.PENDING)
+        self.assertEqual(generate_previews(executor=self.executor), (0, 0, 0))
+
+    def test_generates_thumbnails_in_batches(self):
+        photo = self.create_document('photo.png', self.png((1600, 1200)))
+        notes = self.create_document('notes.txt', b'plain text')
+        broken = self.create_document('broken.jpg', b'not really a jpeg')
+
+        self.assertEqual(generate_previews(batch_size=2, executor=self.executor), (1, 1, 0))
+        with self.assertLogs('documents.previews', 'ERROR') as logs:
+            self.assertEqual(generate_previews(batch_size=2, executor=self.executor), (0, 0, 1))
+        self.assertEqual(
+            [record.getMessage() for record in logs.records], [f'Preview of document {broken.id} failed'],
+        )
+        self.assertEqual(Document.objects.get(id=broken.id).preview_status, PreviewStatus.FAILED)
+        self.assertEqual(generate_previews(batch_size=2, executor=self.executor), (0, 0, 0))
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.preview_status, PreviewStatus.READY)
+        with Image.open(photo.preview.path) as thumbnail:
+            self.assertEqual(thumbnail.format, 'JPEG')
+            self.assertEqual(thumbnail.size, (320, 240))
+        self.assertEqual(Document.objects.get(id=notes.id).preview_status, PreviewStatus.UNAVAILABLE)
+
+    def test_worker_failure_fails_the_document(self):
+        document = self.create_document('photo.png', self.png((64, 64)))
+        with mock.patch('documents.previews.render_preview', side_effect=BrokenProcessPool("worker died")):
+            with self.assertLogs('documents.previews', 'ERROR') as logs:
+                self.assertEqual(generate_previews(executor=self.executor), (0, 0, 1))
+        self.assertEqual(
+            [record.getMessage() for record in logs.records], [f'Preview of document {document.id} failed'],
+        )
+        self.assertEqual(Document.objects.get(id=document.id).preview_status, PreviewStatus.FAILED)
+
+    def test_preview_view(self):
+        document = self.create_document('photo.png', self.png((64, 64)))
+        url = reverse('document_preview', args=[document.id])
+        self.client.force_login(self.hr_user)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        generate_previews(executor=self.executor)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+        response = self.client.get(reverse('hr_dashboard'), {'status': ''})
+        self.assertContains(response, f'src="{url}"')
+
+
+@override_settings(DOCUMENT_IMAGE_MAX_DIMENSION=400, DOCUMENT_IMAGE_QUALITY=80)
+class ImageIngestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.candidate = Candidate.objects.create(email='candidate@example.com')
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(MEDIA_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.originals = ContentAddressedStorage(location=os.path.join(root, 'cold'))
+        patcher = mock.patch.object(Document._meta.get_field('original'), 'storage', self.originals)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def create_document(self, name, content):
+        return Document.objects.create(
+            candidate=self.candidate, document_type='ID Proof', file=SimpleUploadedFile(name, content),
+        )
+
+    def phone_photo(self, size=(1200, 900)):
+        """A sideways JPEG with an EXIF orientation tag, like a phone camera's"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Phone Maker'
+        out = BytesIO()
+        Image.linear_gradient('L').resize(size).convert('RGB').save(out, 'JPEG', quality=95, exif=exif)
+        return out.getvalue()
+
+    def test_normalises_photos(self):
+        photo = self.create_document('My_First_Board.jpg', self.phone_photo())
+        notes = self.create_document('notes.txt', b'plain text')
+        broken = self.create_document('broken.png', b'not really a png')
+        uploaded = photo.file.name
+
+        with self.assertLogs('documents.ingest', 'ERROR') as logs:
+            self.assertEqual(normalise_documents(executor=self.executor), (1, 1, 1))
+        self.assertEqual(
+            [record.getMessage() for record in logs.records], [f'Normalising document {broken.id} failed'],
+        )
+        self.assertEqual(normalise_documents(executor=self.executor), (0, 0, 0))
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.ingest_status, IngestStatus.NORMALISED)
+        self.assertNotEqual(photo.file.name, uploaded)
+        self.assertTrue(photo.file.name.endswith('.jpg'))
+        self.assertEqual(photo.original, '')
+        with Image.open(photo.file.path) as image:
+            # Rotated upright, scaled to fit and with the metadata gone
+            self.assertEqual(image.size, (300, 400))
+            self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(Document.objects.get(id=notes.id).ingest_status, IngestStatus.UNCHANGED)
+        self.assertEqual(Document.objects.get(id=broken.id).ingest_status, IngestStatus.FAILED)
+
+    def test_worker_failure_fails_the_document(self):
+        document = self.create_document('photo.jpg', self.phone_photo())
+        with mock.patch('documents.ingest.normalise_image', side_effect=BrokenProcessPool("worker died")):
+            with self.assertLogs('documents.ingest', 'ERROR') as logs:
+                self.assertEqual(normalise_documents(executor=self.executor), (0, 0, 1))
+        self.assertEqual(
+            [record.getMessage() for record in logs.records], [f'Normalising document {document.id} failed'],
+        )
+        self.assertEqual(Document.objects.get(id=document.id).ingest_status, IngestStatus.FAILED)
+
+    def test_small_clean_images_are_left_alone(self):
+        out = BytesIO()
+        Image.new('RGB', (40, 40), (0, 90, 200)).save(out, 'PNG')
+        document = self.create_document('scan.png', out.getvalue())
+        self.assertEqual(normalise_documents(executor=self.executor), (0, 1, 0))
+        self.assertEqual(Document.objects.get(id=document.id).file.name, document.file.name)
+
+    def test_keeps_original_in_cold_storage(self):
+        content = self.phone_photo()
+        document = self.create_document('photo.jpg', content)
+        with self.settings(DOCUMENT_KEEP_ORIGINALS=True):
+            normalise_documents(executor=self.executor)
+
+        document.refresh_from_db()
+        self.assertTrue(document.original.name.startswith('originals/'))
+        with self.originals.open(document.original.name) as f:
+            self.assertEqual(f.read(), content)
+
+
+class SyntheticDataTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(MEDIA_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_generates_consistent_data(self):
+        call_command(
+            'generate_synthetic_data', '--candidates', '40', '--batch-size', '15',
+            '--file-size', '512', '--seed', '1', stdout=StringIO(),
+        )
+
+        self.assertEqual(Candidate.objects.count(), 40)
+        onboarded = Candidate.objects.filter(status='PROFILE_COMPLETED')
+        self.assertEqual(Document.objects.count(), onboarded.count() * 3)
+        self.assertFalse(stale_document_counts().exists())
+        document = Document.objects.first()
+        with document.file.open('rb') as f:
+            self.assertEqual(len(f.read()), 512)
+        # Accounts only exist for candidates whose documents are all verified
+        accounts = User.objects.filter(userprofile__role='EMPLOYEE').values_list('email', flat=True)
+        self.assertTrue(accounts)
+        for candidate in Candidate.objects.filter(email__in=accounts):
+            self.assertEqual(candidate.verified_docs, candidate.total_docs)
@@ -1,9 +1,20 @@
 from django.urls import path
-from .views import upload_document, verify_document, hr_dashboard, send_login_credentials
+from .views import (
+    upload_document, verify_document, hr_dashboard, send_login_credentials,
+    chunked_upload_init, chunked_upload_chunk, chunked_upload_finalize,
+    download_document, download_own_document, document_preview, bulk_document_status,
+)
 
 urlpatterns = [
     path('upload/<uuid:token>/', upload_document, name='upload_document'),
+    path('upload/<uuid:token>/chunked/', chunked_upload_init, name='chunked_upload_init'),
+    path('upload/<uuid:token>/chunked/<uuid:upload_id>/', chunked_upload_chunk, name='chunked_upload_chunk'),
+    path('upload/<uuid:token>/chunked/<uuid:upload_id>/finalize/', chunked_upload_finalize, name='chunked_upload_finalize'),
+    path('upload/<uuid:token>/file/<int:doc_id>/', download_own_document, name='download_own_document'),
     path('hr/dashboard/', hr_dashboard, name='hr_dashboard'),
+    path('file/<int:doc_id>/', download_document, name='download_document'),
+    path('file/<int:doc_id>/preview/', document_preview, name='document_preview'),
+    path('hr/documents/status/', bulk_document_status, name='bulk_document_status'),
     path('verify/<int:doc_id>/', verify_document, name='verify_document'),
     path('hr/send-credentials/<int:candidate_id>/', send_login_credentials, name='send_login_credentials'),
-]
\ No newline at end of file
+]
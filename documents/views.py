@@ -1,23 +1,36 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
 from django.template.loader import render_to_string
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_http_methods, require_POST
 from candidate.models import Candidate
-from .models import Document, DocumentStatus, DocumentToken
+from candidate.tokens import alookup_token, lookup_token
+from .models import (
+    STATUS_TRANSITIONS, Document, DocumentStatus, DocumentToken, PreviewStatus, UploadSession,
+    adjust_document_counts, rebuild_document_counts, supersede_documents, transition_sources,
+)
+from .chunked import CHECKSUM_RE, PartialUpload, file_checksum, write_chunk
+from .serving import serve_file
+from .pagination import KeysetPage, get_page_size
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from accounts.models import UserRole, UserProfile
-from django.core.mail import send_mail
+from accounts.roles import role_required
+from notifications.mail import enqueue_email
 from django.conf import settings
-from django.db.models import Count, Q
+from django.utils import timezone
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+import os
 from datetime import datetime
+from urllib.parse import urlencode
 
 @ensure_csrf_cookie
 def upload_document(request, token):
-    try:
-        token_obj = DocumentToken.objects.get(token=token)
-    except DocumentToken.DoesNotExist:
+    token_obj = lookup_token(DocumentToken, token)
+    if token_obj is None:
         return render(request, "candidate/error.html", {
             "error_title": "Invalid Link",
             "error_message": "The document upload link you're trying to access is invalid. Please contact HR for a new link."
@@ -36,11 +49,7 @@ def upload_document(request, token):
         file = request.FILES.get("file")
 
         if document_type and file:
-            Document.objects.create(
-                candidate=candidate,
-                document_type=document_type,
-                file=file
-            )
+            create_document(candidate, document_type, file)
             messages.success(request, f"{document_type} uploaded successfully!")
             # Redirect to prevent form resubmission
             return redirect('upload_document', token=token)
@@ -57,55 +66,327 @@ def upload_document(request, token):
     })
 
 
+def create_document(candidate, document_type, file):
+    """Save an uploaded document and count it against the candidate. It
+    replaces any document of the same type that HR asked to be re-uploaded."""
+    with transaction.atomic():
+        document = Document.objects.create(
+            candidate=candidate,
+            document_type=document_type,
+            file=file
+        )
+        adjust_document_counts(candidate.id, new_status=DocumentStatus.PENDING)
+        supersede_documents(candidate.id, document_type)
+    return document
+
+
+def get_upload_candidate(token):
+    """The candidate a valid document upload token belongs to, or None"""
+    token_obj = lookup_token(DocumentToken, token)
+    if token_obj is None or not token_obj.is_valid():
+        return None
+    return token_obj.candidate
+
+
+async def aget_upload_candidate(token):
+    token_obj = await alookup_token(DocumentToken, token)
+    if token_obj is None or not token_obj.is_valid():
+        return None
+    return token_obj.candidate
+
+
+def upload_session_state(session):
+    return {
+        "upload_id": str(session.id),
+        "offset": session.received,
+        "size": session.size,
+        "max_chunk_size": settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE,
+    }
+
+
+def invalid_upload_link():
+    return JsonResponse({
+        "error": "This document upload link is invalid or has expired. Please contact HR for a new link."
+    }, status=403)
+
+
+# The chunked upload endpoints are async: under ASGI a request waiting on the
+# database or the disk doesn't tie up a worker thread. Blocking file work is
+# handed to a thread with sync_to_async.
+
+@require_POST
+async def chunked_upload_init(request, token):
+    """Start (or resume) a chunked upload. Uploading the same file again with
+    the same link returns the existing session and how much of it has arrived."""
+    candidate = await aget_upload_candidate(token)
+    if candidate is None:
+        return invalid_upload_link()
+
+    document_type = request.POST.get("document_type", "").strip()
+    filename = os.path.basename(request.POST.get("filename", "").strip())
+    checksum = request.POST.get("checksum", "").strip().lower()
+    try:
+        size = int(request.POST.get("size", ""))
+    except ValueError:
+        size = 0
+
+    if not document_type or not filename or not CHECKSUM_RE.match(checksum):
+        return JsonResponse({"error": "document_type, filename and a SHA-256 checksum are required."}, status=400)
+    if not 0 < size <= settings.CHUNKED_UPLOAD_MAX_FILE_SIZE:
+        return JsonResponse({"error": "File is empty or too large."}, status=400)
+
+    session, created = await UploadSession.objects.aget_or_create(
+        candidate=candidate,
+        document_type=document_type[:100],
+        filename=filename[:255],
+        size=size,
+        checksum=checksum,
+    )
+    return JsonResponse(upload_session_state(session), status=201 if created else 200)
+
+
+@require_http_methods(["GET", "PATCH"])
+async def chunked_upload_chunk(request, token, upload_id):
+    """GET reports the current offset; PATCH appends the request body at the
+    offset given in the Upload-Offset header, streaming it to disk"""
+    candidate = await aget_upload_candidate(token)
+    if candidate is None:
+        return invalid_upload_link()
+    session = await UploadSession.objects.filter(id=upload_id, candidate=candidate).afirst()
+    if session is None:
+        return JsonResponse({"error": "Upload not found."}, status=404)
+
+    if request.method == "GET":
+        return JsonResponse(upload_session_state(session))
+
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return JsonResponse({"error": "Upload-Offset and Content-Length headers are required."}, status=400)
+
+    if offset != session.received:
+        # Out of order or a retry of a chunk we already have: tell the client where to resume
+        return JsonResponse(upload_session_state(session), status=409)
+    if not 0 < length <= settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE or offset + length > session.size:
+        return JsonResponse({"error": "Chunk is empty, too large or past the end of the file."}, status=400)
+
+    written = await sync_to_async(write_chunk)(session.partial_path, request, offset, length)
+
+    # Only advance if no other request moved the offset in the meantime
+    updated = await UploadSession.objects.filter(id=session.id, received=offset).aupdate(
+        received=offset + written, updated_at=timezone.now()
+    )
+    await session.arefresh_from_db()
+    return JsonResponse(upload_session_state(session), status=200 if updated else 409)
+
+
+def finish_chunked_upload(candidate, session):
+    """Store the assembled partial file as a Document and drop the session"""
+    path = session.partial_path
+    with open(path, "rb") as f:
+        document = create_document(candidate, session.document_type, PartialUpload(f, name=session.filename))
+    path.unlink(missing_ok=True)
+    session.delete()
+    return document
+
+
+@require_POST
+async def chunked_upload_finalize(request, token, upload_id):
+    """Check the assembled file against the checksum and turn it into a Document"""
+    candidate = await aget_upload_candidate(token)
+    if candidate is None:
+        return invalid_upload_link()
+    session = await UploadSession.objects.filter(id=upload_id, candidate=candidate).afirst()
+    if session is None:
+        return JsonResponse({"error": "Upload not found."}, status=404)
+
+    if session.received != session.size:
+        return JsonResponse(upload_session_state(session), status=409)
+
+    path = session.partial_path
+    if not await sync_to_async(path.exists)() or await sync_to_async(file_checksum)(path) != session.checksum:
+        # The bytes on disk can't be trusted; start the upload over
+        await sync_to_async(path.unlink)(missing_ok=True)
+        session.received = 0
+        await session.asave(update_fields=["received", "updated_at"])
+        return JsonResponse({
+            "error": "Checksum mismatch. Please upload the file again.",
+            **upload_session_state(session),
+        }, status=422)
+
+    document = await sync_to_async(finish_chunked_upload)(candidate, session)
+
+    messages.success(request, f"{document.document_type} uploaded successfully!")
+    return JsonResponse({"document_id": document.id, "status": document.status}, status=201)
+
+
+def document_download_name(document):
+    """A readable file name for a document whose stored name is a content hash"""
+    ext = os.path.splitext(document.file.name)[1]
+    return f"{document.candidate.name or document.candidate.email} - {document.document_type}{ext}"
+
+
+@login_required
+@role_required(UserRole.HR)
+def download_document(request, doc_id):
+    """HR download of any document; bytes are served by serve_file"""
+    document = Document.objects.select_related('candidate').filter(id=doc_id).first()
+    if document is None:
+        return HttpResponse("Document not found", status=404)
+    return serve_file(request, document.file.name, document_download_name(document))
+
+
 @login_required
+@role_required(UserRole.HR)
+def document_preview(request, doc_id):
+    """HR view of a document's thumbnail, rendered by generate_previews"""
+    document = Document.objects.filter(id=doc_id, preview_status=PreviewStatus.READY).only('id', 'preview').first()
+    if document is None or not document.preview:
+        return HttpResponse("Preview not found", status=404)
+    return serve_file(request, document.preview.name, f"preview-{document.id}.jpg")
+
+
+def download_own_document(request, token, doc_id):
+    """Candidate download of their own documents through their upload link"""
+    candidate = get_upload_candidate(token)
+    if candidate is None:
+        return HttpResponse("This document upload link is invalid or has expired.", status=403)
+
+    document = Document.objects.filter(id=doc_id, candidate=candidate).first()
+    if document is None:
+        return HttpResponse("Document not found", status=404)
+    document.candidate = candidate
+    return serve_file(request, document.file.name, document_download_name(document))
+
+
+@login_required
+@role_required(UserRole.HR)
 def hr_dashboard(request):
     """HR Dashboard to view and verify documents"""
-    if request.user.userprofile.role != UserRole.HR:
-        return HttpResponse("Not allowed. HR access only.")
-    
-    # Get all candidates with documents
-    candidates_with_docs = Candidate.objects.filter(
-        document__isnull=False
-    ).distinct().annotate(
-        total_docs=Count('document'),
-        pending_docs=Count('document', filter=Q(document__status=DocumentStatus.PENDING)),
-        verified_docs=Count('document', filter=Q(document__status=DocumentStatus.VERIFIED))
-    ).order_by('-created_at')
-    
-    # Get all pending documents
-    pending_documents = Document.objects.filter(status=DocumentStatus.PENDING).order_by('-uploaded_at')
-    
-    # Get all documents grouped by candidate
-    all_documents = Document.objects.all().order_by('-uploaded_at')
+    page_size = get_page_size(request.GET.get('page_size'))
+
+    # Document filters; the listing defaults to the pending verification queue
+    status = request.GET.get('status', DocumentStatus.PENDING)
+    document_type = request.GET.get('document_type', '')
+    candidate_id = request.GET.get('candidate', '')
+
+    # Account lookups are folded into the candidate query so the page costs
+    # the same number of queries no matter how many candidates there are
+    accounts = User.objects.filter(email=OuterRef('email'))
+
+    # Get candidates with documents, one page at a time. Document counts
+    # are read from the candidate's stored counters
+    candidates_with_docs = Candidate.objects.filter(total_docs__gt=0).annotate(
+        has_account=Exists(accounts),
+        account_username=Subquery(accounts.order_by('id').values('username')[:1]),
+    )
+    candidates_page = KeysetPage(
+        candidates_with_docs, 'created_at',
+        cursor=request.GET.get('candidate_cursor'), page_size=page_size,
+    )
+
+    # Get the filtered documents, one page at a time
+    documents = Document.objects.select_related('candidate')
+    if status in DocumentStatus.values:
+        documents = documents.filter(status=status)
+    else:
+        status = ''
+    if document_type:
+        documents = documents.filter(document_type=document_type)
+    if candidate_id.isdigit():
+        documents = documents.filter(candidate_id=candidate_id)
+    else:
+        candidate_id = ''
+    documents_page = KeysetPage(
+        documents, 'uploaded_at',
+        cursor=request.GET.get('doc_cursor'), page_size=page_size,
+    )
     
-    # Check which candidates have all documents verified and don't have user accounts yet
+    # Check which candidates have all documents verified and don't have user accounts yet.
+    # Superseded documents aren't in total_docs, so an outstanding re-upload keeps
+    # a candidate out of this list
     candidates_ready_for_credentials = []
     candidates_with_accounts = {}  # Store username for candidates who have accounts
-    for candidate in candidates_with_docs:
-        if candidate.pending_docs == 0 and candidate.verified_docs > 0:
-            user = User.objects.filter(email=candidate.email).first()
-            if not user:
+    for candidate in candidates_page:
+        if candidate.total_docs > 0 and candidate.verified_docs == candidate.total_docs:
+            if not candidate.has_account:
                 candidates_ready_for_credentials.append(candidate.id)
             else:
                 # Store username for display
-                candidates_with_accounts[candidate.id] = user.username
+                candidates_with_accounts[candidate.id] = candidate.account_username
+
+    # Query string for the current filters, reused by the pagination links
+    filters = {'page_size': page_size, 'status': status}
+    if document_type:
+        filters['document_type'] = document_type
+    if candidate_id:
+        filters['candidate'] = candidate_id
     
     context = {
-        'candidates': candidates_with_docs,
-        'pending_documents': pending_documents,
-        'all_documents': all_documents,
+        'candidates': candidates_page,
+        'documents': documents_page,
+        'pending_count': Document.objects.filter(status=DocumentStatus.PENDING).count(),
+        'candidate_count': candidates_with_docs.count(),
+        'document_count': Document.objects.count(),
         'candidates_ready_for_credentials': candidates_ready_for_credentials,
         'candidates_with_accounts': candidates_with_accounts,
+        'status_choices': DocumentStatus.choices,
+        'filters': filters,
+        'filter_query': urlencode(filters),
     }
     
     return render(request, "documents/hr_dashboard.html", context)
 
 
+def set_document_status(document, status):
+    """Change a document's status and the candidate's counters together.
+    Returns False if the status machine doesn't allow the change."""
+    old_status = document.status
+    if old_status == status:
+        return True
+    if status not in STATUS_TRANSITIONS[old_status]:
+        return False
+    with transaction.atomic():
+        # Only if no one else has moved it since it was read, so two
+        # reviewers can't both adjust the counters
+        if not Document.objects.filter(pk=document.pk, status=old_status).update(status=status):
+            document.status = Document.objects.filter(pk=document.pk).values_list('status', flat=True).first()
+            return document.status == status
+        adjust_document_counts(document.candidate_id, old_status, status)
+    document.status = status
+    return True
+
+
+MAX_BULK_DOCUMENTS = 500
+
+
+def bulk_set_document_status(ids, status):
+    """Move many documents to ``status`` with a single UPDATE. Returns the ids
+    that were updated, already had the status, can't make that transition or
+    don't exist."""
+    sources = transition_sources(status)
+    with transaction.atomic():
+        rows = list(
+            Document.objects.select_for_update().filter(id__in=ids).values_list('id', 'candidate_id', 'status')
+        )
+        movable = [(doc_id, candidate_id) for doc_id, candidate_id, current in rows if current in sources]
+        if movable:
+            Document.objects.filter(id__in=[doc_id for doc_id, _ in movable], status__in=sources).update(status=status)
+            rebuild_document_counts(Candidate.objects.filter(id__in={candidate_id for _, candidate_id in movable}))
+
+    found = {doc_id: current for doc_id, _, current in rows}
+    return {
+        "updated": sorted(doc_id for doc_id, _ in movable),
+        "unchanged": sorted(doc_id for doc_id, current in found.items() if current == status),
+        "invalid": sorted(doc_id for doc_id, current in found.items() if current != status and current not in sources),
+        "missing": sorted(set(ids) - found.keys()),
+    }
+
+
 @login_required
+@role_required(UserRole.HR)
 def verify_document(request, doc_id):
-    if request.user.userprofile.role != UserRole.HR:
-        return HttpResponse("Not allowed")
-
     try:
         document = Document.objects.get(id=doc_id)
     except Document.DoesNotExist:
@@ -116,30 +397,56 @@ def verify_document(request, doc_id):
         action = request.POST.get("action")
 
         if action == "verify":
-            document.status = DocumentStatus.VERIFIED
-            document.save()
-            messages.success(request, "Document verified successfully!")
+            if set_document_status(document, DocumentStatus.VERIFIED):
+                messages.success(request, "Document verified successfully!")
+            else:
+                messages.error(request, "This document can no longer be verified.")
             
         elif action == "reupload":
-            document.status = DocumentStatus.REUPLOAD
-            document.save()
-            messages.info(request, "Document marked for re-upload.")
+            if set_document_status(document, DocumentStatus.REUPLOAD):
+                messages.info(request, "Document marked for re-upload.")
+            else:
+                messages.error(request, "This document can no longer be marked for re-upload.")
 
         return redirect('hr_dashboard')
 
     return render(request, "documents/verify.html", {"document": document})
 
 
+def hr_only_json(request):
+    return JsonResponse({"error": "Not allowed. HR access only."}, status=403)
+
+
 @login_required
+@require_POST
+@role_required(UserRole.HR, denied=hr_only_json)
+async def bulk_document_status(request):
+    """Apply one review decision to many documents (``ids`` and ``status``
+    form fields) and answer with JSON, so reviewers don't reload the dashboard
+    after every document"""
+    status = request.POST.get("status", "")
+    if status not in (DocumentStatus.VERIFIED, DocumentStatus.REUPLOAD):
+        return JsonResponse({"error": "status must be VERIFIED or REUPLOAD."}, status=400)
+    try:
+        ids = {int(doc_id) for doc_id in request.POST.getlist("ids")}
+    except ValueError:
+        return JsonResponse({"error": "ids must be document ids."}, status=400)
+    if not 0 < len(ids) <= MAX_BULK_DOCUMENTS:
+        return JsonResponse({"error": f"Send between 1 and {MAX_BULK_DOCUMENTS} document ids."}, status=400)
+
+    # Transactions need a synchronous connection
+    result = await sync_to_async(bulk_set_document_status)(ids, status)
+    return JsonResponse({"status": status, **result})
+
+
+@login_required
+@role_required(UserRole.HR)
 def send_login_credentials(request, candidate_id):
     """HR manually sends login credentials to candidate after all documents are verified"""
     # Only allow POST requests for security
     if request.method != 'POST':
         messages.error(request, "Invalid request method. Please use the form.")
         return redirect('hr_dashboard')
-    
-    if request.user.userprofile.role != UserRole.HR:
-        return HttpResponse("Not allowed")
 
     try:
         candidate = Candidate.objects.get(id=candidate_id)
@@ -147,8 +454,8 @@ def send_login_credentials(request, candidate_id):
         messages.error(request, "Candidate not found")
         return redirect('hr_dashboard')
 
-    # Check if all documents are verified
-    all_documents = Document.objects.filter(candidate=candidate)
+    # Check if all documents are verified; replaced documents don't count
+    all_documents = Document.objects.filter(candidate=candidate).exclude(status=DocumentStatus.SUPERSEDED)
     if not all_documents.exists():
         messages.error(request, "No documents found for this candidate.")
         return redirect('hr_dashboard')
@@ -254,41 +561,8 @@ HR Team
         }
     )
     
-    # Debug information
-    print("=" * 50)
-    print("ATTEMPTING TO SEND EMAIL")
-    print(f"To: {candidate.email}")
-    print(f"From: {settings.DEFAULT_FROM_EMAIL}")
-    print(f"Subject: {subject}")
-    print(f"SMTP Host: {settings.EMAIL_HOST}")
-    print(f"SMTP Port: {settings.EMAIL_PORT}")
-    print(f"Use TLS: {settings.EMAIL_USE_TLS}")
-    print("=" * 50)
-    
-    try:
-        result = send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [candidate.email],
-            fail_silently=False,
-            html_message=html_message,
-        )
-        print(f"Send mail result: {result}")
-        if result:
-            messages.success(request, f"✅ Login credentials sent successfully to {candidate.email}")
-            print(f"✅ Email sent successfully to {candidate.email}")
-        else:
-            messages.error(request, f"Email sending returned False. Check email configuration.")
-            print(f"❌ Email sending failed - returned False for {candidate.email}")
-    except Exception as e:
-        error_msg = str(e)
-        messages.error(request, f"Failed to send email: {error_msg}")
-        print(f"❌ Email error: {error_msg}")
-        print(f"Attempted to send to: {candidate.email}")
-        print(f"From: {settings.DEFAULT_FROM_EMAIL}")
-        import traceback
-        traceback.print_exc()
-        print("=" * 50)
+    # Delivered by the send_queued_emails worker, off the request path
+    enqueue_email(subject, message, [candidate.email], html_message=html_message)
+    messages.success(request, f"✅ Login credentials queued for {candidate.email}")
     
     return redirect('hr_dashboard')
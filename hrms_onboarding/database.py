@@ -0,0 +1,90 @@
+"""DATABASES from the environment.
+
+DATABASE_ENGINE=sqlite (default) or postgresql. For PostgreSQL set
+DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST and
+DATABASE_PORT; connections come from a psycopg pool (DATABASE_POOL_MIN_SIZE,
+DATABASE_POOL_MAX_SIZE) unless DATABASE_POOL=0, in which case they are kept
+open for DATABASE_CONN_MAX_AGE seconds. SQLite uses DATABASE_NAME as the file
+path and is tuned for concurrent requests unless DATABASE_SQLITE_TUNED=0;
+DATABASE_SQLITE_WAL=1 also switches it to WAL mode, as deployments should.
+"""
+import os
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = [
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-20000',
+    'PRAGMA mmap_size=134217728',
+]
+# WAL lets readers carry on while one writer commits; synchronous=NORMAL is
+# durable across crashes of the app (not of the OS) in WAL mode and avoids an
+# fsync per commit. Opt-in, because switching rewrites the database file's
+# header, which would leave the db.sqlite3 tracked in the repository modified
+# after every development run.
+SQLITE_WAL_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+]
+
+
+def env_flag(environ, name, default):
+    value = environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_options(tuned=True, wal=False):
+    if not tuned:
+        return {}
+    return {
+        'init_command': ';'.join((SQLITE_WAL_PRAGMAS if wal else []) + SQLITE_PRAGMAS),
+        # Take the write lock when the transaction starts. Deferred
+        # transactions that read and then write fail with "database is
+        # locked" straight away instead of waiting for the lock.
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 5,
+    }
+
+
+def database_settings(base_dir, environ=os.environ):
+    engine = environ.get('DATABASE_ENGINE', 'sqlite').lower()
+
+    if engine in ('postgres', 'postgresql'):
+        pooled = env_flag(environ, 'DATABASE_POOL', True)
+        options = {}
+        if pooled:
+            options['pool'] = {
+                'min_size': int(environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+                'max_size': int(environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+                'timeout': 10,
+            }
+        return {
+            'default': {
+                'ENGINE': 'django.db.backends.postgresql',
+                'NAME': environ.get('DATABASE_NAME', 'hrms'),
+                'USER': environ.get('DATABASE_USER', ''),
+                'PASSWORD': environ.get('DATABASE_PASSWORD', ''),
+                'HOST': environ.get('DATABASE_HOST', ''),
+                'PORT': environ.get('DATABASE_PORT', ''),
+                # The pool manages connection lifetime itself
+                'CONN_MAX_AGE': 0 if pooled else int(environ.get('DATABASE_CONN_MAX_AGE', 600)),
+                'CONN_HEALTH_CHECKS': True,
+                'OPTIONS': options,
+            }
+        }
+
+    if engine != 'sqlite':
+        raise ValueError(f"Unsupported DATABASE_ENGINE {engine!r}; use sqlite or postgresql")
+    return {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': environ.get('DATABASE_NAME', base_dir / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(environ.get('DATABASE_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': sqlite_options(
+                env_flag(environ, 'DATABASE_SQLITE_TUNED', True), env_flag(environ, 'DATABASE_SQLITE_WAL', False),
+            ),
+        }
+    }
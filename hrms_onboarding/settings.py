@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,14 +43,20 @@ INSTALLED_APPS = [
     'accounts',
     'candidate',
     'documents',
+    'notifications',
+    'attendance',
+    'leave',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.UserRoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,7 +65,8 @@ ROOT_URLCONF = 'hrms_onboarding.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timed for the request metrics
+        'BACKEND': 'monitoring.templates.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,12 +85,9 @@ WSGI_APPLICATION = 'hrms_onboarding.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Configured from DATABASE_* environment variables; see database.py.
+# Defaults to SQLite in WAL mode at BASE_DIR / 'db.sqlite3'.
+DATABASES = database_settings(BASE_DIR)
 
 
 # Password validation
@@ -128,6 +135,49 @@ LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/accounts/redirect/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Seconds a user's role stays cached, and so how long other worker processes
+# can go on using an old role; see accounts/roles.py.
+USER_ROLE_CACHE_TIMEOUT = 60
+
+# Seconds candidate onboarding/upload tokens stay cached, and how long an
+# unknown token is remembered as invalid; they bound how long other worker
+# processes can use a changed token, see candidate/tokens.py.
+TOKEN_CACHE_TIMEOUT = 30
+INVALID_TOKEN_CACHE_TIMEOUT = 30
+
+# Request metrics: requests taking longer than this are logged as JSON on the
+# hrms.requests logger with their slowest SQL (REQUEST_LOG_LEVEL=INFO logs
+# every request); histograms at /metrics
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Attendance rollups: a first clock-in more than the grace period after the
+# shift starts is late, time worked beyond the workday is overtime, and a
+# working day (0 = Monday) without punches is an absence
+ATTENDANCE_SHIFT_START = '09:00'
+ATTENDANCE_LATE_GRACE_MINUTES = 10
+ATTENDANCE_WORKDAY_HOURS = 8
+ATTENDANCE_WORKING_DAYS = [0, 1, 2, 3, 4]
+# A shift that starts less than this many hours before midnight may end up
+# to this many hours after it, and counts towards the day it started (at
+# most 12)
+ATTENDANCE_OVERNIGHT_HOURS = 8
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'hrms.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # for gmail
 
@@ -146,4 +196,38 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 # for media
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Documents are only reachable through the authenticated download views.
+# Set DOCUMENT_SENDFILE to hand the byte transfer to the front-end server:
+# 'x-sendfile' (Apache mod_xsendfile, lighttpd) or 'x-accel-redirect' (nginx,
+# with an `internal` location at DOCUMENT_ACCEL_PREFIX aliased to MEDIA_ROOT)
+DOCUMENT_SENDFILE = None
+DOCUMENT_ACCEL_PREFIX = '/protected-media/'
+
+# Uploaded files are stored under their content hash so duplicates share a blob
+STORAGES = {
+    'default': {
+        'BACKEND': 'documents.storage.ContentAddressedStorage',
+    },
+    # Untouched uploads kept by the image ingest stage; point this at slower,
+    # cheaper storage in production
+    'originals': {
+        'BACKEND': 'documents.storage.ContentAddressedStorage',
+        'OPTIONS': {'location': BASE_DIR / 'originals'},
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Image ingest: uploaded photos are auto-oriented, stripped of EXIF and
+# re-encoded to fit within DOCUMENT_IMAGE_MAX_DIMENSION pixels
+DOCUMENT_IMAGE_MAX_DIMENSION = 2400
+DOCUMENT_IMAGE_QUALITY = 85
+DOCUMENT_KEEP_ORIGINALS = False
+
+# for chunked document uploads (partial files are kept outside MEDIA_ROOT)
+CHUNKED_UPLOAD_DIR = BASE_DIR / 'upload_chunks'
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 5 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_FILE_SIZE = 100 * 1024 * 1024
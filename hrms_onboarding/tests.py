@@ -0,0 +1,370 @@
+"""Query and response time budgets for every URL, against a database seeded
+at production-like volumes.
+
+Each route in the URLconf needs a case in URLBudgetTests.cases(); a new URL
+without one fails test_every_url_has_a_budget. A budget is the query count
+measured when it was set, so a query per row (N+1) fails it straight away.
+Raise one only with a reason. Response times are only checked with
+CHECK_RESPONSE_TIMES=1: wall-clock limits fail on a busy machine however
+good the code is.
+
+DatabaseSettingsTests covers the DATABASES built from the environment.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.utils import ConnectionHandler, load_backend
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from accounts.models import UserProfile, UserRole
+from accounts.roles import get_user_role
+from attendance.models import Device
+from candidate.models import Candidate, CandidateToken
+from documents.models import (
+    Document, DocumentStatus, DocumentToken, PreviewStatus, UploadSession, rebuild_document_counts,
+)
+from documents.views import create_document
+from leave.ledger import approve_leave, post_entries, request_leave
+from leave.models import LeaveLedgerEntry, LeaveRequest, LeaveType, LedgerEntryKind
+from .database import SQLITE_PRAGMAS, SQLITE_WAL_PRAGMAS, database_settings, env_flag, sqlite_options
+
+CANDIDATES = 2000
+DOCUMENT_TYPES = ['ID Proof', 'Address Proof', 'Resume']
+LEAVE_TYPES = 4
+# Seconds any single request may take against the seeded database, when
+# checked
+CHECK_RESPONSE_TIMES = env_flag(os.environ, 'CHECK_RESPONSE_TIMES', False)
+RESPONSE_TIME_BUDGET = 0.5
+SLOW_ROUTES = {
+    # Hashes the new account's password
+    'documents/hr/send-credentials/<int:candidate_id>/': 2.0,
+}
+# URL prefixes that aren't this project's views
+UNBUDGETED_PREFIXES = ('admin/',)
+
+
+def url_routes(patterns=None, prefix=''):
+    """Every route in the URLconf as its pattern string, e.g.
+    'documents/file/<int:doc_id>/'"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from url_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route
+
+
+class URLBudgetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=f'{cls.media_root}/media',
+            CHUNKED_UPLOAD_DIR=f'{cls.media_root}/chunks',
+        )
+        settings_override.enable()
+        cls.addClassCleanup(settings_override.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr_user = User.objects.create_user(username='hr', password='pass1234')
+        cls.employee = User.objects.create_user(username='employee', password='pass1234')
+        UserProfile.objects.filter(user=cls.employee).update(role=UserRole.EMPLOYEE)
+
+        candidates = Candidate.objects.bulk_create([
+            Candidate(email=f'candidate{i}@example.com', name=f'Candidate {i}', phone='5550100')
+            for i in range(CANDIDATES)
+        ])
+        statuses = [DocumentStatus.PENDING, DocumentStatus.VERIFIED, DocumentStatus.REUPLOAD]
+        Document.objects.bulk_create([
+            Document(
+                candidate=candidate, document_type=document_type,
+                file=f'documents/{i}-{document_type}.pdf',
+                # Mostly pending, like a reviewer's backlog
+                status=DocumentStatus.VERIFIED if i % 5 == 0 else statuses[(i + j) % 3],
+            )
+            for i, candidate in enumerate(candidates)
+            for j, document_type in enumerate(DOCUMENT_TYPES)
+        ], batch_size=500)
+        rebuild_document_counts()
+        # A quarter of the candidates already have an account
+        User.objects.bulk_create([
+            User(username=f'user{c.id}', email=c.email) for c in candidates[::4]
+        ])
+
+        cls.invited = Candidate.objects.create(email='invited@example.com')
+        cls.candidate_token = CandidateToken.objects.create(candidate=cls.invited)
+
+        # The candidate uploading documents, with real files
+        cls.candidate = Candidate.objects.create(email='new@example.com', name='New Hire')
+        cls.document_token = DocumentToken.objects.create(candidate=cls.candidate)
+        cls.document = create_document(cls.candidate, 'Resume', ContentFile(b'%PDF-1.4 resume', name='resume.pdf'))
+        Document.objects.filter(id=cls.document.id).update(
+            preview=default_storage.save('previews/resume.jpg', ContentFile(b'jpeg')),
+            preview_status=PreviewStatus.READY,
+        )
+        for document_type in DOCUMENT_TYPES[:2]:
+            create_document(cls.candidate, document_type, ContentFile(b'%PDF-1.4 scan', name='scan.pdf'))
+
+        # Fully verified, ready for credentials
+        cls.verified = candidates[5]
+        Document.objects.filter(candidate=cls.verified).update(status=DocumentStatus.VERIFIED)
+        rebuild_document_counts(Candidate.objects.filter(id=cls.verified.id))
+
+        cls.device = Device.objects.create(code='gate-1')
+
+        # A year of monthly accruals for every account, and a queue of requests
+        today = date.today()
+        leave_types = LeaveType.objects.bulk_create([
+            LeaveType(code=f'L{i}', name=f'Leave {i}', annual_allowance=12) for i in range(LEAVE_TYPES)
+        ])
+        users = list(User.objects.values_list('id', flat=True))
+        post_entries([
+            LeaveLedgerEntry(
+                employee_id=user_id, leave_type=leave_type, kind=LedgerEntryKind.ACCRUAL, days=1,
+                effective_date=today,
+            )
+            for user_id in users for leave_type in leave_types for _ in range(12)
+        ])
+        monday = today + timedelta(days=7 - today.weekday())
+        LeaveRequest.objects.bulk_create([
+            LeaveRequest(employee_id=user_id, leave_type=leave_types[0], start_date=monday, end_date=monday, days=1)
+            for user_id in users[:300]
+        ])
+        cls.leave_type = leave_types[0]
+        cls.leave_start = monday
+        cls.leave_requests = [
+            request_leave(cls.employee, leave_types[1], monday, monday + timedelta(days=1)) for _ in range(2)
+        ]
+        # HR manages a team of 300, a sixth of them on a week's leave
+        team = users[-300:]
+        UserProfile.objects.filter(user_id__in=team + [cls.employee.id]).update(manager=cls.hr_user)
+        for n, user_id in enumerate(team[::6]):
+            start = monday + timedelta(days=7 * (n % 4))
+            leave_request = request_leave(User(id=user_id), leave_types[2], start, start + timedelta(days=4))
+            approve_leave(leave_request.id, cls.hr_user)
+
+    def setUp(self):
+        cache.clear()
+        # Steady state: roles are served from the cache
+        get_user_role(self.hr_user)
+        get_user_role(self.employee)
+
+    def upload_session(self, content, received):
+        session = UploadSession.objects.create(
+            candidate=self.candidate, document_type='Offer Letter', filename='offer.pdf',
+            size=len(content), checksum=hashlib.sha256(content).hexdigest(), received=received,
+        )
+        session.partial_path.parent.mkdir(parents=True, exist_ok=True)
+        session.partial_path.write_bytes(content[:received])
+        return session
+
+    def cases(self):
+        """(route, method, user, path, data, expected status, query budget),
+        optionally followed by extra keyword arguments for the test client"""
+        token = self.document_token.token
+        doc = self.document.id
+        content = b'%PDF-1.4 offer letter'
+        partial = self.upload_session(content, 4)
+        complete = self.upload_session(content, len(content))
+        pending = list(
+            Document.objects.filter(status=DocumentStatus.PENDING).order_by('id').values_list('id', flat=True)[:200]
+        )
+        csv = SimpleUploadedFile('invite.csv', b'email,name\n' + b''.join(
+            f'invitee{i}@example.com,Invitee {i}\n'.encode() for i in range(100)
+        ))
+        hr, employee = self.hr_user, self.employee
+        # A device's upload: a day's punches for 500 employees
+        punches = ''.join(
+            f'{{"employee": {user_id}, "timestamp": "2024-03-04T09:{i % 60:02d}:00+00:00", "direction": "in"}}\n'
+            for i, user_id in enumerate(User.objects.order_by('id').values_list('id', flat=True)[:500])
+        )
+
+        return [
+            ('', 'get', None, '/', {}, 200, 0),
+            ('accounts/login/', 'get', None, '/accounts/login/', {}, 200, 0),
+            ('accounts/logout/', 'get', hr, '/accounts/logout/', {}, 302, 4),
+            ('accounts/redirect/', 'get', hr, '/accounts/redirect/', {}, 302, 2),
+            ('employee/dashboard/', 'get', employee, '/employee/dashboard/', {}, 200, 2),
+            ('candidate/create/', 'get', hr, '/candidate/create/', {}, 200, 2),
+            ('candidate/create/', 'post', hr, '/candidate/create/', {'email': 'invite@example.com'}, 200, 9),
+            ('candidate/bulk-invite/', 'get', hr, '/candidate/bulk-invite/', {}, 200, 2),
+            ('candidate/bulk-invite/', 'post', hr, '/candidate/bulk-invite/', {'file': csv}, 200, 10),
+            ('candidate/onboard/<uuid:token>/', 'get', None,
+             f'/candidate/onboard/{self.candidate_token.token}/', {}, 200, 1),
+            ('candidate/onboard/<uuid:token>/', 'post', None,
+             f'/candidate/onboard/{self.candidate_token.token}/', {'name': 'New Hire', 'phone': '5550100'}, 302, 6),
+            ('documents/upload/<uuid:token>/', 'get', None, f'/documents/upload/{token}/', {}, 200, 2),
+            ('documents/upload/<uuid:token>/', 'post', None, f'/documents/upload/{token}/', {
+                'document_type': 'Payslip', 'file': SimpleUploadedFile('payslip.pdf', b'%PDF-1.4 payslip'),
+            }, 302, 5),
+            ('documents/upload/<uuid:token>/chunked/', 'post', None, f'/documents/upload/{token}/chunked/', {
+                'document_type': 'Degree', 'filename': 'degree.pdf', 'size': 100, 'checksum': 'a' * 64,
+            }, 201, 4),
+            ('documents/upload/<uuid:token>/chunked/<uuid:upload_id>/', 'get', None,
+             f'/documents/upload/{token}/chunked/{partial.id}/', {}, 200, 1),
+            ('documents/upload/<uuid:token>/chunked/<uuid:upload_id>/finalize/', 'post', None,
+             f'/documents/upload/{token}/chunked/{complete.id}/finalize/', {}, 201, 7),
+            ('documents/upload/<uuid:token>/file/<int:doc_id>/', 'get', None,
+             f'/documents/upload/{token}/file/{doc}/', {}, 200, 1),
+            ('documents/hr/dashboard/', 'get', hr, '/documents/hr/dashboard/', {}, 200, 7),
+            ('documents/hr/dashboard/', 'get', hr, '/documents/hr/dashboard/?status=VERIFIED&page_size=100',
+             {}, 200, 7),
+            ('documents/file/<int:doc_id>/', 'get', hr, f'/documents/file/{doc}/', {}, 200, 3),
+            ('documents/file/<int:doc_id>/preview/', 'get', hr, f'/documents/file/{doc}/preview/', {}, 200, 3),
+            ('documents/hr/documents/status/', 'post', hr, '/documents/hr/documents/status/',
+             {'ids': pending, 'status': DocumentStatus.VERIFIED}, 200, 7),
+            ('documents/verify/<int:doc_id>/', 'get', hr, f'/documents/verify/{doc}/', {}, 200, 4),
+            ('documents/verify/<int:doc_id>/', 'post', hr, f'/documents/verify/{doc}/', {'action': 'verify'}, 302, 7),
+            ('documents/hr/send-credentials/<int:candidate_id>/', 'post', hr,
+             f'/documents/hr/send-credentials/{self.verified.id}/', {}, 302, 11),
+            ('metrics', 'get', None, '/metrics', {}, 200, 0),
+            ('attendance/timesheet/', 'get', employee, '/attendance/timesheet/', {}, 200, 3),
+            ('attendance/timesheet/', 'get', hr, f'/attendance/timesheet/?employee={employee.id}', {}, 200, 4),
+            ('attendance/punches/', 'post', None, '/attendance/punches/', punches, 200, 5, {
+                'content_type': 'application/x-ndjson', 'headers': {'X-Device-Token': str(self.device.token)},
+            }),
+            ('leave/', 'get', employee, '/leave/', {}, 200, 5),
+            # Includes the check for clashing approved leave
+            ('leave/', 'post', employee, '/leave/', {
+                'leave_type': self.leave_type.id, 'start_date': self.leave_start.isoformat(),
+                'end_date': self.leave_start.isoformat(),
+            }, 302, 10),
+            ('leave/requests/<int:request_id>/cancel/', 'post', employee,
+             f'/leave/requests/{self.leave_requests[0].id}/cancel/', {}, 302, 9),
+            ('leave/approvals/', 'get', hr, '/leave/approvals/', {}, 200, 3),
+            # Includes the clash check and recording the approved days in a savepoint
+            ('leave/requests/<int:request_id>/decide/', 'post', hr,
+             f'/leave/requests/{self.leave_requests[1].id}/decide/', {'action': 'approve'}, 302, 12),
+            ('leave/calendar/', 'get', employee, f'/leave/calendar/?month={self.leave_start:%Y-%m}', {}, 200, 5),
+            ('leave/calendar/', 'get', hr, f'/leave/calendar/?month={self.leave_start:%Y-%m}', {}, 200, 4),
+        ]
+
+    def test_every_url_has_a_budget(self):
+        routes = {route for route in url_routes() if not route.startswith(UNBUDGETED_PREFIXES)}
+        self.assertEqual(routes - {case[0] for case in self.cases()}, set())
+
+    def test_query_and_time_budgets(self):
+        for route, method, user, path, data, expected_status, budget, *extra in self.cases():
+            with self.subTest(route=route, method=method, path=path):
+                client = Client()
+                if user is not None:
+                    client.force_login(user)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path, data, **(extra[0] if extra else {}))
+                    elapsed = time.perf_counter() - started
+
+                self.assertEqual(response.status_code, expected_status)
+                self.assertLessEqual(
+                    len(queries.captured_queries), budget,
+                    '\n'.join(query['sql'] for query in queries.captured_queries),
+                )
+                if CHECK_RESPONSE_TIMES:
+                    self.assertLessEqual(elapsed, SLOW_ROUTES.get(route, RESPONSE_TIME_BUDGET))
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+
+    def test_sqlite_is_the_default(self):
+        database = database_settings(Path('/srv/hrms'), {})['default']
+        self.assertEqual(database['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(database['NAME'], Path('/srv/hrms/db.sqlite3'))
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertEqual(database['OPTIONS'], sqlite_options())
+        # WAL is opt-in
+        self.assertNotIn(SQLITE_WAL_PRAGMAS[0], database['OPTIONS']['init_command'])
+
+    def test_sqlite_from_the_environment(self):
+        database = database_settings(Path('/srv/hrms'), {
+            'DATABASE_ENGINE': 'SQLite', 'DATABASE_NAME': '/data/hrms.sqlite3', 'DATABASE_CONN_MAX_AGE': '0',
+            'DATABASE_SQLITE_WAL': 'yes',
+        })['default']
+        self.assertEqual(database['NAME'], '/data/hrms.sqlite3')
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['init_command'], ';'.join(SQLITE_WAL_PRAGMAS + SQLITE_PRAGMAS))
+
+        untuned = database_settings(Path('/srv/hrms'), {'DATABASE_SQLITE_TUNED': '0', 'DATABASE_SQLITE_WAL': '1'})
+        self.assertEqual(untuned['default']['OPTIONS'], {})
+
+    def test_sqlite_options(self):
+        options = sqlite_options()
+        self.assertEqual(options['init_command'], ';'.join(SQLITE_PRAGMAS))
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(options['timeout'], 5)
+        self.assertEqual(sqlite_options(wal=True)['init_command'], ';'.join(SQLITE_WAL_PRAGMAS + SQLITE_PRAGMAS))
+        self.assertEqual(sqlite_options(tuned=False), {})
+
+    def test_postgresql_is_pooled(self):
+        database = database_settings(Path('/srv/hrms'), {
+            'DATABASE_ENGINE': 'postgres', 'DATABASE_NAME': 'people', 'DATABASE_HOST': 'db',
+            'DATABASE_POOL_MAX_SIZE': '20',
+        })['default']
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((database['NAME'], database['HOST']), ('people', 'db'))
+        # The pool manages connection lifetime itself
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertEqual(database['OPTIONS'], {'pool': {'min_size': 2, 'max_size': 20, 'timeout': 10}})
+
+    def test_postgresql_without_a_pool(self):
+        database = database_settings(Path('/srv/hrms'), {
+            'DATABASE_ENGINE': 'postgresql', 'DATABASE_POOL': 'off',
+        })['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 600)
+        self.assertEqual(database['OPTIONS'], {})
+
+        database = database_settings(Path('/srv/hrms'), {
+            'DATABASE_ENGINE': 'postgresql', 'DATABASE_POOL': '0', 'DATABASE_CONN_MAX_AGE': '30',
+        })['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 30)
+
+    def test_unknown_engine(self):
+        with self.assertRaisesMessage(ValueError, "Unsupported DATABASE_ENGINE 'mysql'"):
+            database_settings(Path('/srv/hrms'), {'DATABASE_ENGINE': 'mysql'})
+
+    def test_pragmas_are_applied_on_connect(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        for environ, journal_mode, synchronous in [
+            ({}, 'delete', 2),
+            # synchronous=NORMAL
+            ({'DATABASE_SQLITE_WAL': '1'}, 'wal', 1),
+        ]:
+            with self.subTest(environ=environ):
+                environ['DATABASE_NAME'] = os.path.join(workdir, f'{journal_mode}.sqlite3')
+                # Filled in with Django's defaults, and opened under its own
+                # alias rather than as the test database
+                database = ConnectionHandler(database_settings(Path(workdir), environ)).settings['default']
+                scratch = load_backend(database['ENGINE']).DatabaseWrapper(database, 'scratch')
+                try:
+                    with scratch.cursor() as cursor:
+                        settings = {}
+                        for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store', 'cache_size'):
+                            cursor.execute(f'PRAGMA {pragma}')
+                            settings[pragma] = cursor.fetchone()[0]
+                finally:
+                    scratch.close()
+                self.assertEqual(settings, {
+                    'journal_mode': journal_mode, 'synchronous': synchronous, 'busy_timeout': 5000,
+                    # MEMORY
+                    'temp_store': 2, 'cache_size': -20000,
+                })
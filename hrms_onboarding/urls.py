@@ -6,10 +6,9 @@ The `urlpatterns` list routes URLs to views. For more information please see:
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
 from accounts.views import home, login_redirect, logout_view, employee_dashboard
+from monitoring.views import metrics
 
 urlpatterns = [
     path('', home, name='home'),
@@ -20,5 +19,8 @@ urlpatterns = [
     path('employee/dashboard/', employee_dashboard, name='employee_dashboard'),
     path('candidate/', include('candidate.urls')),
     path('documents/', include('documents.urls')),
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('attendance/', include('attendance.urls')),
+    path('leave/', include('leave.urls')),
+    path('metrics', metrics, name='metrics'),
+]
 
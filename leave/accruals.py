@@ -0,0 +1,147 @@
+"""Monthly accrual and year-end carry-forward for every employee.
+
+Both run over employees in id order, a chunk at a time: each chunk is one
+transaction that reads what it needs in a couple of set-based queries and
+posts its entries with one bulk insert, so no lock is held for longer than a
+chunk. Entries carry their period and the ledger allows one per employee,
+leave type and period, so a run that stopped part way can simply be run
+again: chunks already posted are skipped. The id range can be split into
+partitions and run in separate processes."""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import DecimalField, Exists, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .ledger import post_entries
+from .models import LeaveBalance, LeaveLedgerEntry, LeaveType, LedgerEntryKind
+
+# Employees per transaction
+CHUNK_SIZE = 500
+
+
+def accrual_period(year, month):
+    return f'{year}-{month:02d}'
+
+
+def month_accrual(allowance, month):
+    """The month's share of an annual allowance, to the hundredth. The twelve
+    shares add up to the allowance exactly."""
+    def through(month):
+        return (allowance * month / 12).quantize(Decimal('0.01'))
+    return through(month) - through(month - 1)
+
+
+def employees():
+    return User.objects.filter(is_active=True)
+
+
+def partitions(count):
+    """Split the employees into ``count`` contiguous (first_id, last_id) ranges
+    of about equal size"""
+    ids = list(employees().order_by('id').values_list('id', flat=True))
+    size = -(-len(ids) // count) if ids else 0
+    return [(ids[start], ids[min(start + size, len(ids)) - 1]) for start in range(0, len(ids), size or 1)]
+
+
+def employee_chunks(first_id, last_id, chunk_size=CHUNK_SIZE):
+    """Lists of employee ids from ``first_id`` to ``last_id``, ``chunk_size``
+    at a time"""
+    after = first_id - 1
+    while True:
+        ids = list(
+            employees().filter(id__gt=after, id__lte=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        after = ids[-1]
+
+
+def accrue_chunk(employee_ids, leave_types, year, month):
+    """Post the month's accrual to the employees that don't have it yet.
+    Returns how many entries were posted."""
+    period = accrual_period(year, month)
+    with transaction.atomic():
+        posted = set(
+            LeaveLedgerEntry.objects.filter(
+                employee_id__gte=employee_ids[0], employee_id__lte=employee_ids[-1],
+                kind=LedgerEntryKind.ACCRUAL, period=period,
+            ).values_list('employee_id', 'leave_type_id')
+        )
+        entries = [
+            LeaveLedgerEntry(
+                employee_id=employee_id, leave_type=leave_type, kind=LedgerEntryKind.ACCRUAL,
+                days=month_accrual(leave_type.annual_allowance, month), effective_date=date(year, month, 1),
+                period=period,
+            )
+            for employee_id in employee_ids
+            for leave_type in leave_types
+            if (employee_id, leave_type.id) not in posted
+        ]
+        post_entries(entries)
+    return len(entries)
+
+
+def carry_forward_chunk(employee_ids, leave_types, year):
+    """Lapse whatever the employees' balances hold above each leave type's
+    carry-forward limit at the end of ``year``. Every balance gets an entry,
+    even when nothing lapses, so each is settled exactly once. Returns how
+    many entries were posted."""
+    year_end = date(year, 12, 31)
+    period = str(year)
+    entries = LeaveLedgerEntry.objects.filter(employee=OuterRef('employee'), leave_type=OuterRef('leave_type'))
+    with transaction.atomic():
+        balances = (
+            LeaveBalance.objects.select_for_update()
+            .filter(employee_id__in=employee_ids, leave_type__in=leave_types)
+            .exclude(Exists(entries.filter(kind=LedgerEntryKind.CARRY_FORWARD, period=period)))
+            # The snapshot less anything dated after the year end, such as
+            # approved leave next January
+            .annotate(later=Coalesce(
+                Subquery(
+                    entries.filter(effective_date__gt=year_end).order_by()
+                    .values('employee').annotate(total=Sum('days')).values('total')
+                ),
+                Value(Decimal(0)),
+                output_field=DecimalField(max_digits=8, decimal_places=2),
+            ))
+            .values_list('employee_id', 'leave_type_id', 'balance', 'later')
+        )
+        limits = {leave_type.id: leave_type.max_carry_forward for leave_type in leave_types}
+        new_entries = []
+        for employee_id, leave_type_id, balance, later in balances:
+            # SQLite sums decimals as floats
+            at_year_end = balance - Decimal(later).quantize(Decimal('0.01'))
+            lapsed = max(at_year_end - limits[leave_type_id], Decimal(0))
+            new_entries.append(LeaveLedgerEntry(
+                employee_id=employee_id, leave_type_id=leave_type_id, kind=LedgerEntryKind.CARRY_FORWARD,
+                days=-lapsed, effective_date=year_end, period=period,
+                note=f"Carried {at_year_end - lapsed}, lapsed {lapsed}",
+            ))
+        post_entries(new_entries)
+    return len(new_entries)
+
+
+def accrue_month(year, month, first_id, last_id, chunk_size=CHUNK_SIZE):
+    """Accrue the month for employees ``first_id`` to ``last_id``. Returns
+    (employees, entries posted)."""
+    leave_types = list(LeaveType.objects.filter(is_active=True))
+    seen = posted = 0
+    for employee_ids in employee_chunks(first_id, last_id, chunk_size):
+        posted += accrue_chunk(employee_ids, leave_types, year, month)
+        seen += len(employee_ids)
+    return seen, posted
+
+
+def carry_forward_year(year, first_id, last_id, chunk_size=CHUNK_SIZE):
+    """Settle the year end for employees ``first_id`` to ``last_id``. Returns
+    (employees, entries posted)."""
+    leave_types = list(LeaveType.objects.filter(is_active=True))
+    seen = posted = 0
+    for employee_ids in employee_chunks(first_id, last_id, chunk_size):
+        posted += carry_forward_chunk(employee_ids, leave_types, year)
+        seen += len(employee_ids)
+    return seen, posted
@@ -1,3 +1,57 @@
 from django.contrib import admin
+from .models import LeaveBalance, LeaveDay, LeaveLedgerEntry, LeaveRequest, LeaveType
 
-# Register your models here.
+@admin.register(LeaveType)
+class LeaveTypeAdmin(admin.ModelAdmin):
+    list_display = ('code', 'name', 'annual_allowance', 'max_carry_forward', 'is_active')
+    list_filter = ('is_active',)
+
+@admin.register(LeaveRequest)
+class LeaveRequestAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'leave_type', 'start_date', 'end_date', 'days', 'status', 'created_at')
+    list_filter = ('status', 'leave_type')
+    search_fields = ('employee__username',)
+    raw_id_fields = ('employee', 'decided_by')
+
+@admin.register(LeaveLedgerEntry)
+class LeaveLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'leave_type', 'kind', 'days', 'pending', 'effective_date', 'period', 'created_at')
+    list_filter = ('kind', 'leave_type')
+    search_fields = ('employee__username',)
+    raw_id_fields = ('employee', 'request')
+
+    # Append-only: post corrections through the ledger
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(LeaveBalance)
+class LeaveBalanceAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'leave_type', 'balance', 'pending', 'compacted_through', 'compacted_at')
+    list_filter = ('leave_type',)
+    search_fields = ('employee__username',)
+    raw_id_fields = ('employee',)
+    readonly_fields = (
+        'balance', 'pending', 'last_entry_id', 'compacted_balance', 'compacted_pending', 'compacted_through',
+        'compacted_at',
+    )
+
+@admin.register(LeaveDay)
+class LeaveDayAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'date', 'leave_type', 'request')
+    list_filter = ('leave_type',)
+    search_fields = ('employee__username',)
+    date_hierarchy = 'date'
+    raw_id_fields = ('employee', 'request')
+
+    # Follows the requests: approve or cancel those instead
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,249 @@
+"""The leave ledger and the balance snapshot it keeps up to date.
+
+Every change to an employee's leave is a LeaveLedgerEntry. Posting entries
+applies their totals to LeaveBalance in the same transaction, so reading a
+balance is one row however many years of history lie behind it. Compaction
+moves each balance's checkpoint forward, so checking or rebuilding a balance
+only sums the entries since the last compaction."""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from .models import LeaveBalance, LeaveLedgerEntry, LeaveRequest, LeaveRequestStatus, LedgerEntryKind
+from .overlaps import clear_leave_days, conflicting_leave, record_leave_days
+
+# Entries younger than this are left out of a compaction, so one whose
+# transaction is still open can't slip in behind the checkpoint
+COMPACTION_DELAY = timedelta(hours=1)
+
+
+class LeaveError(ValueError):
+    pass
+
+
+def check_conflicts(employee_id, start, end):
+    conflict = conflicting_leave(employee_id, start, end)
+    if conflict is not None:
+        raise LeaveError(
+            f"This overlaps approved leave from {conflict.start_date:%d %b %Y} to {conflict.end_date:%d %b %Y}."
+        )
+
+
+def apply_to_balances(entries):
+    """Add saved entries to their balance snapshots, creating any that don't
+    exist yet, in one upsert. Call inside the transaction that saves them."""
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+    for entry in entries:
+        total = totals[entry.employee_id, entry.leave_type_id]
+        total[0] += entry.days
+        total[1] += entry.pending
+        total[2] = max(total[2], entry.id)
+    if not totals:
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(LeaveBalance._meta.db_table)
+    # ROUND keeps SQLite, which adds decimals as floats, at two places
+    sql = (
+        f"INSERT INTO {table} (employee_id, leave_type_id, balance, pending, last_entry_id, "
+        f"compacted_balance, compacted_pending, compacted_through) "
+        f"VALUES (%s, %s, %s, %s, %s, 0, 0, 0) "
+        f"ON CONFLICT (employee_id, leave_type_id) DO UPDATE SET "
+        f"balance = ROUND({table}.balance + EXCLUDED.balance, 2), "
+        f"pending = ROUND({table}.pending + EXCLUDED.pending, 2), "
+        f"last_entry_id = CASE WHEN EXCLUDED.last_entry_id > {table}.last_entry_id "
+        f"THEN EXCLUDED.last_entry_id ELSE {table}.last_entry_id END"
+    )
+    adapt = connection.ops.adapt_decimalfield_value
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (employee_id, leave_type_id, adapt(days, 8, 2), adapt(pending, 8, 2), last_entry_id)
+            for (employee_id, leave_type_id), (days, pending, last_entry_id) in totals.items()
+        ])
+
+
+def post_entries(entries):
+    """Append unsaved ledger entries and update the balances they touch, in
+    one transaction (the caller's, if it has one). Returns the saved entries."""
+    with transaction.atomic(savepoint=False):
+        entries = LeaveLedgerEntry.objects.bulk_create(entries)
+        apply_to_balances(entries)
+    return entries
+
+
+def employee_balances(employee):
+    """The employee's balance per active leave type: one query"""
+    return (
+        LeaveBalance.objects.filter(employee=employee, leave_type__is_active=True)
+        .select_related('leave_type').order_by('leave_type__name')
+    )
+
+
+def working_days(start, end):
+    return sum(
+        (start + timedelta(days=n)).weekday() in settings.ATTENDANCE_WORKING_DAYS
+        for n in range((end - start).days + 1)
+    )
+
+
+def request_leave(employee, leave_type, start, end, reason=''):
+    """File a request, holding its days against the balance until it's decided"""
+    if end < start:
+        raise LeaveError("The leave can't end before it starts.")
+    days = Decimal(working_days(start, end))
+    if not days:
+        raise LeaveError("There are no working days between those dates.")
+    check_conflicts(employee.id, start, end)
+
+    with transaction.atomic():
+        # Locked so two requests can't both spend the same days
+        balance = LeaveBalance.objects.select_for_update().filter(employee=employee, leave_type=leave_type).first()
+        available = balance.available if balance else Decimal(0)
+        if days > available:
+            raise LeaveError(f"Only {available} days of {leave_type} are available.")
+        leave_request = LeaveRequest.objects.create(
+            employee=employee, leave_type=leave_type, start_date=start, end_date=end, days=days, reason=reason,
+        )
+        post_entries([LeaveLedgerEntry(
+            employee=employee, leave_type=leave_type, kind=LedgerEntryKind.REQUEST,
+            pending=days, request=leave_request, effective_date=start,
+        )])
+    return leave_request
+
+
+def change_request(request_id, statuses, new_status, kind, days, pending, decided_by=None, employee=None):
+    """Move a request in one of ``statuses`` to ``new_status`` and post the
+    matching entry (``days`` and ``pending`` as multiples of its length)"""
+    with transaction.atomic():
+        requests = LeaveRequest.objects.select_for_update().filter(id=request_id, status__in=statuses)
+        if employee is not None:
+            requests = requests.filter(employee=employee)
+        leave_request = requests.select_related('leave_type').first()
+        if leave_request is None:
+            raise LeaveError("This request can no longer be changed.")
+        # Only approved leave is in the overlap index
+        if new_status == LeaveRequestStatus.APPROVED:
+            check_conflicts(leave_request.employee_id, leave_request.start_date, leave_request.end_date)
+        elif leave_request.status == LeaveRequestStatus.APPROVED:
+            clear_leave_days(leave_request)
+
+        leave_request.status = new_status
+        fields = ['status']
+        if decided_by is not None:
+            leave_request.decided_by = decided_by
+            leave_request.decided_at = timezone.now()
+            fields += ['decided_by', 'decided_at']
+        if new_status == LeaveRequestStatus.APPROVED:
+            try:
+                with transaction.atomic():
+                    record_leave_days(leave_request)
+                    leave_request.save(update_fields=fields)
+            except IntegrityError:
+                # Overlapping leave approved since the check trips the day rows
+                # (SQLite) or the exclusion constraint (PostgreSQL) instead
+                check_conflicts(leave_request.employee_id, leave_request.start_date, leave_request.end_date)
+                raise LeaveError("This overlaps leave that was just approved.")
+        else:
+            leave_request.save(update_fields=fields)
+        post_entries([LeaveLedgerEntry(
+            employee_id=leave_request.employee_id, leave_type=leave_request.leave_type, kind=kind,
+            days=days * leave_request.days, pending=pending * leave_request.days,
+            request=leave_request, effective_date=leave_request.start_date,
+        )])
+    return leave_request
+
+
+def approve_leave(request_id, decided_by):
+    return change_request(
+        request_id, [LeaveRequestStatus.PENDING], LeaveRequestStatus.APPROVED,
+        LedgerEntryKind.APPROVAL, days=-1, pending=-1, decided_by=decided_by,
+    )
+
+
+def reject_leave(request_id, decided_by):
+    return change_request(
+        request_id, [LeaveRequestStatus.PENDING], LeaveRequestStatus.REJECTED,
+        LedgerEntryKind.REJECTION, days=0, pending=-1, decided_by=decided_by,
+    )
+
+
+def cancel_leave(request_id, employee):
+    """Withdraw a pending request, or give back the days of approved leave
+    that hasn't started"""
+    leave_request = LeaveRequest.objects.filter(id=request_id, employee=employee).only('status', 'start_date').first()
+    if leave_request is not None and leave_request.status == LeaveRequestStatus.APPROVED:
+        if leave_request.start_date <= timezone.localdate():
+            raise LeaveError("Leave that has started can't be cancelled.")
+        return change_request(
+            request_id, [LeaveRequestStatus.APPROVED], LeaveRequestStatus.CANCELLED,
+            LedgerEntryKind.CANCELLATION, days=1, pending=0, employee=employee,
+        )
+    return change_request(
+        request_id, [LeaveRequestStatus.PENDING], LeaveRequestStatus.CANCELLED,
+        LedgerEntryKind.CANCELLATION, days=0, pending=-1, employee=employee,
+    )
+
+
+def entry_totals(through=None):
+    """Correlated subqueries summing each balance's (days, pending) entries
+    after its checkpoint, up to entry ``through``"""
+    def total(field):
+        entries = LeaveLedgerEntry.objects.filter(
+            employee=OuterRef('employee'), leave_type=OuterRef('leave_type'), id__gt=OuterRef('compacted_through'),
+        )
+        if through is not None:
+            entries = entries.filter(id__lte=through)
+        return Coalesce(
+            Subquery(entries.order_by().values('employee').annotate(total=Sum(field)).values('total')),
+            Value(Decimal(0)),
+            output_field=DecimalField(max_digits=8, decimal_places=2),
+        )
+    return total('days'), total('pending')
+
+
+def compact_balances(balances=None, now=None):
+    """Fold the entries posted since each balance's checkpoint into it, in one
+    UPDATE; returns how many checkpoints moved"""
+    cutoff = (now or timezone.now()) - COMPACTION_DELAY
+    through = LeaveLedgerEntry.objects.filter(created_at__lt=cutoff).aggregate(last=Max('id'))['last']
+    if through is None:
+        return 0
+    if balances is None:
+        balances = LeaveBalance.objects.all()
+    days, pending = entry_totals(through)
+    return balances.filter(compacted_through__lt=through, last_entry_id__gt=F('compacted_through')).update(
+        compacted_balance=Round(F('compacted_balance') + days, 2),
+        compacted_pending=Round(F('compacted_pending') + pending, 2),
+        compacted_through=through,
+        compacted_at=timezone.now(),
+    )
+
+
+def stale_balances(balances=None):
+    """Balances that disagree with their checkpoint plus the entries since"""
+    if balances is None:
+        balances = LeaveBalance.objects.all()
+    days, pending = entry_totals()
+    balances = balances.annotate(
+        actual_balance=Round(F('compacted_balance') + days, 2),
+        actual_pending=Round(F('compacted_pending') + pending, 2),
+    )
+    return balances.filter(~Q(balance=F('actual_balance')) | ~Q(pending=F('actual_pending')))
+
+
+def rebuild_balances(balances=None):
+    """Recompute balances from their checkpoint and the entries since, in one
+    UPDATE; returns rows updated"""
+    if balances is None:
+        balances = LeaveBalance.objects.all()
+    days, pending = entry_totals()
+    return balances.update(
+        balance=Round(F('compacted_balance') + days, 2),
+        pending=Round(F('compacted_pending') + pending, 2),
+    )
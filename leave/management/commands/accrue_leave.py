@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from leave.accruals import CHUNK_SIZE, accrue_month, carry_forward_year, partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Accrue a month's leave for every employee, or with --carry-forward "
+        "settle a year end. Safe to re-run: what was already posted is skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="The month to accrue, YYYY-MM (default: this month)")
+        parser.add_argument(
+            '--carry-forward', type=int, metavar='YEAR',
+            help="Carry forward or lapse each balance at the end of YEAR instead of accruing",
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Employees per transaction")
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Processes to split the employees between, by id range (PostgreSQL only)",
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            # Workers would only queue for SQLite's single write lock
+            raise CommandError("--workers needs PostgreSQL; SQLite commits one writer at a time")
+        if options['carry_forward']:
+            job, period = carry_forward_year, (options['carry_forward'],)
+            label = f"Carry-forward for {options['carry_forward']}"
+        else:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m') if options['month'] else timezone.localdate()
+            except ValueError:
+                raise CommandError("--month must look like 2024-03")
+            job, period = accrue_month, (month.year, month.month)
+            label = f"Accrual for {month:%Y-%m}"
+
+        started = time.perf_counter()
+        ranges = partitions(max(options['workers'], 1))
+        if options['workers'] > 1:
+            # Each process opens its own connection; none may inherit ours
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                futures = [
+                    pool.submit(job, *period, first, last, options['chunk_size']) for first, last in ranges
+                ]
+                results = [future.result() for future in futures]
+        else:
+            results = [job(*period, first, last, options['chunk_size']) for first, last in ranges]
+        elapsed = time.perf_counter() - started
+
+        employees = sum(seen for seen, _ in results)
+        posted = sum(count for _, count in results)
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: posted {posted} entries for {employees} employees in {elapsed:.2f}s "
+            f"({posted / elapsed if elapsed else 0:.0f} entries/s)"
+        ))
@@ -0,0 +1,140 @@
+import random
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from documents.benchmarking import scratch_database
+from leave.ledger import COMPACTION_DELAY, compact_balances, post_entries, stale_balances
+from leave.models import LeaveBalance, LeaveLedgerEntry, LeaveType, LedgerEntryKind
+
+LEAVE_TYPES = [('CL', 'Casual Leave', Decimal(12)), ('SL', 'Sick Leave', Decimal(10)), ('EL', 'Earned Leave', Decimal(18))]
+
+
+def year_of_entries(employee_ids, leave_types, year, rng):
+    """Monthly accruals plus a handful of requests, each approved or
+    rejected, for every employee and leave type"""
+    for employee_id in employee_ids:
+        for leave_type in leave_types:
+            monthly = (leave_type.annual_allowance / 12).quantize(Decimal('0.01'))
+            for month in range(1, 13):
+                yield LeaveLedgerEntry(
+                    employee_id=employee_id, leave_type=leave_type, kind=LedgerEntryKind.ACCRUAL,
+                    days=monthly, effective_date=date(year, month, 1),
+                )
+            for _ in range(rng.randrange(4)):
+                days = Decimal(rng.randint(1, 3))
+                effective_date = date(year, rng.randint(1, 12), rng.randint(1, 28))
+                yield LeaveLedgerEntry(
+                    employee_id=employee_id, leave_type=leave_type, kind=LedgerEntryKind.REQUEST,
+                    pending=days, effective_date=effective_date,
+                )
+                approved = rng.random() < 0.8
+                yield LeaveLedgerEntry(
+                    employee_id=employee_id, leave_type=leave_type,
+                    kind=LedgerEntryKind.APPROVAL if approved else LedgerEntryKind.REJECTION,
+                    days=-days if approved else 0, pending=-days, effective_date=effective_date,
+                )
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark leave balance reads on a scratch database as years of ledger "
+        "history pile up: the balance snapshot against summing the ledger"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=200)
+        parser.add_argument(
+            '--years', default='1,5,10,20',
+            help="History lengths to measure at, comma-separated (default: 1,5,10,20)",
+        )
+        parser.add_argument('--reads', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        checkpoints = sorted(int(years) for years in options['years'].split(','))
+        with scratch_database():
+            employee_ids = [
+                user.id for user in
+                User.objects.bulk_create(User(username=f'employee{i}') for i in range(options['employees']))
+            ]
+            leave_types = LeaveType.objects.bulk_create(
+                LeaveType(code=code, name=name, annual_allowance=allowance) for code, name, allowance in LEAVE_TYPES
+            )
+
+            self.stdout.write(
+                f"  {'years':>5}{'entries':>10}{'per balance':>13}{'post/s':>10}"
+                f"{'snapshot us':>13}{'ledger sum us':>15}"
+            )
+            first_year = date.today().year - checkpoints[-1]
+            posted = 0
+            for years in range(1, checkpoints[-1] + 1):
+                entries = list(year_of_entries(employee_ids, leave_types, first_year + years, rng))
+                started = time.perf_counter()
+                for offset in range(0, len(entries), 5000):
+                    post_entries(entries[offset:offset + 5000])
+                post_rate = len(entries) / (time.perf_counter() - started)
+                posted += len(entries)
+                if years in checkpoints:
+                    snapshot, ledger = self.measure_reads(employee_ids, leave_types, options['reads'], rng)
+                    per_balance = posted // (len(employee_ids) * len(leave_types))
+                    self.stdout.write(
+                        f"  {years:>5}{posted:>10}{per_balance:>13}{post_rate:>10.0f}"
+                        f"{snapshot:>13.0f}{ledger:>15.0f}"
+                    )
+
+            self.stdout.write(self.style.MIGRATE_HEADING('compaction'))
+            self.check_balances('before compacting')
+            started = time.perf_counter()
+            # As if run after the delay, so the whole history is folded in
+            compacted = compact_balances(now=timezone.now() + COMPACTION_DELAY)
+            self.stdout.write(f"  compacted {compacted} balances in {time.perf_counter() - started:.2f}s")
+            post_entries(list(year_of_entries(employee_ids, leave_types, date.today().year + 1, rng)))
+            self.check_balances('after compacting and another year')
+
+    def check_balances(self, label):
+        started = time.perf_counter()
+        stale = stale_balances().count()
+        self.stdout.write(
+            f"  checked every balance against the ledger {label}: "
+            f"{time.perf_counter() - started:.2f}s, {stale} stale"
+        )
+
+    def measure_reads(self, employee_ids, leave_types, reads, rng):
+        """Median microseconds to read one balance each way; checks they agree.
+        The statements are compiled once and run on a plain cursor, so the
+        ORM's fixed cost per query doesn't hide the database's work."""
+        snapshot_sql, _ = LeaveBalance.objects.filter(
+            employee_id=0, leave_type_id=0,
+        ).values_list('balance').query.sql_with_params()
+        ledger_sql, _ = LeaveLedgerEntry.objects.filter(
+            employee_id=0, leave_type_id=0,
+        ).values('employee').annotate(total=Sum('days')).values_list('total').query.sql_with_params()
+
+        snapshot_times, ledger_times = [], []
+        with connection.cursor() as cursor:
+            for _ in range(reads):
+                params = [rng.choice(employee_ids), rng.choice(leave_types).id]
+
+                started = time.perf_counter()
+                cursor.execute(snapshot_sql, params)
+                balance = cursor.fetchone()[0]
+                snapshot_times.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                cursor.execute(ledger_sql, params)
+                summed = cursor.fetchone()[0]
+                ledger_times.append(time.perf_counter() - started)
+
+                # SQLite sums decimals as floats
+                if round(Decimal(str(balance)), 2) != round(Decimal(str(summed)), 2):
+                    raise AssertionError(f"Balance {balance} disagrees with the ledger's {summed}")
+        return statistics.median(snapshot_times) * 1e6, statistics.median(ledger_times) * 1e6
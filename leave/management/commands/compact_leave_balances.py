@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from leave.ledger import compact_balances, rebuild_balances, stale_balances
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the leave balance snapshots against the ledger, repair any that "
+        "drifted, then move their checkpoints forward (with --check, only report)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only report balances that disagree with the ledger",
+        )
+
+    def handle(self, *args, **options):
+        stale = list(stale_balances().values_list('id', flat=True))
+
+        if options['check']:
+            for balance_id in stale:
+                self.stdout.write(f"Stale balance: {balance_id}")
+            if stale:
+                raise CommandError(f"{len(stale)} leave balance(s) disagree with the ledger")
+            self.stdout.write(self.style.SUCCESS("All leave balances match the ledger"))
+            return
+
+        with transaction.atomic():
+            if stale:
+                rebuild_balances(stale_balances())
+            compacted = compact_balances()
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {compacted} leave balances ({len(stale)} were stale and rebuilt)"
+        ))
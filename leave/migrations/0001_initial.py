@@ -0,0 +1,93 @@
+# Generated by Django 5.1 on 2026-10-18 20:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=16, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('annual_allowance', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('max_carry_forward', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaveRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('days', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('reason', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected'), ('CANCELLED', 'Cancelled')], default='PENDING', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('decided_at', models.DateTimeField(blank=True, null=True)),
+                ('decided_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_requests', to=settings.AUTH_USER_MODEL)),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='requests', to='leave.leavetype')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaveLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ACCRUAL', 'Accrual'), ('REQUEST', 'Request'), ('APPROVAL', 'Approval'), ('REJECTION', 'Rejection'), ('CANCELLATION', 'Cancellation'), ('CARRY_FORWARD', 'Carry forward'), ('ADJUSTMENT', 'Adjustment')], max_length=20)),
+                ('days', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('pending', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('effective_date', models.DateField()),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_entries', to=settings.AUTH_USER_MODEL)),
+                ('request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='leave.leaverequest')),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='leave.leavetype')),
+            ],
+            options={
+                'verbose_name_plural': 'leave ledger entries',
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaveBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('pending', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('compacted_balance', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('compacted_pending', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('compacted_through', models.BigIntegerField(default=0)),
+                ('compacted_at', models.DateTimeField(blank=True, null=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_balances', to=settings.AUTH_USER_MODEL)),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='balances', to='leave.leavetype')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['status', 'created_at'], name='leave_request_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['employee', 'start_date'], name='leave_request_employee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaveledgerentry',
+            index=models.Index(fields=['employee', 'leave_type', 'id'], name='leave_entry_balance_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leavebalance',
+            constraint=models.UniqueConstraint(fields=('employee', 'leave_type'), name='leave_balance_unique'),
+        ),
+    ]
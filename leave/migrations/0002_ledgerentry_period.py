@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-18 21:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaveledgerentry',
+            name='period',
+            field=models.CharField(blank=True, max_length=7),
+        ),
+        migrations.AddConstraint(
+            model_name='leaveledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('period', ''), _negated=True), fields=('employee', 'leave_type', 'kind', 'period'), name='leave_entry_period_unique'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1 on 2026-10-18 21:04
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Approved leave as a date range, indexed for overlap queries. Excluding
+# overlaps per employee makes the index a constraint too; btree_gist lets
+# GiST compare employee_id with =.
+POSTGRESQL_SPAN_CONSTRAINT = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE leave_leaverequest ADD CONSTRAINT leave_request_no_overlap "
+    "EXCLUDE USING gist (employee_id WITH =, daterange(start_date, end_date, '[]') WITH &&) "
+    "WHERE (status = 'APPROVED')",
+]
+
+
+def index_approved_leave(apps, schema_editor):
+    """The span constraint on PostgreSQL; elsewhere, the days of the leave
+    already approved"""
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRESQL_SPAN_CONSTRAINT:
+            schema_editor.execute(sql)
+        return
+    LeaveDay = apps.get_model('leave', 'LeaveDay')
+    LeaveRequest = apps.get_model('leave', 'LeaveRequest')
+    for leave_request in LeaveRequest.objects.filter(status='APPROVED').iterator():
+        LeaveDay.objects.bulk_create(
+            LeaveDay(
+                employee_id=leave_request.employee_id, leave_type_id=leave_request.leave_type_id,
+                request=leave_request, date=leave_request.start_date + timedelta(days=n),
+            )
+            for n in range((leave_request.end_date - leave_request.start_date).days + 1)
+        )
+
+
+def drop_span_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE leave_leaverequest DROP CONSTRAINT IF EXISTS leave_request_no_overlap")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave', '0002_ledgerentry_period'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='leave.leavetype')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_days', to='leave.leaverequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='leave_day_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('employee', 'date'), name='leave_day_unique')],
+            },
+        ),
+        migrations.RunPython(index_approved_leave, drop_span_constraint),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-18 21:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave', '0003_leaveday'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='leaveledgerentry',
+            name='request',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='leave.leaverequest'),
+        ),
+    ]
@@ -1,3 +1,156 @@
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+
+class LeaveType(models.Model):
+    code = models.CharField(max_length=16, unique=True)
+    name = models.CharField(max_length=100)
+    # Days credited per year
+    annual_allowance = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    # Unused days that survive the year end; the rest lapse
+    max_carry_forward = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
+class LeaveRequestStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    APPROVED = "APPROVED", "Approved"
+    REJECTED = "REJECTED", "Rejected"
+    CANCELLED = "CANCELLED", "Cancelled"
+
+
+class LeaveRequest(models.Model):
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leave_requests')
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.PROTECT, related_name='requests')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    # Working days between the dates
+    days = models.DecimalField(max_digits=6, decimal_places=2)
+    reason = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=LeaveRequestStatus.choices, default=LeaveRequestStatus.PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    decided_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    decided_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The approvals queue
+            models.Index(fields=['status', 'created_at'], name='leave_request_queue_idx'),
+            models.Index(fields=['employee', 'start_date'], name='leave_request_employee_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} {self.leave_type.code} {self.start_date} - {self.end_date}"
+
+
+class LedgerEntryKind(models.TextChoices):
+    ACCRUAL = "ACCRUAL", "Accrual"
+    REQUEST = "REQUEST", "Request"
+    APPROVAL = "APPROVAL", "Approval"
+    REJECTION = "REJECTION", "Rejection"
+    CANCELLATION = "CANCELLATION", "Cancellation"
+    CARRY_FORWARD = "CARRY_FORWARD", "Carry forward"
+    ADJUSTMENT = "ADJUSTMENT", "Adjustment"
+
+
+class LeaveLedgerEntry(models.Model):
+    """One change to an employee's leave: ``days`` moves the balance and
+    ``pending`` the days held by undecided requests. The ledger is append-only;
+    a mistake is corrected by a new entry. Post entries with
+    leave.ledger.post_entries() so the balance snapshot follows."""
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leave_entries')
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.PROTECT, related_name='entries')
+    kind = models.CharField(max_length=20, choices=LedgerEntryKind.choices)
+    days = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    pending = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    # Entries go with the employee; deleting just a request keeps its entries,
+    # which the balance snapshot already includes
+    request = models.ForeignKey(
+        LeaveRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries',
+    )
+    # The day the change applies to: the accrual month, the leave's start...
+    effective_date = models.DateField()
+    # The month ('2024-03') an accrual or the year ('2024') a carry-forward
+    # is for; one such entry per employee, leave type and period
+    period = models.CharField(max_length=7, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'leave ledger entries'
+        indexes = [
+            # An employee's entries for a leave type after a compaction point
+            models.Index(fields=['employee', 'leave_type', 'id'], name='leave_entry_balance_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['employee', 'leave_type', 'kind', 'period'], condition=~models.Q(period=''),
+                name='leave_entry_period_unique',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Leave ledger entries can't be changed; post a correcting entry")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Leave ledger entries can't be deleted; post a correcting entry")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.days:+} ({self.employee_id}, {self.leave_type_id})"
+
+
+class LeaveDay(models.Model):
+    """One calendar day of approved leave. SQLite has no range index, so
+    there overlap queries look dates up here instead of scanning intervals;
+    see leave.overlaps. Kept in step with the requests by leave.ledger."""
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    request = models.ForeignKey(LeaveRequest, on_delete=models.CASCADE, related_name='leave_days')
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.PROTECT, related_name='+')
+
+    class Meta:
+        constraints = [
+            # Also stops two approved leaves covering the same day
+            models.UniqueConstraint(fields=['employee', 'date'], name='leave_day_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='leave_day_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.date}"
+
+
+class LeaveBalance(models.Model):
+    """The running total of an employee's ledger for one leave type, updated
+    as entries are posted so reading a balance never sums history.
+
+    The compacted_* columns are a checkpoint: the totals of every entry up to
+    compacted_through. The live figures can always be recomputed from the
+    checkpoint plus the entries after it, however long the history."""
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leave_balances')
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.PROTECT, related_name='balances')
+    balance = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    pending = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    last_entry_id = models.BigIntegerField(default=0)
+    compacted_balance = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    compacted_pending = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    compacted_through = models.BigIntegerField(default=0)
+    compacted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'leave_type'], name='leave_balance_unique'),
+        ]
+
+    @property
+    def available(self):
+        return self.balance - self.pending
+
+    def __str__(self):
+        return f"{self.employee} {self.leave_type}: {self.balance}"
@@ -0,0 +1,116 @@
+"""Who is on approved leave when.
+
+Overlap queries ("who is off between X and Y", "does this leave clash with
+any already approved") use whatever interval index the database has. On
+PostgreSQL that is a GiST index over each approved request's date range,
+which is also an exclusion constraint against overlaps (migration 0003).
+SQLite has no range index, so there every day of approved leave gets a
+LeaveDay row, and an overlap is a lookup of the dates in question."""
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import F, Func, Q
+
+from .models import LeaveDay, LeaveRequest, LeaveRequestStatus
+
+
+def uses_occupancy_table():
+    return connection.vendor != 'postgresql'
+
+
+def dates(first, last):
+    return [first + timedelta(days=n) for n in range((last - first).days + 1)]
+
+
+def record_leave_days(leave_request):
+    """Add the days of newly approved leave (SQLite)"""
+    if uses_occupancy_table():
+        LeaveDay.objects.bulk_create(
+            LeaveDay(
+                employee_id=leave_request.employee_id, leave_type_id=leave_request.leave_type_id,
+                request=leave_request, date=day,
+            )
+            for day in dates(leave_request.start_date, leave_request.end_date)
+        )
+
+
+def clear_leave_days(leave_request):
+    """Remove the days of approved leave that was cancelled (SQLite)"""
+    if uses_occupancy_table():
+        LeaveDay.objects.filter(request=leave_request).delete()
+
+
+def approved_leave_between(first, last, employee_ids):
+    """Approved requests of ``employee_ids`` overlapping ``first`` to ``last``"""
+    if uses_occupancy_table():
+        days = LeaveDay.objects.filter(employee_id__in=employee_ids, date__range=(first, last))
+        return LeaveRequest.objects.filter(id__in=days.values('request'))
+
+    from django.contrib.postgres.fields import DateRangeField
+    from django.db.backends.postgresql.psycopg_any import DateRange
+
+    # Spelled as in the constraint's index, so the planner can use it
+    span = Func(
+        F('start_date'), F('end_date'), template="daterange(%(expressions)s, '[]')",
+        output_field=DateRangeField(),
+    )
+    return (
+        LeaveRequest.objects.filter(status=LeaveRequestStatus.APPROVED, employee_id__in=employee_ids)
+        .alias(span=span).filter(span__overlap=DateRange(first, last, '[]'))
+    )
+
+
+def conflicting_leave(employee_id, start, end):
+    """The employee's approved leave that overlaps ``start`` to ``end``, if any"""
+    return approved_leave_between(start, end, [employee_id]).order_by('start_date').first()
+
+
+def team_members(manager_id):
+    """The manager and their direct reports"""
+    return (
+        User.objects.filter(Q(id=manager_id) | Q(userprofile__manager_id=manager_id), is_active=True)
+        .order_by('first_name', 'last_name', 'username')
+    )
+
+
+def team_leave(employee_ids, first, last):
+    """{employee id: {date: leave type code}} of the approved leave from
+    ``first`` to ``last``, in one query"""
+    leave = defaultdict(dict)
+    if uses_occupancy_table():
+        for employee_id, day, code in LeaveDay.objects.filter(
+            employee_id__in=employee_ids, date__range=(first, last),
+        ).values_list('employee_id', 'date', 'leave_type__code'):
+            leave[employee_id][day] = code
+        return leave
+
+    for employee_id, start, end, code in approved_leave_between(first, last, employee_ids).values_list(
+        'employee_id', 'start_date', 'end_date', 'leave_type__code',
+    ):
+        for day in dates(max(start, first), min(end, last)):
+            leave[employee_id][day] = code
+    return leave
+
+
+def team_calendar(members, year, month):
+    """The month's days, and one row per member: their day cells, each with
+    the code of any leave they're on"""
+    first = date(year, month, 1)
+    days = [
+        {'date': day, 'off': day.weekday() not in settings.ATTENDANCE_WORKING_DAYS}
+        for day in dates(first, date(year, month, calendar.monthrange(year, month)[1]))
+    ]
+    leave = team_leave([member.id for member in members], days[0]['date'], days[-1]['date'])
+    rows = []
+    for member in members:
+        on_leave = leave.get(member.id, {})
+        rows.append({
+            'employee': member,
+            'days': [{**day, 'leave': on_leave.get(day['date'], '')} for day in days],
+            'total': len(on_leave),
+        })
+    return days, rows
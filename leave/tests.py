@@ -1,3 +1,485 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserProfile, UserRole
+from .accruals import accrue_month, carry_forward_year, month_accrual, partitions
+from .ledger import (
+    COMPACTION_DELAY, LeaveError, approve_leave, cancel_leave, compact_balances, post_entries, rebuild_balances,
+    reject_leave, request_leave, stale_balances,
+)
+from .models import (
+    LeaveBalance, LeaveDay, LeaveLedgerEntry, LeaveRequest, LeaveRequestStatus, LeaveType, LedgerEntryKind,
+)
+from .overlaps import approved_leave_between, conflicting_leave, team_calendar, team_members
+
+
+def next_monday(weeks=1):
+    today = timezone.localdate()
+    return today + timedelta(days=7 - today.weekday() + 7 * (weeks - 1))
+
+
+def accrue(employee, leave_type, days):
+    return post_entries([LeaveLedgerEntry(
+        employee=employee, leave_type=leave_type, kind=LedgerEntryKind.ACCRUAL,
+        days=Decimal(days), effective_date=timezone.localdate(),
+    )])
+
+
+class LedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = User.objects.create_user(username='employee')
+        cls.hr_user = User.objects.create_user(username='hr')
+        cls.annual = LeaveType.objects.create(code='AL', name='Annual', annual_allowance=20)
+        cls.sick = LeaveType.objects.create(code='SL', name='Sick', annual_allowance=10)
+
+    def balance(self, leave_type=None):
+        return LeaveBalance.objects.get(employee=self.employee, leave_type=leave_type or self.annual)
+
+    def test_posting_updates_the_balance(self):
+        accrue(self.employee, self.annual, '1.67')
+        accrue(self.employee, self.annual, '1.66')
+        entries = accrue(self.employee, self.sick, '0.83')
+
+        balance = self.balance()
+        self.assertEqual((balance.balance, balance.pending), (Decimal('3.33'), Decimal('0')))
+        self.assertEqual(self.balance(self.sick).balance, Decimal('0.83'))
+        self.assertEqual(self.balance(self.sick).last_entry_id, entries[0].id)
+
+    def test_deleting_an_employee_with_leave_history(self):
+        accrue(self.employee, self.annual, 10)
+        monday = next_monday()
+        leave_request = request_leave(self.employee, self.annual, monday, monday)
+        approve_leave(leave_request.id, self.hr_user)
+
+        self.employee.delete()
+        self.assertFalse(LeaveLedgerEntry.objects.exists())
+        self.assertFalse(LeaveRequest.objects.exists())
+        self.assertFalse(LeaveBalance.objects.exists())
+
+    def test_request_holds_days_until_approved(self):
+        accrue(self.employee, self.annual, 10)
+        monday = next_monday()
+        # Monday to the next Monday: six working days
+        leave_request = request_leave(self.employee, self.annual, monday, monday + timedelta(days=7))
+
+        self.assertEqual(leave_request.days, 6)
+        balance = self.balance()
+        self.assertEqual((balance.balance, balance.pending, balance.available), (10, 6, 4))
+
+        approve_leave(leave_request.id, self.hr_user)
+        balance = self.balance()
+        self.assertEqual((balance.balance, balance.pending), (4, 0))
+        leave_request.refresh_from_db()
+        self.assertEqual(leave_request.status, LeaveRequestStatus.APPROVED)
+        self.assertEqual(leave_request.decided_by, self.hr_user)
+        self.assertEqual(
+            list(leave_request.ledger_entries.order_by('id').values_list('kind', flat=True)),
+            [LedgerEntryKind.REQUEST, LedgerEntryKind.APPROVAL],
+        )
+
+    def test_reject_and_cancel_release_the_hold(self):
+        accrue(self.employee, self.annual, 10)
+        monday = next_monday()
+        rejected = request_leave(self.employee, self.annual, monday, monday)
+        withdrawn = request_leave(self.employee, self.annual, monday, monday + timedelta(days=1))
+        self.assertEqual(self.balance().pending, 3)
+
+        reject_leave(rejected.id, self.hr_user)
+        cancel_leave(withdrawn.id, self.employee)
+
+        balance = self.balance()
+        self.assertEqual((balance.balance, balance.pending), (10, 0))
+        with self.assertRaises(LeaveError):
+            approve_leave(rejected.id, self.hr_user)
+
+    def test_cancelling_approved_leave_returns_the_days(self):
+        accrue(self.employee, self.annual, 10)
+        leave_request = request_leave(self.employee, self.annual, next_monday(), next_monday())
+        approve_leave(leave_request.id, self.hr_user)
+
+        cancel_leave(leave_request.id, self.employee)
+
+        self.assertEqual(self.balance().balance, 10)
+        self.assertEqual(LeaveRequest.objects.get().status, LeaveRequestStatus.CANCELLED)
+
+    def test_started_leave_cant_be_cancelled(self):
+        accrue(self.employee, self.annual, 10)
+        leave_request = request_leave(self.employee, self.annual, next_monday(), next_monday())
+        approve_leave(leave_request.id, self.hr_user)
+        LeaveRequest.objects.filter(id=leave_request.id).update(start_date=timezone.localdate())
+
+        with self.assertRaisesMessage(LeaveError, "has started"):
+            cancel_leave(leave_request.id, self.employee)
+
+    def test_only_the_employee_cancels(self):
+        accrue(self.employee, self.annual, 10)
+        leave_request = request_leave(self.employee, self.annual, next_monday(), next_monday())
+
+        with self.assertRaises(LeaveError):
+            cancel_leave(leave_request.id, self.hr_user)
+
+    def test_request_needs_available_days(self):
+        accrue(self.employee, self.annual, 2)
+        monday = next_monday()
+        request_leave(self.employee, self.annual, monday, monday)
+
+        with self.assertRaisesMessage(LeaveError, "Only 1.00 days"):
+            request_leave(self.employee, self.annual, monday, monday + timedelta(days=1))
+        with self.assertRaisesMessage(LeaveError, "Only 0 days"):
+            request_leave(self.employee, self.sick, monday, monday)
+        with self.assertRaisesMessage(LeaveError, "no working days"):
+            request_leave(self.employee, self.annual, monday - timedelta(days=1), monday - timedelta(days=1))
+        self.assertEqual(LeaveRequest.objects.count(), 1)
+
+    def test_entries_are_append_only(self):
+        entry = accrue(self.employee, self.annual, 1)[0]
+
+        entry.days = 5
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+        self.assertEqual(LeaveLedgerEntry.objects.get().days, 1)
+
+    def test_compaction_moves_the_checkpoint(self):
+        for _ in range(3):
+            accrue(self.employee, self.annual, '1.5')
+        later = timezone.now() + COMPACTION_DELAY
+
+        self.assertEqual(compact_balances(now=later), 1)
+        balance = self.balance()
+        self.assertEqual((balance.compacted_balance, balance.compacted_through), (Decimal('4.5'), balance.last_entry_id))
+        # Nothing new to fold in
+        self.assertEqual(compact_balances(now=later), 0)
+        # Too recent to compact yet
+        accrue(self.employee, self.annual, 1)
+        self.assertEqual(compact_balances(), 0)
+        self.assertFalse(stale_balances().exists())
+
+    def test_drifted_balance_is_found_and_rebuilt(self):
+        accrue(self.employee, self.annual, 3)
+        compact_balances(now=timezone.now() + COMPACTION_DELAY)
+        accrue(self.employee, self.annual, 2)
+        LeaveBalance.objects.filter(leave_type=self.annual).update(balance=99)
+
+        self.assertEqual(list(stale_balances()), [self.balance()])
+        rebuild_balances(stale_balances())
+        self.assertEqual(self.balance().balance, 5)
+        self.assertFalse(stale_balances().exists())
+
+
+class AccrualTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employees = [User.objects.create_user(username=f'employee{i}') for i in range(5)]
+        User.objects.create_user(username='former', is_active=False)
+        cls.annual = LeaveType.objects.create(code='AL', name='Annual', annual_allowance=20, max_carry_forward=5)
+        cls.sick = LeaveType.objects.create(code='SL', name='Sick', annual_allowance=10)
+        LeaveType.objects.create(code='OLD', name='Retired', annual_allowance=12, is_active=False)
+        cls.first, cls.last = cls.employees[0].id, cls.employees[-1].id
+
+    def balances(self, leave_type):
+        return list(
+            LeaveBalance.objects.filter(leave_type=leave_type).order_by('employee').values_list('balance', flat=True)
+        )
+
+    def test_monthly_shares_add_up(self):
+        shares = [month_accrual(Decimal(20), month) for month in range(1, 13)]
+        self.assertEqual(sum(shares), 20)
+        self.assertEqual(set(shares), {Decimal('1.67'), Decimal('1.66')})
+
+    def test_accrues_every_active_employee_in_chunks(self):
+        self.assertEqual(accrue_month(2024, 3, self.first, self.last, chunk_size=2), (5, 10))
+
+        self.assertEqual(self.balances(self.annual), [Decimal('1.67')] * 5)
+        self.assertEqual(self.balances(self.sick), [Decimal('0.83')] * 5)
+        entry = LeaveLedgerEntry.objects.filter(leave_type=self.annual).first()
+        self.assertEqual((entry.period, entry.effective_date), ('2024-03', date(2024, 3, 1)))
+
+    def test_rerun_posts_only_what_is_missing(self):
+        accrue_month(2024, 3, self.first, self.employees[2].id)
+        # Leave types, the chunk's employees, what they already have, two
+        # inserts, the empty next chunk, and the chunk's savepoint
+        with self.assertNumQueries(8):
+            self.assertEqual(accrue_month(2024, 3, self.first, self.last), (5, 4))
+        self.assertEqual(accrue_month(2024, 3, self.first, self.last), (5, 0))
+        self.assertEqual(self.balances(self.annual), [Decimal('1.67')] * 5)
+
+    def test_full_year_accrues_the_allowance(self):
+        for month in range(1, 13):
+            accrue_month(2024, month, self.first, self.last)
+        self.assertEqual(self.balances(self.annual), [20] * 5)
+
+    def test_carry_forward_lapses_above_the_limit(self):
+        for month in range(1, 13):
+            accrue_month(2024, month, self.first, self.last)
+        accrue_month(2025, 1, self.first, self.last)
+        # Leave approved for next January doesn't count towards the year end
+        employee = self.employees[0]
+        leave_request = request_leave(employee, self.annual, date(2025, 1, 6), date(2025, 1, 7))
+        approve_leave(leave_request.id, employee)
+
+        self.assertEqual(carry_forward_year(2024, self.first, self.last), (5, 10))
+
+        # 5 carried plus January's 1.67, less the 2 days taken
+        self.assertEqual(self.balances(self.annual), [Decimal('4.67')] + [Decimal('6.67')] * 4)
+        # Sick leave has no carry-forward: all of it lapses
+        self.assertEqual(self.balances(self.sick), [Decimal('0.83')] * 5)
+        entry = LeaveLedgerEntry.objects.get(employee=employee, leave_type=self.annual, period='2024')
+        self.assertEqual((entry.days, entry.note), (-15, "Carried 5.00, lapsed 15.00"))
+
+        self.assertEqual(carry_forward_year(2024, self.first, self.last), (5, 0))
+        self.assertFalse(stale_balances().exists())
+
+    def test_partitions(self):
+        ranges = partitions(2)
+        self.assertEqual(ranges, [(self.first, self.employees[2].id), (self.employees[3].id, self.last)])
+        self.assertEqual(len(partitions(10)), 5)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('accrue_leave', '--month', '2024-03', '--chunk-size', '2', stdout=out)
+        self.assertIn("Accrual for 2024-03: posted 10 entries for 5 employees", out.getvalue())
+
+        call_command('accrue_leave', '--carry-forward', '2024', stdout=out)
+        self.assertIn("Carry-forward for 2024: posted 10 entries", out.getvalue())
+
+        with self.assertRaisesMessage(CommandError, "--month must look like"):
+            call_command('accrue_leave', '--month', 'March')
+        with self.assertRaisesMessage(CommandError, "--workers needs PostgreSQL"):
+            call_command('accrue_leave', '--workers', '4')
+
+
+class OverlapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager')
+        cls.alice = User.objects.create_user(username='alice', first_name='Alice')
+        cls.bob = User.objects.create_user(username='bob', first_name='Bob')
+        cls.other = User.objects.create_user(username='other')
+        UserProfile.objects.filter(user__in=[cls.alice, cls.bob]).update(manager=cls.manager)
+        cls.annual = LeaveType.objects.create(code='AL', name='Annual')
+        for employee in (cls.alice, cls.bob, cls.other):
+            accrue(employee, cls.annual, 20)
+        cls.monday = next_monday()
+
+    def approve(self, employee, start, end):
+        leave_request = request_leave(employee, self.annual, start, end)
+        return approve_leave(leave_request.id, self.manager)
+
+    def test_approval_records_the_days(self):
+        leave_request = self.approve(self.alice, self.monday, self.monday + timedelta(days=6))
+
+        self.assertEqual(
+            list(LeaveDay.objects.order_by('date').values_list('date', flat=True)),
+            [self.monday + timedelta(days=n) for n in range(7)],
+        )
+        cancel_leave(leave_request.id, self.alice)
+        self.assertFalse(LeaveDay.objects.exists())
+
+    def test_leave_between(self):
+        monday = self.monday
+        alice = self.approve(self.alice, monday, monday + timedelta(days=2))
+        bob = self.approve(self.bob, monday + timedelta(days=7), monday + timedelta(days=8))
+        request_leave(self.other, self.annual, monday, monday)
+
+        team = [self.alice.id, self.bob.id, self.other.id]
+        self.assertEqual(list(approved_leave_between(monday + timedelta(days=2), monday + timedelta(days=7), team)
+                              .order_by('id')), [alice, bob])
+        self.assertEqual(list(approved_leave_between(monday + timedelta(days=3), monday + timedelta(days=6), team)), [])
+        # Pending leave isn't on the calendar
+        self.assertEqual(list(approved_leave_between(monday, monday, [self.other.id])), [])
+
+    def test_conflicting_requests(self):
+        monday = self.monday
+        self.approve(self.alice, monday, monday + timedelta(days=4))
+
+        with self.assertRaisesMessage(LeaveError, "overlaps approved leave"):
+            request_leave(self.alice, self.annual, monday + timedelta(days=4), monday + timedelta(days=7))
+        # Someone else's leave doesn't conflict
+        request_leave(self.bob, self.annual, monday, monday)
+
+    def test_approving_a_clash_fails(self):
+        monday = self.monday
+        first = request_leave(self.alice, self.annual, monday, monday + timedelta(days=1))
+        second = request_leave(self.alice, self.annual, monday + timedelta(days=1), monday + timedelta(days=2))
+        approve_leave(first.id, self.manager)
+
+        with self.assertRaisesMessage(LeaveError, "overlaps approved leave"):
+            approve_leave(second.id, self.manager)
+        self.assertEqual(LeaveRequest.objects.get(id=second.id).status, LeaveRequestStatus.PENDING)
+        self.assertEqual(LeaveDay.objects.count(), 2)
+
+    def test_approving_a_clash_that_was_just_approved_fails(self):
+        monday = self.monday
+        first = request_leave(self.alice, self.annual, monday, monday + timedelta(days=1))
+        second = request_leave(self.alice, self.annual, monday + timedelta(days=1), monday + timedelta(days=2))
+        approve_leave(first.id, self.manager)
+        checks = []
+
+        def racing(*args):
+            # The first check runs before the other approval commits
+            checks.append(args)
+            return None if len(checks) == 1 else conflicting_leave(*args)
+
+        with mock.patch('leave.ledger.conflicting_leave', side_effect=racing):
+            with self.assertRaisesMessage(LeaveError, "overlaps approved leave"):
+                approve_leave(second.id, self.manager)
+        self.assertEqual(LeaveRequest.objects.get(id=second.id).status, LeaveRequestStatus.PENDING)
+        self.assertEqual(LeaveDay.objects.count(), 2)
+
+    def test_team_calendar(self):
+        self.approve(self.alice, self.monday, self.monday + timedelta(days=1))
+        self.approve(self.other, self.monday, self.monday)
+        members = list(team_members(self.manager.id))
+        self.assertEqual(members, [self.manager, self.alice, self.bob])
+
+        with self.assertNumQueries(1):
+            days, rows = team_calendar(members, self.monday.year, self.monday.month)
+
+        self.assertEqual(len(days), len(rows[0]['days']))
+        leave = {row['employee']: {day['date'] for day in row['days'] if day['leave']} for row in rows}
+        in_month = {day for day in (self.monday, self.monday + timedelta(days=1)) if day.month == self.monday.month}
+        self.assertEqual(leave, {self.manager: set(), self.alice: in_month, self.bob: set()})
+
+    def test_calendar_view(self):
+        self.approve(self.alice, self.monday, self.monday)
+        UserProfile.objects.filter(user=self.alice).update(role=UserRole.EMPLOYEE)
+        cache.clear()
+        month = f"{self.monday:%Y-%m}"
+
+        # An employee sees their manager's team
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('team_calendar'), {'month': month})
+        self.assertContains(response, 'Bob')
+        self.assertContains(response, '>AL</td>')
+        self.assertNotContains(response, 'other')
+        response = self.client.get(reverse('team_calendar'), {'manager': self.manager.id})
+        self.assertEqual(response.status_code, 403)
+
+        # HR can look at any team
+        self.client.force_login(self.other)
+        response = self.client.get(reverse('team_calendar'), {'manager': self.manager.id, 'month': month})
+        self.assertContains(response, 'Alice')
+        self.assertContains(response, f'manager={self.manager.id}')
+        for month in ('0001-01', '9999-12'):
+            with self.subTest(month=month):
+                response = self.client.get(reverse('team_calendar'), {'month': month})
+                self.assertEqual(response.status_code, 404)
+        for manager in ('boss', str(2**70), '999999'):
+            with self.subTest(manager=manager):
+                response = self.client.get(reverse('team_calendar'), {'manager': manager})
+                self.assertEqual(response.status_code, 404)
+
+
+class CompactLeaveBalancesCommandTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = User.objects.create_user(username='employee')
+        cls.annual = LeaveType.objects.create(code='AL', name='Annual')
+        accrue(cls.employee, cls.annual, 4)
+        LeaveLedgerEntry.objects.update(created_at=timezone.now() - 2 * COMPACTION_DELAY)
+
+    def test_check(self):
+        out = StringIO()
+        call_command('compact_leave_balances', '--check', stdout=out)
+        self.assertIn("All leave balances match", out.getvalue())
+
+        LeaveBalance.objects.update(balance=1)
+        with self.assertRaisesMessage(CommandError, "1 leave balance(s)"):
+            call_command('compact_leave_balances', '--check', stdout=StringIO())
+
+    def test_repairs_and_compacts(self):
+        LeaveBalance.objects.update(balance=1)
+        out = StringIO()
+        call_command('compact_leave_balances', stdout=out)
+
+        self.assertIn("Compacted 1 leave balances (1 were stale and rebuilt)", out.getvalue())
+        balance = LeaveBalance.objects.get()
+        self.assertEqual((balance.balance, balance.compacted_balance), (4, 4))
+
+
+class LeaveViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = User.objects.create_user(username='employee', password='pass1234')
+        UserProfile.objects.filter(user=cls.employee).update(role=UserRole.EMPLOYEE)
+        cls.hr_user = User.objects.create_user(username='hr', password='pass1234')
+        cls.annual = LeaveType.objects.create(code='AL', name='Annual')
+        accrue(cls.employee, cls.annual, 10)
+
+    def setUp(self):
+        cache.clear()
+
+    def request_leave(self, **data):
+        monday = next_monday()
+        return self.client.post(reverse('my_leave'), {
+            'leave_type': self.annual.id, 'start_date': monday.isoformat(),
+            'end_date': (monday + timedelta(days=1)).isoformat(), **data,
+        }, follow=True)
+
+    def test_my_leave(self):
+        self.client.force_login(self.employee)
+        response = self.request_leave(reason='Holiday')
+
+        self.assertContains(response, "Requested 2 days of Annual")
+        self.assertEqual(LeaveRequest.objects.get().reason, 'Holiday')
+        # Balance, pending and available from the snapshot
+        self.assertContains(response, '10.00')
+        self.assertContains(response, '8.00')
+
+    def test_bad_request_is_reported(self):
+        self.client.force_login(self.employee)
+        self.assertContains(self.request_leave(start_date='soon'), "Choose a leave type and valid dates")
+        self.assertContains(self.request_leave(end_date=next_monday().isoformat(), start_date=(
+            next_monday() + timedelta(days=1)).isoformat()), "can&#x27;t end before")
+        self.assertFalse(LeaveRequest.objects.exists())
+
+    def test_cancel(self):
+        self.client.force_login(self.employee)
+        self.request_leave()
+        leave_request = LeaveRequest.objects.get()
+
+        response = self.client.post(reverse('cancel_leave_request', args=[leave_request.id]), follow=True)
+
+        self.assertContains(response, "Leave request cancelled")
+        self.assertEqual(LeaveBalance.objects.get().pending, 0)
+
+    def test_hr_approves(self):
+        self.client.force_login(self.employee)
+        self.request_leave()
+        leave_request = LeaveRequest.objects.get()
+
+        self.client.force_login(self.hr_user)
+        self.assertContains(self.client.get(reverse('leave_approvals')), 'employee')
+        response = self.client.post(
+            reverse('decide_leave_request', args=[leave_request.id]), {'action': 'approve'}, follow=True,
+        )
+
+        self.assertContains(response, "Leave approved")
+        self.assertEqual(LeaveBalance.objects.get().balance, 8)
+
+    def test_only_hr_decides(self):
+        self.client.force_login(self.employee)
+        self.request_leave()
+        leave_request = LeaveRequest.objects.get()
 
-# Create your tests here.
+        self.assertEqual(self.client.get(reverse('leave_approvals')).status_code, 403)
+        response = self.client.post(reverse('decide_leave_request', args=[leave_request.id]), {'action': 'approve'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(LeaveRequest.objects.get().status, LeaveRequestStatus.PENDING)
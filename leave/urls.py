@@ -0,0 +1,10 @@
+from django.urls import path
+from .views import cancel_leave_request, decide_leave_request, leave_approvals, my_leave, team_leave_calendar
+
+urlpatterns = [
+    path('', my_leave, name='my_leave'),
+    path('requests/<int:request_id>/cancel/', cancel_leave_request, name='cancel_leave_request'),
+    path('approvals/', leave_approvals, name='leave_approvals'),
+    path('requests/<int:request_id>/decide/', decide_leave_request, name='decide_leave_request'),
+    path('calendar/', team_leave_calendar, name='team_calendar'),
+]
@@ -1,3 +1,115 @@
-from django.shortcuts import render
+from datetime import date
 
-# Create your views here.
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
+
+from accounts.models import UserProfile, UserRole
+from accounts.roles import request_role, role_required
+from attendance.views import timesheet_month, user_or_404
+from .ledger import LeaveError, approve_leave, cancel_leave, employee_balances, reject_leave, request_leave
+from .models import LeaveRequest, LeaveRequestStatus, LeaveType
+from .overlaps import team_calendar, team_members
+
+RECENT_REQUESTS = 20
+APPROVAL_PAGE_SIZE = 100
+
+
+@login_required
+def my_leave(request):
+    """The user's balances, recent requests and a form to request leave"""
+    if request.method == "POST":
+        try:
+            leave_type = LeaveType.objects.get(id=request.POST.get('leave_type'), is_active=True)
+            start = date.fromisoformat(request.POST.get('start_date', ''))
+            end = date.fromisoformat(request.POST.get('end_date', ''))
+            leave_request = request_leave(request.user, leave_type, start, end, request.POST.get('reason', ''))
+        except (LeaveType.DoesNotExist, ValueError) as e:
+            messages.error(request, str(e) if isinstance(e, LeaveError) else "Choose a leave type and valid dates.")
+        else:
+            messages.success(request, f"Requested {leave_request.days} days of {leave_type}.")
+        return redirect('my_leave')
+
+    return render(request, 'leave/my_leave.html', {
+        # Read from the balance snapshot, not summed from the ledger
+        'balances': employee_balances(request.user),
+        'requests': (
+            LeaveRequest.objects.filter(employee=request.user)
+            .select_related('leave_type').order_by('-created_at')[:RECENT_REQUESTS]
+        ),
+        'leave_types': LeaveType.objects.filter(is_active=True).order_by('name'),
+    })
+
+
+@login_required
+@require_POST
+def cancel_leave_request(request, request_id):
+    try:
+        cancel_leave(request_id, request.user)
+    except LeaveError as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, "Leave request cancelled.")
+    return redirect('my_leave')
+
+
+@login_required
+@role_required(UserRole.HR)
+def leave_approvals(request):
+    """The queue of pending leave requests, oldest first"""
+    pending = (
+        LeaveRequest.objects.filter(status=LeaveRequestStatus.PENDING)
+        .select_related('employee', 'leave_type').order_by('created_at')
+    )
+    return render(request, 'leave/approvals.html', {'requests': pending[:APPROVAL_PAGE_SIZE]})
+
+
+@login_required
+@require_POST
+@role_required(UserRole.HR)
+def decide_leave_request(request, request_id):
+    action = request.POST.get('action')
+    try:
+        if action == 'approve':
+            approve_leave(request_id, request.user)
+            messages.success(request, "Leave approved.")
+        elif action == 'reject':
+            reject_leave(request_id, request.user)
+            messages.info(request, "Leave rejected.")
+    except LeaveError as e:
+        messages.error(request, str(e))
+    return redirect('leave_approvals')
+
+
+@login_required
+def team_leave_calendar(request):
+    """A month of the team's approved leave. Managers see their own team,
+    everyone else their manager's; HR can pass ?manager=<user id>."""
+    role = request_role(request)
+    if request.GET.get('manager'):
+        if not (request.user.is_superuser or role == UserRole.HR):
+            return HttpResponse("Not allowed. HR access only.", status=403)
+        manager = user_or_404(request.GET['manager'])
+    elif request.user.is_superuser or role in (UserRole.HR, UserRole.MANAGER, UserRole.SUPERADMIN):
+        manager = request.user
+    else:
+        manager_id = UserProfile.objects.filter(user=request.user).values_list('manager_id', flat=True).first()
+        manager = User(id=manager_id) if manager_id else request.user
+
+    year, month = timesheet_month(request.GET.get('month', ''))
+    members = list(team_members(manager.id))
+    days, rows = team_calendar(members, year, month)
+    first = date(year, month, 1)
+    previous = date(year - (month == 1), month - 1 or 12, 1)
+    following = date(year + (month == 12), month % 12 + 1, 1)
+    return render(request, 'leave/team_calendar.html', {
+        'month': first,
+        'previous_month': f"{previous:%Y-%m}",
+        'next_month': f"{following:%Y-%m}",
+        'manager_query': f"&manager={manager.id}" if request.GET.get('manager') else '',
+        'days': days,
+        'rows': rows,
+    })
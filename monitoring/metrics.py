@@ -0,0 +1,163 @@
+"""Per-request performance metrics.
+
+The middleware starts a RequestStats for each request and keeps it in a
+context variable, which follows the request into sync_to_async threads.
+Database queries, template rendering and email are added to it as they
+happen, then the totals go into the histograms below.
+
+Histograms live in process memory: with several worker processes each one
+exposes its own, so scrape them individually.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# Statements kept per request for the slow-request log
+MAX_RECORDED_QUERIES = 200
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = {'template': 0.0, 'email': 0.0}
+        self.sql = []
+
+    def slowest_queries(self, limit):
+        return sorted(self.sql, reverse=True)[:limit]
+
+
+current_stats = contextvars.ContextVar('current_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request"""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_time += elapsed
+        if len(stats.sql) < MAX_RECORDED_QUERIES:
+            stats.sql.append((elapsed, sql))
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the current request's phase, less
+    any queries it ran: those are already in the request's database time"""
+    stats = current_stats.get()
+    started = time.perf_counter()
+    db_time = stats.db_time if stats is not None else 0.0
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.phases[phase] += time.perf_counter() - started - (stats.db_time - db_time)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Histogram:
+
+    def __init__(self, name, documentation, buckets=DURATION_BUCKETS, labelnames=('view', 'method')):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.labelnames = labelnames
+        self.series = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            counts, total = self.series.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.series[key] = (counts, total + value)
+
+    def exposition(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self.lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self.series.items())
+        for key, counts, total in series:
+            labels = list(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, counts):
+                yield f'{self.name}_bucket{format_labels(labels + [("le", format_value(bound))])} {count}'
+            yield f'{self.name}_sum{format_labels(labels)} {format_value(total)}'
+            yield f'{self.name}_count{format_labels(labels)} {counts[-1]}'
+
+
+class Counter:
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.series = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + 1
+
+    def exposition(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self.lock:
+            series = sorted(self.series.items())
+        for key, value in series:
+            yield f'{self.name}{format_labels(list(zip(self.labelnames, key)))} {value}'
+
+
+REGISTRY = []
+
+REQUESTS = Counter('hrms_requests_total', 'Requests handled.', ('view', 'method', 'status'))
+REQUEST_SECONDS = Histogram('hrms_request_duration_seconds', 'Wall time per request.')
+DB_QUERIES = Histogram('hrms_request_db_queries', 'Database queries per request.', QUERY_BUCKETS)
+DB_SECONDS = Histogram('hrms_request_db_seconds', 'Time in database queries per request.')
+TEMPLATE_SECONDS = Histogram('hrms_request_template_seconds', 'Time rendering templates per request.')
+EMAIL_SECONDS = Histogram('hrms_request_email_seconds', 'Time queueing or sending email per request.')
+
+
+def observe_request(view, method, status, stats, elapsed):
+    REQUESTS.inc(view=view, method=method, status=status)
+    REQUEST_SECONDS.observe(elapsed, view=view, method=method)
+    DB_QUERIES.observe(stats.queries, view=view, method=method)
+    DB_SECONDS.observe(stats.db_time, view=view, method=method)
+    TEMPLATE_SECONDS.observe(stats.phases['template'], view=view, method=method)
+    EMAIL_SECONDS.observe(stats.phases['email'], view=view, method=method)
+
+
+def exposition():
+    """All metrics in the Prometheus text format"""
+    lines = [line for metric in REGISTRY for line in metric.exposition()]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,79 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import RequestStats, current_stats, observe_request
+
+logger = logging.getLogger('hrms.requests')
+
+# Statements logged for a slow request
+SLOW_REQUEST_QUERIES = 10
+
+
+class RequestMetricsMiddleware:
+    """Time each request and record its database, template and email time.
+    Every request is logged as one JSON line on the ``hrms.requests`` logger;
+    requests slower than METRICS_SLOW_REQUEST_SECONDS are logged as warnings
+    with their slowest SQL. Goes first in MIDDLEWARE so it sees everything."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.record(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.record(request, response, stats)
+        return response
+
+    def record(self, request, response, stats):
+        elapsed = time.perf_counter() - stats.started
+        # The URL name keeps the label set small; unmatched paths share one
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        observe_request(view, request.method, response.status_code, stats, elapsed)
+
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 1),
+            'db_queries': stats.queries,
+            'db_ms': round(stats.db_time * 1000, 1),
+            'template_ms': round(stats.phases['template'] * 1000, 1),
+            'email_ms': round(stats.phases['email'] * 1000, 1),
+        }
+        if elapsed < settings.METRICS_SLOW_REQUEST_SECONDS:
+            logger.info(json.dumps(entry))
+            return
+        entry['slow'] = True
+        entry['sql'] = [
+            {'ms': round(duration * 1000, 1), 'sql': sql}
+            for duration, sql in stats.slowest_queries(SLOW_REQUEST_QUERIES)
+        ]
+        logger.warning(json.dumps(entry))
@@ -0,0 +1,13 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import record_query
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Installed on the connection itself rather than around each request, so
+    # queries made from sync_to_async threads (async views) are counted too.
+    # Connections fire this again when they reconnect.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,116 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from notifications.mail import enqueue_email
+from .metrics import REGISTRY, Histogram, RequestStats, current_stats, timed
+
+
+class RequestMetricsTests(TestCase):
+
+    def logged(self, logs):
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_logs_request_with_query_and_template_time(self):
+        with self.assertLogs('hrms.requests', 'INFO') as logs:
+            response = self.client.get(reverse('login'))
+
+        self.assertEqual(response.status_code, 200)
+        [entry] = self.logged(logs)
+        self.assertEqual(entry['view'], 'login')
+        self.assertEqual(entry['status'], 200)
+        self.assertGreater(entry['template_ms'], 0)
+        self.assertNotIn('sql', entry)
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0)
+    def test_slow_request_logs_its_sql(self):
+        user = User.objects.create_user('hr', password='pw')
+        self.client.force_login(user)
+
+        with self.assertLogs('hrms.requests', 'WARNING') as logs:
+            self.client.get(reverse('employee_dashboard'))
+
+        [entry] = self.logged(logs)
+        self.assertTrue(entry['slow'])
+        self.assertGreater(entry['db_queries'], 0)
+        self.assertEqual(len(entry['sql']), min(entry['db_queries'], 10))
+        self.assertIn('SELECT', entry['sql'][0]['sql'])
+
+    async def test_counts_queries_of_async_views(self):
+        # Made from a sync_to_async thread, not the request's own
+        url = reverse('chunked_upload_init', args=['00000000-0000-0000-0000-000000000000'])
+        with self.assertLogs('hrms.requests', 'INFO') as logs:
+            response = await self.async_client.post(url)
+
+        self.assertEqual(response.status_code, 403)
+        [entry] = self.logged(logs)
+        self.assertGreater(entry['db_queries'], 0)
+
+    def test_metrics_endpoint(self):
+        with self.assertLogs('hrms.requests', 'INFO'):
+            self.client.get(reverse('login'))
+            response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('# TYPE hrms_request_duration_seconds histogram', body)
+        self.assertRegex(body, r'hrms_requests_total\{view="login",method="GET",status="200"\} \d+')
+        self.assertRegex(body, r'hrms_request_db_queries_bucket\{view="login",method="GET",le="\+Inf"\} \d+')
+
+    def test_metrics_endpoint_is_restricted(self):
+        with self.assertLogs('hrms.requests', 'INFO'):
+            response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 403)
+
+
+class HistogramTests(TestCase):
+
+    def setUp(self):
+        self.histogram = Histogram('test_seconds', 'Test.', buckets=(0.1, 1))
+        self.addCleanup(REGISTRY.remove, self.histogram)
+
+    def test_exposition(self):
+        self.histogram.observe(0.05, view='a"b', method='GET')
+        self.histogram.observe(0.5, view='a"b', method='GET')
+
+        self.assertEqual(list(self.histogram.exposition()), [
+            '# HELP test_seconds Test.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="a\\"b",method="GET",le="0.1"} 1',
+            'test_seconds_bucket{view="a\\"b",method="GET",le="1.0"} 2',
+            'test_seconds_bucket{view="a\\"b",method="GET",le="+Inf"} 2',
+            'test_seconds_sum{view="a\\"b",method="GET"} 0.55',
+            'test_seconds_count{view="a\\"b",method="GET"} 2',
+        ])
+
+    def test_timed_outside_a_request_is_ignored(self):
+        with timed('email'):
+            pass
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            with timed('email'):
+                pass
+        finally:
+            current_stats.reset(token)
+        self.assertGreater(stats.phases['email'], 0)
+
+    def test_timed_leaves_out_database_time(self):
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(0.05)
+            return execute(sql, params, many, context)
+
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            # Queueing an email is timed as email, but its INSERT is database time
+            with connection.execute_wrapper(slow_query):
+                enqueue_email("Hello", "Body", ["user@example.com"])
+        finally:
+            current_stats.reset(token)
+        self.assertGreaterEqual(stats.db_time, 0.05)
+        self.assertLess(stats.phases['email'], 0.05)
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from monitoring.metrics import timed
+
+from .models import EmailStatus, OutboundEmail
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(minutes=1)
+# How long a worker may hold a batch before another worker can reclaim it
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_email(subject, message, recipient_list, html_message=None, from_email=None):
+    """Queue an email for each recipient; the send_queued_emails worker delivers them.
+    Takes the same arguments as send_mail and returns the queued rows."""
+    return enqueue_emails(
+        ((subject, message, recipient, html_message) for recipient in recipient_list),
+        from_email=from_email,
+    )
+
+
+def enqueue_emails(emails, from_email=None, batch_size=BATCH_SIZE * 5):
+    """Queue many individual emails given as (subject, message, recipient,
+    html_message) tuples, inserted in batches"""
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    with timed('email'):
+        return OutboundEmail.objects.bulk_create(
+            (
+                OutboundEmail(
+                    recipient=recipient,
+                    from_email=from_email,
+                    subject=subject,
+                    body=message,
+                    html_body=html_message or '',
+                )
+                for subject, message, recipient, html_message in emails
+            ),
+            batch_size=batch_size,
+        )
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """Mark up to batch_size due emails as SENDING and return them"""
+    now = timezone.now()
+    due = OutboundEmail.objects.filter(
+        Q(status=EmailStatus.QUEUED, next_attempt_at__lte=now)
+        | Q(status=EmailStatus.SENDING, locked_until__lt=now)
+    ).order_by('next_attempt_at', 'id')
+
+    with transaction.atomic():
+        # skip_locked lets several workers drain the queue on PostgreSQL;
+        # SQLite serialises writers and ignores the lock
+        ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size])
+        OutboundEmail.objects.filter(id__in=ids).update(
+            status=EmailStatus.SENDING,
+            locked_until=now + CLAIM_TIMEOUT,
+        )
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def record_failure(email, error, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+    email.attempts += 1
+    email.last_error = str(error)
+    email.locked_until = None
+    if email.attempts >= max_attempts:
+        email.status = EmailStatus.FAILED
+    else:
+        # Exponential backoff: 1x, 2x, 4x ... the base delay
+        email.status = EmailStatus.QUEUED
+        email.next_attempt_at = timezone.now() + retry_delay * 2 ** (email.attempts - 1)
+    email.save(update_fields=['attempts', 'last_error', 'locked_until', 'status', 'next_attempt_at'])
+
+
+def record_success(email):
+    email.attempts += 1
+    email.status = EmailStatus.SENT
+    email.sent_at = timezone.now()
+    email.locked_until = None
+    email.last_error = ''
+    email.save(update_fields=['attempts', 'status', 'sent_at', 'locked_until', 'last_error'])
+
+
+def deliver_batch(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY, connection=None):
+    """Send one batch of due emails over a single connection.
+    Returns (sent, failed) counts; failed emails are retried with backoff."""
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            record_failure(email, e, max_attempts, retry_delay)
+        return 0, len(emails)
+
+    sent = failed = 0
+    try:
+        for email in emails:
+            try:
+                connection.send_messages([email.as_message(connection)])
+            except Exception as e:
+                record_failure(email, e, max_attempts, retry_delay)
+                failed += 1
+            else:
+                record_success(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
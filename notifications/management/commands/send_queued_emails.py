@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from notifications.mail import BATCH_SIZE, MAX_ATTEMPTS, RETRY_DELAY, deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound emails in batches over a single SMTP connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument(
+            '--retry-delay', type=float, default=RETRY_DELAY.total_seconds(),
+            help="Base delay in seconds before the first retry; doubles on each attempt",
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling the queue instead of exiting once it is drained",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help="Seconds to sleep between polls when the queue is empty (with --loop)",
+        )
+
+    def handle(self, *args, **options):
+        retry_delay = timedelta(seconds=options['retry_delay'])
+        total_sent = total_failed = 0
+
+        while True:
+            sent, failed = deliver_batch(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                retry_delay=retry_delay,
+            )
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Queue drained: {total_sent} sent, {total_failed} failed"
+        ))
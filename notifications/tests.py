@@ -0,0 +1,83 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .mail import claim_batch, deliver_batch, enqueue_email
+from .models import EmailStatus, OutboundEmail
+from .smtp_sink import SMTPSink
+
+
+class EmailQueueTests(TestCase):
+
+    def setUp(self):
+        self.sink = SMTPSink().start()
+        self.addCleanup(self.sink.stop)
+        email_settings = override_settings(**self.sink.email_settings())
+        email_settings.enable()
+        self.addCleanup(email_settings.disable)
+
+    def test_batch_is_sent_over_one_connection(self):
+        enqueue_email("Hello", "Body", [f"user{i}@example.com" for i in range(10)],
+                      html_message="<p>Body</p>")
+
+        call_command('send_queued_emails', '--batch-size', '4', stdout=StringIO())
+
+        self.assertEqual(len(self.sink.messages), 10)
+        # Three batches of at most four, one connection each
+        self.assertEqual(self.sink.connections, 3)
+        self.assertEqual(OutboundEmail.objects.filter(status=EmailStatus.SENT).count(), 10)
+        self.assertIn(b"text/html", self.sink.messages[0]['data'])
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        enqueue_email("Hello", "Body", ["user@example.com"])
+        self.sink.stop()
+
+        self.assertEqual(deliver_batch(retry_delay=timedelta(minutes=1)), (0, 1))
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.status, EmailStatus.QUEUED)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertTrue(email.last_error)
+
+        # Not due yet, so the next run does nothing
+        self.assertEqual(deliver_batch(), (0, 0))
+
+        # The second retry waits twice as long
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        deliver_batch(retry_delay=timedelta(minutes=1))
+        email.refresh_from_db()
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=110))
+
+    def test_gives_up_after_max_attempts(self):
+        enqueue_email("Hello", "Body", ["user@example.com"])
+        self.sink.stop()
+        for _ in range(3):
+            deliver_batch(max_attempts=3, retry_delay=timedelta(0))
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.status, EmailStatus.FAILED)
+        self.assertEqual(email.attempts, 3)
+
+    def test_expired_claims_are_reclaimed(self):
+        enqueue_email("Hello", "Body", ["user@example.com"])
+        self.assertEqual(len(claim_batch()), 1)
+        self.assertEqual(claim_batch(), [])
+        OutboundEmail.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(deliver_batch(), (1, 0))
+
+
+class QueuedViewEmailTests(TestCase):
+
+    def test_create_candidate_queues_invitation(self):
+        hr_user = User.objects.create_user(username='hr', password='pass1234')
+        self.client.force_login(hr_user)
+
+        self.client.post('/candidate/create/', {'email': 'new@example.com'})
+
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.recipient, 'new@example.com')
+        self.assertEqual(email.status, EmailStatus.QUEUED)
+        self.assertIn('/candidate/onboard/', email.body)